@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def deactivate_unlinked_alerts(apps, schema_editor):
+    """
+    Alerts not tied to a medication were demo rows seeded by the dashboard
+    view; retire them so only alerts derived from real stock remain.
+    Run refresh_pharmacy_alerts afterwards to build the real ones.
+    """
+    PharmacyAlert = apps.get_model('admin_portal', 'PharmacyAlert')
+    PharmacyAlert.objects.filter(medication__isnull=True).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0004_stock_lots'),
+        ('admin_portal', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pharmacyalert',
+            name='lot',
+            field=models.ForeignKey(blank=True, help_text='Set for expiry alerts', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='pharmacy.stocklot'),
+        ),
+        migrations.AddField(
+            model_name='pharmacyalert',
+            name='medication',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='pharmacy.medication'),
+        ),
+        migrations.AddIndex(
+            model_name='pharmacyalert',
+            index=models.Index(fields=['is_active', 'alert_type'], name='admin_porta_is_acti_6b916f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pharmacyalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('lot__isnull', True)), fields=('medication',), name='one_stock_alert_per_medication'),
+        ),
+        migrations.AddConstraint(
+            model_name='pharmacyalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('lot__isnull', False)), fields=('lot',), name='one_expiry_alert_per_lot'),
+        ),
+        migrations.RunPython(deactivate_unlinked_alerts, migrations.RunPython.noop),
+    ]
@@ -30,7 +30,11 @@ class SystemActivity(models.Model):
 
 
 class PharmacyAlert(models.Model):
-    """Track pharmacy inventory alerts for the dashboard"""
+    """
+    Track pharmacy inventory alerts for the dashboard.
+    One row per medication for stock level and one per stock lot for expiry,
+    kept current by pharmacy.alerts whenever stock changes.
+    """
     ALERT_TYPES = [
         ('critical', 'Critical'),
         ('low_stock', 'Low Stock'),
@@ -38,6 +42,21 @@ class PharmacyAlert(models.Model):
         ('expiring_soon', 'Expiring Soon'),
     ]
     
+    medication = models.ForeignKey(
+        'pharmacy.Medication',
+        on_delete=models.CASCADE,
+        related_name='alerts',
+        null=True,
+        blank=True
+    )
+    lot = models.ForeignKey(
+        'pharmacy.StockLot',
+        on_delete=models.CASCADE,
+        related_name='alerts',
+        null=True,
+        blank=True,
+        help_text='Set for expiry alerts'
+    )
     medication_name = models.CharField(max_length=100)
     current_stock = models.IntegerField()
     threshold = models.IntegerField()
@@ -49,6 +68,21 @@ class PharmacyAlert(models.Model):
     
     class Meta:
         ordering = ['alert_type', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['medication'],
+                condition=models.Q(lot__isnull=True),
+                name='one_stock_alert_per_medication'
+            ),
+            models.UniqueConstraint(
+                fields=['lot'],
+                condition=models.Q(lot__isnull=False),
+                name='one_expiry_alert_per_lot'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['is_active', 'alert_type']),
+        ]
     
     def __str__(self):
         return f"{self.medication_name} - {self.get_alert_type_display()}"
@@ -8,6 +8,7 @@ urlpatterns = [
     path('dashboard/stats/', views.dashboard_stats_view, name='dashboard_stats'),
     path('dashboard/revenue/', views.revenue_chart_view, name='revenue_chart'),
     path('dashboard/appointments/', views.appointment_breakdown_view, name='appointment_breakdown'),
+    path('dashboard/turnaround/', views.turnaround_analytics_view, name='turnaround_analytics'),
     
     # Pharmacy & System Monitoring
     path('pharmacy/alerts/', views.pharmacy_alerts_view, name='pharmacy_alerts'),
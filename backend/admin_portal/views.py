@@ -11,6 +11,9 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 
 from auth_portal.models import User
+from core.caching import cached_response
+from patients.analytics import turnaround_summary
+from pharmacy.alerts import alert_dashboard
 from .models import SystemActivity, PharmacyAlert, DashboardStats, SystemStatus
 from .serializers import (
     DashboardStatsSerializer, RevenueDataSerializer, AppointmentBreakdownSerializer,
@@ -54,6 +57,7 @@ from .serializers import (
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_response('staff')
 def dashboard_stats_view(request):
     """
     Retrieve comprehensive dashboard statistics for admin portal.
@@ -259,7 +263,7 @@ def appointment_breakdown_view(request):
 
 @swagger_auto_schema(
     method='get',
-    operation_description="Get pharmacy inventory alerts (critical and low stock items)",
+    operation_description="Get pharmacy inventory alerts (critical, low stock, expired and expiring lots)",
     responses={
         200: openapi.Response(
             description="Pharmacy alerts retrieved successfully",
@@ -274,11 +278,21 @@ def appointment_breakdown_view(request):
                         type=openapi.TYPE_ARRAY,
                         items=openapi.Schema(type=openapi.TYPE_OBJECT, ref='#/components/schemas/PharmacyAlert')
                     ),
+                    'expired': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT, ref='#/components/schemas/PharmacyAlert')
+                    ),
+                    'expiring_soon': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT, ref='#/components/schemas/PharmacyAlert')
+                    ),
                     'count': openapi.Schema(
                         type=openapi.TYPE_OBJECT,
                         properties={
                             'critical': openapi.Schema(type=openapi.TYPE_INTEGER),
                             'low_stock': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'expired': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'expiring_soon': openapi.Schema(type=openapi.TYPE_INTEGER),
                             'total': openapi.Schema(type=openapi.TYPE_INTEGER)
                         }
                     )
@@ -296,7 +310,8 @@ def pharmacy_alerts_view(request):
     """
     Retrieve pharmacy inventory alerts for the dashboard.
     
-    Returns critical and low stock medication alerts.
+    Returns critical and low stock medications and expired or soon-to-expire
+    stock lots from the PharmacyAlert rows kept current by stock changes.
     """
     # Check admin permissions
     if not hasattr(request.user, 'role') or request.user.role != 'ADMIN':
@@ -305,66 +320,64 @@ def pharmacy_alerts_view(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Get active alerts
-    critical_alerts = PharmacyAlert.objects.filter(
-        alert_type='critical', 
-        is_active=True
-    ).order_by('-created_at')[:5]  # Limit to 5 most recent
+    # Alerts are maintained by pharmacy.alerts as stock changes
+    data = alert_dashboard()
     
-    low_stock_alerts = PharmacyAlert.objects.filter(
-        alert_type='low_stock', 
-        is_active=True
-    ).order_by('-created_at')[:5]  # Limit to 5 most recent
-    
-    # Create default alerts if none exist (for demo purposes)
-    if not critical_alerts.exists() and not low_stock_alerts.exists():
-        # Create sample alerts
-        PharmacyAlert.objects.get_or_create(
-            medication_name='Amoxicillin',
-            defaults={
-                'current_stock': 8,
-                'threshold': 10,
-                'alert_type': 'critical'
-            }
-        )
-        PharmacyAlert.objects.get_or_create(
-            medication_name='Insulin',
-            defaults={
-                'current_stock': 5,
-                'threshold': 10,
-                'alert_type': 'critical'
-            }
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Get patient turnaround times (door-to-doctor, cashier wait, lab turnaround, total visit length) with p50/p90 by hour and department",
+    manual_parameters=[
+        openapi.Parameter(
+            'days',
+            openapi.IN_QUERY,
+            description="Number of days to cover (default: 7, max: 90)",
+            type=openapi.TYPE_INTEGER,
+            default=7
+        ),
+        openapi.Parameter(
+            'department',
+            openapi.IN_QUERY,
+            description="RECEPTION, DOCTOR, FINANCE, LAB, PHARMACY or ALL (whole visits)",
+            type=openapi.TYPE_STRING
         )
-        PharmacyAlert.objects.get_or_create(
-            medication_name='Paracetamol',
-            defaults={
-                'current_stock': 15,
-                'threshold': 20,
-                'alert_type': 'low_stock'
-            }
+    ],
+    responses={
+        200: openapi.Response(description="Turnaround figures retrieved successfully"),
+        401: 'Unauthorized - Admin access required',
+        403: 'Forbidden - Insufficient permissions'
+    },
+    tags=['Admin Dashboard']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def turnaround_analytics_view(request):
+    """
+    Retrieve patient turnaround analytics.
+    
+    Reads the stage duration rollups built by build_stage_durations from
+    the patient status history; durations are in seconds.
+    """
+    # Check admin permissions
+    if not hasattr(request.user, 'role') or request.user.role != 'ADMIN':
+        return Response(
+            {'error': 'Admin access required'}, 
+            status=status.HTTP_403_FORBIDDEN
         )
-        PharmacyAlert.objects.get_or_create(
-            medication_name='Bandages',
-            defaults={
-                'current_stock': 30,
-                'threshold': 50,
-                'alert_type': 'low_stock'
-            }
+    
+    try:
+        days = min(max(int(request.GET.get('days', 7)), 1), 90)
+    except ValueError:
+        return Response(
+            {'error': 'days must be a number'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        
-        # Refetch after creation
-        critical_alerts = PharmacyAlert.objects.filter(alert_type='critical', is_active=True)
-        low_stock_alerts = PharmacyAlert.objects.filter(alert_type='low_stock', is_active=True)
+    department = request.GET.get('department', '').upper() or None
     
-    data = {
-        'critical': PharmacyAlertSerializer(critical_alerts, many=True).data,
-        'low_stock': PharmacyAlertSerializer(low_stock_alerts, many=True).data,
-        'count': {
-            'critical': critical_alerts.count(),
-            'low_stock': low_stock_alerts.count(),
-            'total': critical_alerts.count() + low_stock_alerts.count()
-        }
-    }
+    data = turnaround_summary(days, department)
+    data['days'] = days
     
     return Response(data, status=status.HTTP_200_OK)
 
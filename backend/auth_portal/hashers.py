@@ -0,0 +1,18 @@
+"""
+Password hasher profiles.
+
+Password verification is the bulk of a login's cost, so the hashing work
+factor is a deployment setting (PASSWORD_HASHER_PROFILE in settings)
+rather than a code constant. Hashes made under another profile or with
+other parameters still verify and are re-hashed with the current ones on
+the user's next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with time/memory/parallelism taken from settings"""
+    time_cost = getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, identify_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+LOGIN_URL = '/api/auth/login/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure logins per second for one worker: password verification alone, then the '
+        'full login endpoint with and without a session. Updates the account\'s last_login.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee-id', required=True, help='Account to log in as')
+        parser.add_argument('--password', required=True, help='Password of that account')
+        parser.add_argument('--count', type=int, default=50, help='Logins per measurement')
+
+    def _rate(self, label, count, run):
+        started = time.perf_counter()
+        for _ in range(count):
+            run()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<28} {count / elapsed:8.1f} /s  ({elapsed / count * 1000:.1f} ms each)')
+
+    def _login(self, client, employee_id, password):
+        response = client.post(LOGIN_URL, {'employee_id': employee_id, 'password': password}, format='json')
+        if response.status_code != 200:
+            raise CommandError(f'Login failed ({response.status_code}): {response.data}')
+
+    def handle(self, *args, **options):
+        employee_id = options['employee_id'].upper()
+        password = options['password']
+        count = options['count']
+        try:
+            user = User.objects.get(employee_id=employee_id)
+        except User.DoesNotExist:
+            raise CommandError(f'No user with employee ID {employee_id}')
+        if not user.check_password(password):
+            raise CommandError('Wrong password for that account')
+
+        # check_password above re-hashes a stale hash, so this is the current profile
+        user.refresh_from_db(fields=['password'])
+        self.stdout.write(f'Hasher: {identify_hasher(user.password).algorithm}')
+        self._rate('password check', count, lambda: check_password(password, user.password))
+
+        for create_session in (True, False):
+            label = 'login with session' if create_session else 'login without session'
+            with override_settings(LOGIN_CREATE_SESSION=create_session):
+                client = APIClient()
+                with CaptureQueriesContext(connection) as queries:
+                    self._login(client, employee_id, password)
+                self._rate(label, count, lambda: self._login(client, employee_id, password))
+            self.stdout.write(f'{"":<28} {len(queries)} queries per login')
@@ -2,7 +2,9 @@ from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import login, logout
+from django.db import connection
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -20,6 +22,42 @@ from .serializers import (
 )
 
 
+def _login_token_key(user):
+    """
+    The user's API token key, created on first login.
+
+    On PostgreSQL this is one statement: the insert is skipped when the
+    user already has a token and the existing key is read in the same
+    round trip, so repeat logins do not write.
+    """
+    if connection.vendor != 'postgresql':
+        token, _ = Token.objects.get_or_create(user=user)
+        return token.key
+
+    table = connection.ops.quote_name(Token._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH created AS (
+                INSERT INTO {table} (key, created, user_id)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (user_id) DO NOTHING
+                RETURNING key
+            )
+            SELECT key FROM created
+            UNION ALL
+            SELECT key FROM {table} WHERE user_id = %s
+            LIMIT 1
+            """,
+            [Token.generate_key(), timezone.now(), user.pk, user.pk]
+        )
+        row = cursor.fetchone()
+    if row:
+        return row[0]
+    # Token committed by a concurrent login after this statement's snapshot
+    return Token.objects.values_list('key', flat=True).get(user=user)
+
+
 @swagger_auto_schema(
     method='post',
     request_body=LoginSerializer,
@@ -53,20 +91,19 @@ def login_view(request):
         user = serializer.validated_data['user']
         remember_me = serializer.validated_data.get('remember_me', False)
         
-        # Update last login
-        user.last_login = timezone.now()
-        user.save()
-        
-        # Get or create token
-        token, created = Token.objects.get_or_create(user=user)
-        
-        # Django session login
-        login(request, user)
+        token_key = _login_token_key(user)
+
+        if settings.LOGIN_CREATE_SESSION:
+            # Django session login (also records last_login)
+            login(request, user)
+        else:
+            user.last_login = timezone.now()
+            user.save(update_fields=['last_login'])
         
         return Response({
             'success': True,
             'message': 'Login successful',
-            'token': token.key,
+            'token': token_key,
             'user': UserSerializer(user).data,
             'remember_me': remember_me
         }, status=status.HTTP_200_OK)
@@ -0,0 +1,233 @@
+"""
+Response caching and conditional GET for polled read endpoints.
+
+@cached_response stores a view's 200 response in the default (Redis)
+cache under the view, the caller's role (or user) and the query string,
+together with an ETag of the body. Repeat polls are answered from Redis,
+and clients sending If-None-Match with that ETag get a bodyless 304.
+
+Entries are invalidated by tag. Each tag has a version counter that is
+part of the entry key, so bumping it on commit of a write to one of the
+tag's models (post_save / post_delete below, or invalidate_cache_tags()
+from bulk writers that bypass signals) orphans every entry built on the
+old data. Entries also expire after their timeout, which bounds
+staleness for writes nothing reports and for "today" counters at
+midnight.
+
+@etag_condition serves endpoints too live to cache: the ETag comes from
+one aggregate over the rows behind the response (changes_etag), and a
+client that already holds it gets a 304 before anything is serialized.
+"""
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpRequest
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60
+KEY_PREFIX = 'resp'
+
+# tag -> models whose writes invalidate responses carrying the tag.
+# Patient transitions update the row with QuerySet.update(), so they are
+# seen through the PatientStatusHistory row each one inserts.
+TAG_MODELS = {
+    'patients': ['patients.Patient', 'patients.Visit', 'patients.PatientStatusHistory'],
+    'consultations': ['doctor.Consultation', 'doctor.LabTestRequest', 'doctor.Prescription'],
+    'pricing': ['finance.ServicePricing'],
+    'medications': ['pharmacy.Medication'],
+    'staff': ['auth_portal.User', 'admin_portal.DashboardStats'],
+}
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _cache_call(method, *args, **kwargs):
+    # A cache outage degrades to uncached responses, never to errors
+    try:
+        return getattr(cache, method)(*args, **kwargs)
+    except Exception:
+        logger.warning('Response cache %s failed', method, exc_info=True)
+        return None
+
+
+def _bump_tags(tags):
+    for tag in tags:
+        key = _tag_key(tag)
+        if _cache_call('add', key, 1, None) is False:
+            _cache_call('incr', key)
+
+
+def invalidate_cache_tags(*tags):
+    """Drop every cached response carrying one of the tags once the transaction commits"""
+    transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def _invalidate_for(tags):
+    def receiver(sender, **kwargs):
+        invalidate_cache_tags(*tags)
+    return receiver
+
+
+def _connect_signals():
+    for tag, models in TAG_MODELS.items():
+        for model in models:
+            for name, signal in (('save', post_save), ('delete', post_delete)):
+                signal.connect(
+                    _invalidate_for([tag]), sender=model, weak=False,
+                    dispatch_uid=f'{KEY_PREFIX}:{name}:{tag}:{model}'
+                )
+
+
+_connect_signals()
+
+
+def body_etag(data):
+    """Weak ETag of a response body"""
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return f'W/"{hashlib.md5(body.encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    """True when the client's If-None-Match already names etag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if header.strip() == '*':
+        return True
+    # Weak comparison: W/ prefixes are ignored on both sides
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == wanted:
+            return True
+    return False
+
+
+def conditional_response(request, etag, build, headers=None):
+    """
+    304 when the client holds etag, otherwise the response from build().
+    Both carry the ETag and require clients to revalidate.
+    """
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    for name, value in (headers or {}).items():
+        response[name] = value
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def changes_etag(queryset, *fields, scope=()):
+    """
+    Weak ETag of a queryset's current state: its row count and the newest
+    value of each timestamp field (or expression), read with one
+    aggregate. An insert or update moves a timestamp and a removal
+    lowers the count.
+
+    scope adds whatever else the response depends on (query parameters,
+    the date for computed ages, ...).
+    """
+    stats = queryset.order_by().aggregate(
+        rows=Count('pk'),
+        **{f'newest_{index}': Max(field) for index, field in enumerate(fields)}
+    )
+    parts = [*scope, stats['rows']] + [
+        value.isoformat() if value else '' for value in
+        (stats[f'newest_{index}'] for index in range(len(fields)))
+    ]
+    token = '|'.join(str(part) for part in parts)
+    return f'W/"{hashlib.md5(token.encode()).hexdigest()}"'
+
+
+def etag_condition(etag_func):
+    """
+    Answer GETs with 304 when the client's If-None-Match matches
+    etag_func(request, *args, **kwargs); the view only runs otherwise.
+    etag_func returns None to leave a request to the view (bad lookups).
+    Apply below @api_view like cached_response.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+            return conditional_response(request, etag, lambda: view(request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def _entry_key(view_name, request, tags, per_user):
+    versions = _cache_call('get_many', [_tag_key(tag) for tag in tags]) or {}
+    scope = f'user={request.user.pk}' if per_user else f"role={getattr(request.user, 'role', '')}"
+    params = hashlib.md5(
+        json.dumps(sorted(request.query_params.lists())).encode()
+    ).hexdigest()
+    generation = '.'.join(str(versions.get(_tag_key(tag), 0)) for tag in tags)
+    return f'{KEY_PREFIX}:{view_name}:{scope}:{params}:{generation}'
+
+
+def cached_response(*tags, timeout=DEFAULT_TIMEOUT, per_user=False):
+    """
+    Cache a GET view's 200 responses per role and query string.
+
+    Apply below @api_view / @action so authentication and permissions
+    run first. Works on function views and ViewSet methods.
+
+    Args:
+        tags: TAG_MODELS keys whose writes invalidate the response
+        timeout (int): Seconds an entry may be served at most
+        per_user (bool): Key by user instead of role, for bodies that
+            name the caller
+    """
+    unknown = set(tags) - set(TAG_MODELS)
+    if unknown:
+        raise ValueError(f'Unknown cache tags: {sorted(unknown)}')
+
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__qualname__}'
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            key = _entry_key(view_name, request, tags, per_user)
+            entry = _cache_call('get', key)
+            if entry is None:
+                response = view(*args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = {'data': response.data, 'etag': body_etag(response.data)}
+                _cache_call('set', key, entry, timeout)
+                build = lambda: response
+            else:
+                build = lambda: Response(entry['data'])
+
+            return conditional_response(request, entry['etag'], build)
+
+        return wrapper
+
+    return decorator
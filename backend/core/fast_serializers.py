@@ -0,0 +1,248 @@
+"""
+values() fast path for high-volume list endpoints.
+
+A ModelSerializer list builds a model instance per row and walks every
+field's get_attribute() / to_representation() through the serializer
+machinery. ValuesSerializer reads the same serializer's fields once and
+compiles them into a flat plan of (key, columns, mapper), then builds
+each item from a values_list() tuple with one call per field. The body
+is the one the serializer produces: same keys in the same order, each
+value passed through the same DRF field's to_representation().
+
+Fields that are not columns (model properties such as Patient.age,
+get_FOO_display, SerializerMethodField) are given as computed mappers
+over the columns they need. A field that is neither raises
+ImproperlyConfigured on first use, so a field added to the serializer
+cannot silently go missing from the fast path.
+
+Clients can ask for a subset of the keys with ?fields=a,b,c (sparse
+fieldsets, see sparse_fieldsets()); the plan for a subset reads only
+the columns those keys need, so a narrow grid costs a narrow query.
+
+Check parity and speed with `manage.py benchmark_list_serializers`.
+"""
+from functools import wraps
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.http import HttpRequest
+from rest_framework import status
+from rest_framework.fields import empty
+from rest_framework.relations import RelatedField
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+# Query parameter naming the fields a list client wants
+FIELDS_PARAM = 'fields'
+
+# Marks a key the serializer leaves out of the item
+_SKIP = object()
+
+
+def choice_display(model, field_name):
+    """Computed mapper matching get_<field_name>_display"""
+    labels = {value: str(label) for value, label in model._meta.get_field(field_name).flatchoices}
+
+    def display(value):
+        if value is None:
+            return None
+        return labels.get(value, str(value))
+
+    return [field_name], display
+
+
+def _column(model, source_attrs):
+    """ORM lookup path for a dotted serializer source, None when not a column"""
+    for index, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if index < len(source_attrs) - 1:
+            model = field.related_model
+            if model is None:
+                return None
+    return '__'.join(source_attrs)
+
+
+def _field_mapper(field):
+    if isinstance(field, RelatedField):
+        # PrimaryKeyRelatedField renders the raw key, which is the column
+        return lambda value: value
+    to_representation = field.to_representation
+    return lambda value: None if value is None else to_representation(value)
+
+
+def _spread(mapper):
+    # itemgetter hands back a tuple when it reads several columns
+    return lambda values: mapper(*values)
+
+
+def _through_relations(field, mapper):
+    """
+    Mapper for a dotted source reading (relation keys..., column). When a
+    relation on the way is null, DRF's get_attribute() hits None and the
+    field falls back to its default, to None when it allows null, and is
+    otherwise left out of the item (read-only fields are not required).
+    """
+    def missing():
+        if field.default is not empty:
+            return field.get_default()
+        return None if field.allow_null else _SKIP
+
+    def through(values):
+        for value in values[:-1]:
+            if value is None:
+                return missing()
+        return mapper(values[-1])
+
+    return through
+
+
+class ValuesSerializer:
+    """
+    Fast twin of a ModelSerializer for read-only lists.
+
+    Every method takes an optional `fields` selection (see
+    requested_fields()): only those keys are built and only their columns
+    are read.
+
+    Args:
+        serializer_class: The ModelSerializer whose output is reproduced
+        computed: field name -> (columns, mapper) for fields that are not
+            columns; mapper receives the columns' values in order
+    """
+
+    def __init__(self, serializer_class, **computed):
+        self.serializer_class = serializer_class
+        self.computed = computed
+        self._field_names = None
+        # fields selection -> (columns, plan, skips)
+        self._compiled = {}
+
+    @property
+    def field_names(self):
+        if self._field_names is None:
+            self._field_names = [
+                name for name, field in self.serializer_class().fields.items() if not field.write_only
+            ]
+        return self._field_names
+
+    def _compile(self, fields):
+        model = self.serializer_class.Meta.model
+        columns = []
+        plan = []
+        skips = False
+
+        def position(column):
+            if column not in columns:
+                columns.append(column)
+            return columns.index(column)
+
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            if name in self.computed:
+                sources, mapper = self.computed[name]
+            else:
+                column = _column(model, field.source_attrs) if field.source != '*' else None
+                if column is None:
+                    raise ImproperlyConfigured(
+                        f'{self.serializer_class.__name__}.{name} is not a column of '
+                        f'{model.__name__}; give ValuesSerializer a computed mapper for it'
+                    )
+                attrs = field.source_attrs
+                relations = ['__'.join(attrs[:depth]) for depth in range(1, len(attrs))]
+                sources, mapper = relations + [column], _field_mapper(field)
+                if relations:
+                    mapper = _through_relations(field, mapper)
+                    skips = True
+            positions = [position(source) for source in sources]
+            if len(positions) > 1 and name in self.computed:
+                mapper = _spread(mapper)
+            plan.append((name, itemgetter(*positions), mapper))
+
+        return columns, plan, skips
+
+    def _compiled_for(self, fields):
+        key = None if fields is None else frozenset(fields)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            unknown = set(key or ()) - set(self.field_names)
+            if unknown:
+                raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+            compiled = self._compiled[key] = self._compile(key)
+        return compiled
+
+    def columns(self, prefix='', fields=None):
+        """Columns the representation reads, optionally through a relation prefix"""
+        return [f'{prefix}{column}' for column in self._compiled_for(fields)[0]]
+
+    def rows(self, queryset, prefix='', extra=(), fields=None):
+        """
+        values_list() of queryset for to_representation(). extra columns
+        are appended after the serializer's, at row[-len(extra):].
+        """
+        return queryset.values_list(*self.columns(prefix, fields), *extra)
+
+    def to_representation(self, row, fields=None):
+        _, plan, skips = self._compiled_for(fields)
+        data = {name: mapper(getter(row)) for name, getter, mapper in plan}
+        if skips:
+            data = {name: value for name, value in data.items() if value is not _SKIP}
+        return data
+
+    def render(self, rows, fields=None):
+        _, plan, skips = self._compiled_for(fields)
+        items = [{name: mapper(getter(row)) for name, getter, mapper in plan} for row in rows]
+        if skips:
+            items = [{name: value for name, value in item.items() if value is not _SKIP} for item in items]
+        return items
+
+    def serialize(self, queryset, fields=None):
+        """List body for queryset, as Serializer(queryset, many=True).data"""
+        return self.render(self.rows(queryset, fields=fields), fields)
+
+
+def requested_fields(request):
+    """?fields=a,b,c as a tuple of field names, None (every field) when absent"""
+    names = [name.strip() for name in request.query_params.get(FIELDS_PARAM, '').split(',')]
+    return tuple(dict.fromkeys(name for name in names if name)) or None
+
+
+def sparse_fieldsets(values_serializer):
+    """
+    Let a list endpoint take ?fields= (sparse fieldsets): names outside
+    values_serializer's fields get a 400 before the view runs, which then
+    passes requested_fields(request) to the fast path. Apply below
+    @api_view / @action like cached_response.
+
+    Endpoints whose body depends on the caller pass a callable instead,
+    taking the request and returning the field names that caller gets.
+    """
+    def available_fields(request):
+        if isinstance(values_serializer, ValuesSerializer):
+            return values_serializer.field_names
+        return list(values_serializer(request))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            fields = requested_fields(request)
+            if fields:
+                available = available_fields(request)
+                unknown = [name for name in fields if name not in available]
+                if unknown:
+                    return Response(
+                        {
+                            'error': f'Unknown fields: {", ".join(unknown)}',
+                            'available_fields': available,
+                        },
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
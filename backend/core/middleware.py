@@ -0,0 +1,119 @@
+"""
+Negotiated response compression.
+
+Clinic workstations reach the API over a slow LAN, so text responses
+(JSON, CSV exports, the browsable API) are compressed with the best
+coding the client accepts: brotli when the brotli package is installed
+and the client sends `br`, gzip otherwise. Accept-Encoding q-values are
+honoured, with brotli preferred on a tie. Responses below
+COMPRESSION_MIN_SIZE bytes and already compressed types (images, XLSX,
+PDF) are sent as they are, since there is little to gain.
+
+gzip is Django's GZipMiddleware unchanged, including its random header
+padding against BREACH. Brotli has no such padding; set
+COMPRESSION_BROTLI=False to compress with gzip only.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+# Dynamic responses: quality 4 runs at about gzip speed with smaller output
+DEFAULT_BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+
+def accepted_encodings(header):
+    """coding -> q-value from an Accept-Encoding header"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header, available):
+    """
+    The coding of `available` (in preference order) the client rates
+    highest, None when it accepts none of them.
+    """
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli or gzip by Accept-Encoding, for responses worth compressing"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+        self.encodings = ['gzip']
+        if brotli is not None and getattr(settings, 'COMPRESSION_BROTLI', True):
+            self.encodings.insert(0, 'br')
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').lower().startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        # Async streams are left to gzip, which has a per-chunk path for them
+        available = ['gzip'] if response.streaming and response.is_async else self.encodings
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), available)
+        if encoding == 'gzip':
+            return super().process_response(request, response)
+        if encoding != 'br':
+            return response
+
+        if response.streaming:
+            response.streaming_content = _brotli_sequence(response.streaming_content, self.brotli_quality)
+            del response.headers['Content-Length']
+        else:
+            compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
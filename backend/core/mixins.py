@@ -0,0 +1,99 @@
+"""
+Shared model mixins.
+"""
+import copy
+
+
+class DirtyFieldsMixin:
+    """
+    Track which concrete fields changed since the instance was loaded.
+
+    For rows that already exist, save() passes update_fields for the changed
+    columns only (plus auto_now timestamps), and skips the write entirely when
+    nothing changed. Explicit update_fields from the caller are respected.
+    Models use is_dirty() to skip recomputing derived values when their
+    inputs did not change.
+
+    Must come before models.Model in the class bases.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._reset_dirty_tracking()
+        return instance
+
+    def _snapshot_value(self, field):
+        value = getattr(self, field.attname)
+        # JSON fields can be mutated in place, keep our own copy
+        if isinstance(value, (dict, list)):
+            value = copy.deepcopy(value)
+        return value
+
+    def _reset_dirty_tracking(self):
+        self._loaded_values = {
+            field.attname: self._snapshot_value(field)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        """
+        Names of fields changed since load, or None when the instance
+        was never loaded from or saved to the database.
+        """
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None or self._state.adding:
+            return None
+
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded or loaded[field.attname] != getattr(self, field.attname):
+                dirty.append(field.name)
+        return dirty
+
+    def is_dirty(self, *field_names):
+        """True if any of field_names changed (always True for unsaved rows)"""
+        dirty = self.get_dirty_fields()
+        if dirty is None:
+            return True
+        if not field_names:
+            return bool(dirty)
+        return any(name in dirty for name in field_names)
+
+    def mark_clean(self, *field_names):
+        """Record the current values of field_names as persisted"""
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None:
+            return
+        for field in self._meta.concrete_fields:
+            if field_names and field.name not in field_names and field.attname not in field_names:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = self._snapshot_value(field)
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.mark_clean(*(fields or ()))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not args and update_fields is None and not kwargs.get('force_insert'):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                auto_now = [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False)
+                ]
+                kwargs['update_fields'] = set(dirty) | set(auto_now)
+
+        super().save(*args, **kwargs)
+
+        if update_fields is None:
+            self._reset_dirty_tracking()
+        elif update_fields:
+            self.mark_clean(*update_fields)
@@ -0,0 +1,88 @@
+"""
+orjson-backed JSON renderer and parser (REST_FRAMEWORK defaults).
+
+Both produce exactly what DRF's JSONRenderer / JSONParser do, only
+faster; without orjson installed they are those classes unchanged.
+
+The renderer lets orjson write str, int, float, bool, None, dict, list,
+tuple and UUID itself (its UUID text is str(uuid)) and hands everything
+else, dates and times included, to DRF's JSONEncoder.default(), so
+Decimal, datetime, date, time, timedelta and lazy strings come out as
+before. Output is compact UTF-8 with U+2028 / U+2029 escaped, like
+DRF's. orjson refuses what the stdlib accepts (non-string dict keys,
+integers beyond 64 bits), and indented output is requested by the
+browsable API and `; indent=` media types; those bodies are rendered by
+DRF's renderer instead.
+
+Two differences remain, both on floats: values written in exponent form
+are spelled the way orjson does (1e16, 1e-7 rather than 1e+16, 1e-07;
+same value), and NaN / Infinity are written as null where DRF's strict
+encoder raises. Serializers send Decimals as strings, so neither reaches
+money fields.
+
+Bodies the parser's orjson pass rejects are parsed again by DRF's
+parser, so whatever the stdlib accepts still is, and errors are the
+same ParseError. So are bodies with 19+ digit runs: orjson reads integers
+beyond 64 bits as floats, the stdlib keeps them exact.
+"""
+import io
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson writes these raw, DRF escapes them (JavaScript line separators)
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+# A 19+ digit run, possibly an integer orjson would not read exactly, is
+# found by mapping digits to 0 and the rest to space (faster than a regex)
+_DIGIT_MASK = bytes(ord('0') if byte in b'0123456789' else ord(' ') for byte in range(256))
+_LONG_DIGITS = b'0' * 19
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer writing with orjson when available"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            # orjson.JSONEncodeError: something only the stdlib encodes
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for raw, escaped in _LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser reading with orjson when available"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if _LONG_DIGITS not in body.translate(_DIGIT_MASK):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
@@ -0,0 +1,142 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from doctor.models import Consultation
+from doctor.serializers import consultation_list_rows
+from finance.models import ServicePayment
+from finance.serializers import service_payment_rows
+from patients.models import Patient
+from patients.serializers import patient_search_rows
+from pharmacy.models import Medication
+from pharmacy.serializers import medication_list_rows
+
+User = get_user_model()
+
+# (ValuesSerializer, queryset, a ?fields= subset in any order)
+PARITY_CASES = [
+    (
+        consultation_list_rows,
+        lambda: Consultation.objects.select_related('doctor').order_by('patient_id'),
+        ('blood_pressure', 'doctor_name'),
+    ),
+    (
+        service_payment_rows,
+        lambda: ServicePayment.objects.select_related('processed_by').order_by('patient_id'),
+        ('status_display', 'processed_by_name', 'amount'),
+    ),
+    (
+        patient_search_rows,
+        lambda: Patient.objects.order_by('patient_id'),
+        ('age', 'patient_id', 'nhif_card_number'),
+    ),
+    (
+        medication_list_rows,
+        lambda: Medication.objects.order_by('barcode'),
+        ('stock_status', 'name'),
+    ),
+]
+
+
+class ValuesSerializerParityTests(TestCase):
+    """Each ValuesSerializer renders what its ModelSerializer does"""
+
+    @classmethod
+    def setUpTestData(cls):
+        doctor = User.objects.create_user(
+            password='test-pass-123',
+            full_name='Neema Kweka',
+            email='doctor@example.com',
+            phone_number='+255700000201',
+            role='DOCTOR',
+        )
+        cashier = User.objects.create_user(
+            password='test-pass-123',
+            full_name='Rehema Cashier',
+            email='finance@example.com',
+            phone_number='+255700000301',
+            role='FINANCE',
+        )
+
+        Consultation.objects.create(
+            patient_id='PAT1', patient_name='Asha Juma', doctor=doctor,
+            chief_complaint='Fever', diagnosis='Malaria', priority='URGENT',
+            blood_pressure_systolic=120, blood_pressure_diastolic=80,
+        )
+        # No vitals recorded: blood_pressure is None
+        Consultation.objects.create(
+            patient_id='PAT2', patient_name='Baraka Mollel', doctor=doctor,
+            chief_complaint='Headache',
+        )
+
+        ServicePayment.objects.create(
+            patient_id='PAT1', patient_name='Asha Juma', service_type='LAB_TEST',
+            service_name='Lab Tests (2 tests)', reference_id='lab-1',
+            amount=Decimal('30000.00'), status='PAID', processed_by=cashier,
+        )
+        # Not processed yet: processed_by is null, reference_id too
+        ServicePayment.objects.create(
+            patient_id='PAT2', patient_name='Baraka Mollel', service_type='CONSULTATION',
+            service_name='Doctor Consultation - General', amount=Decimal('5000.00'),
+        )
+
+        Patient.objects.create(
+            first_name='Asha', last_name='Juma', phone_number='+255711000001',
+            gender='FEMALE', date_of_birth=date(1990, 2, 28), created_by=doctor,
+        )
+        Patient.objects.create(
+            first_name='Baraka', last_name='Mollel', phone_number='+255711000002',
+            gender='MALE', date_of_birth=date(2015, 12, 31), patient_type='NHIF',
+            nhif_card_number='NH00000001', created_by=doctor,
+        )
+
+        for index, (stock, is_active) in enumerate([(50, True), (5, True), (0, True), (20, False)]):
+            Medication.objects.create(
+                name=f'Medication {index}', generic_name='Paracetamol', manufacturer='Shelys',
+                barcode=f'TEST-{index:04d}', category='ANALGESIC', current_stock=stock,
+                reorder_level=10, unit_price=Decimal('250.00'), is_active=is_active,
+                created_by=doctor,
+            )
+
+    def assertMatchesSerializer(self, rows_spec, queryset, fields=None):
+        rows = rows_spec.serialize(queryset, fields)
+        expected = [
+            {name: value for name, value in item.items() if fields is None or name in fields}
+            for item in rows_spec.serializer_class(queryset, many=True).data
+        ]
+
+        self.assertEqual(rows, expected)
+        # Same keys in the same order, the serializer's, not the request's
+        self.assertEqual([list(row) for row in rows], [list(item) for item in expected])
+        return rows
+
+    def test_matches_serializer(self):
+        for rows_spec, queryset, fields in PARITY_CASES:
+            with self.subTest(serializer=rows_spec.serializer_class.__name__):
+                self.assertMatchesSerializer(rows_spec, queryset())
+
+    def test_fields_subset(self):
+        for rows_spec, queryset, fields in PARITY_CASES:
+            with self.subTest(serializer=rows_spec.serializer_class.__name__, fields=fields):
+                rows = self.assertMatchesSerializer(rows_spec, queryset(), fields)
+                self.assertEqual(
+                    list(rows[0]), [name for name in rows_spec.field_names if name in fields]
+                )
+
+    def test_computed_and_nullable_fields(self):
+        consultations = consultation_list_rows.serialize(PARITY_CASES[0][1]())
+        self.assertIsNone(consultations[1]['blood_pressure'])
+
+        payments = service_payment_rows.serialize(PARITY_CASES[1][1]())
+        self.assertEqual(payments[0]['service_type_display'], 'Laboratory Test')
+        self.assertEqual(payments[1]['status_display'], 'Payment Pending')
+        # The serializer leaves processed_by_name out when nobody processed it
+        self.assertNotIn('processed_by_name', payments[1])
+
+        medications = medication_list_rows.serialize(PARITY_CASES[3][1]())
+        self.assertEqual(
+            [(row['is_available'], row['stock_status']) for row in medications],
+            [(True, 'available'), (True, 'low'), (False, 'unavailable'), (False, 'available')]
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0006_prescription_medication_id_prescription_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='labtestrequest',
+            index=models.Index(condition=models.Q(('status__in', ['REQUESTED', 'IN_PROGRESS'])), fields=['requested_at'], name='lab_request_open_idx'),
+        ),
+    ]
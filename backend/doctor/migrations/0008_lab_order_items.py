@@ -0,0 +1,126 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+import uuid
+
+BATCH_SIZE = 1000
+
+# Frozen copies of LabOrderItem.TEST_CATALOG, DEFAULT_PRICE and
+# legacy_result() as they were when this migration was written: test_code ->
+# requested flag, legacy result columns and ServicePricing code
+TEST_CATALOG = {
+    'MRDT': ('mrdt_requested', ['mrdt_result'], 'LAB_MRDT'),
+    'BS': ('bs_requested', ['bs_result'], 'LAB_BS'),
+    'STOOL_ANALYSIS': ('stool_analysis_requested', ['stool_macro_result', 'stool_micro_result'], 'LAB_STOOL_ANALYSIS'),
+    'URINE_SED': ('urine_sed_requested', ['urine_sed_macro_result', 'urine_sed_micro_result'], 'LAB_URINE_SED'),
+    'URINALYSIS': ('urinalysis_requested', [
+        'urinalysis_urobilinogen', 'urinalysis_glucose', 'urinalysis_bilirubin',
+        'urinalysis_ketones', 'urinalysis_sg', 'urinalysis_blood', 'urinalysis_ph',
+        'urinalysis_protein', 'urinalysis_nitrite', 'urinalysis_leucocytes',
+    ], 'LAB_URINALYSIS'),
+    'RPR': ('rpr_requested', ['rpr_result'], 'LAB_RPR'),
+    'H_PYLORI': ('h_pylori_requested', ['h_pylori_result'], 'LAB_H_PYLORI'),
+    'HEPATITIS_B': ('hepatitis_b_requested', ['hepatitis_b_result'], 'LAB_HEPATITIS_B'),
+    'HEPATITIS_C': ('hepatitis_c_requested', ['hepatitis_c_result'], 'LAB_HEPATITIS_C'),
+    'SSAT': ('ssat_requested', ['ssat_result'], 'LAB_SSAT'),
+    'UPT': ('upt_requested', ['upt_result'], 'LAB_UPT'),
+    'ESR': ('esr_requested', ['esr_result'], 'LAB_ESR'),
+    'BLOOD_GROUPING': ('blood_grouping_requested', ['blood_grouping_result'], 'LAB_BLOOD_GROUPING'),
+    'HB': ('hb_requested', ['hb_result'], 'LAB_HB'),
+    'RHEUMATOID_FACTOR': ('rheumatoid_factor_requested', ['rheumatoid_factor_result'], 'LAB_RF'),
+    'RBG': ('rbg_requested', ['rbg_result'], 'LAB_RBG'),
+    'FBG': ('fbg_requested', ['fbg_result'], 'LAB_FBG'),
+    'SICKLING_TEST': ('sickling_test_requested', ['sickling_test_result'], 'LAB_SICKLING_TEST'),
+}
+
+DEFAULT_PRICE = Decimal('15000.00')
+
+
+def legacy_result(lab_request, test_code):
+    """Combine the legacy result columns of a test into one text value"""
+    columns = TEST_CATALOG[test_code][1]
+    if len(columns) == 1:
+        return getattr(lab_request, columns[0]) or None
+    parts = [
+        f"{column.split('_', 1)[1] if column.startswith('urinalysis_') else column}: {getattr(lab_request, column)}"
+        for column in columns if getattr(lab_request, column)
+    ]
+    return '; '.join(parts) or None
+
+
+def build_order_items(apps, schema_editor):
+    """
+    Create one LabOrderItem per requested test on existing requests,
+    priced from ServicePricing and carrying over any legacy results.
+    """
+    LabTestRequest = apps.get_model('doctor', 'LabTestRequest')
+    LabOrderItem = apps.get_model('doctor', 'LabOrderItem')
+    ServicePricing = apps.get_model('finance', 'ServicePricing')
+
+    catalog = TEST_CATALOG
+    prices = dict(ServicePricing.objects.filter(
+        service_code__in=[service_code for _, _, service_code in catalog.values()]
+    ).values_list('service_code', 'standard_price'))
+
+    batch = []
+    for lab_request in LabTestRequest.objects.iterator(chunk_size=BATCH_SIZE):
+        for code, (flag, _, service_code) in catalog.items():
+            if not getattr(lab_request, flag):
+                continue
+            result = legacy_result(lab_request, code)
+            if result:
+                status = 'COMPLETED'
+            elif lab_request.status == 'CANCELLED':
+                status = 'CANCELLED'
+            else:
+                status = lab_request.status if lab_request.status == 'IN_PROGRESS' else 'REQUESTED'
+            batch.append(LabOrderItem(
+                lab_request_id=lab_request.id,
+                test_code=code,
+                status=status,
+                result=result,
+                result_at=lab_request.completed_at if result else None,
+                price=prices.get(service_code, DEFAULT_PRICE),
+            ))
+        if len(batch) >= BATCH_SIZE:
+            LabOrderItem.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        LabOrderItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0007_lab_request_open_index'),
+        ('finance', '0002_populate_service_pricing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabOrderItem',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('test_code', models.CharField(choices=[('MRDT', 'Mrdt'), ('BS', 'Bs'), ('STOOL_ANALYSIS', 'Stool Analysis'), ('URINE_SED', 'Urine Sed'), ('URINALYSIS', 'Urinalysis'), ('RPR', 'Rpr'), ('H_PYLORI', 'H Pylori'), ('HEPATITIS_B', 'Hepatitis B'), ('HEPATITIS_C', 'Hepatitis C'), ('SSAT', 'Ssat'), ('UPT', 'Upt'), ('ESR', 'Esr'), ('BLOOD_GROUPING', 'Blood Grouping'), ('HB', 'Hb'), ('RHEUMATOID_FACTOR', 'Rheumatoid Factor'), ('RBG', 'Rbg'), ('FBG', 'Fbg'), ('SICKLING_TEST', 'Sickling Test')], max_length=30)),
+                ('status', models.CharField(choices=[('REQUESTED', 'Test Requested'), ('IN_PROGRESS', 'Test In Progress'), ('COMPLETED', 'Test Completed'), ('CANCELLED', 'Test Cancelled')], default='REQUESTED', max_length=20)),
+                ('result', models.TextField(blank=True, null=True)),
+                ('result_at', models.DateTimeField(blank=True, null=True)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, help_text='Price in TZS when the test was requested', max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('lab_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='doctor.labtestrequest')),
+            ],
+            options={
+                'db_table': 'lab_order_items',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['test_code', 'status'], name='lab_order_i_test_co_bb4170_idx'), models.Index(fields=['status', 'created_at'], name='lab_order_i_status_a3fdcd_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='laborderitem',
+            constraint=models.UniqueConstraint(fields=('lab_request', 'test_code'), name='unique_test_per_lab_request'),
+        ),
+        migrations.RunPython(build_order_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def link_open_visits(apps, schema_editor):
+    """Attach consultations still in progress, and their lab requests, to the patient's open visit"""
+    Consultation = apps.get_model('doctor', 'Consultation')
+    LabTestRequest = apps.get_model('doctor', 'LabTestRequest')
+    Visit = apps.get_model('patients', 'Visit')
+
+    Consultation.objects.filter(status='IN_PROGRESS').update(
+        visit_id=Subquery(
+            Visit.objects.filter(
+                closed_at__isnull=True, patient__patient_id=OuterRef('patient_id')
+            ).values('id')[:1]
+        )
+    )
+    LabTestRequest.objects.filter(consultation__visit__isnull=False).update(
+        visit_id=Subquery(
+            Consultation.objects.filter(pk=OuterRef('consultation_id')).values('visit_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0010_visits'),
+        ('doctor', '0008_lab_order_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultation',
+            name='visit',
+            field=models.ForeignKey(blank=True, help_text='Check-in this consultation belongs to', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consultations', to='patients.visit'),
+        ),
+        migrations.AddField(
+            model_name='labtestrequest',
+            name='visit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lab_requests', to='patients.visit'),
+        ),
+        migrations.RunPython(link_open_visits, migrations.RunPython.noop),
+    ]
@@ -3,10 +3,20 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 import uuid
+from decimal import Decimal
+
+from core.mixins import DirtyFieldsMixin
 
 User = get_user_model()
 
 
+def format_blood_pressure(systolic, diastolic):
+    """Blood pressure as "systolic/diastolic", None unless both readings are recorded"""
+    if systolic and diastolic:
+        return f"{systolic}/{diastolic}"
+    return None
+
+
 class Consultation(models.Model):
     """
     Medical consultation record for each patient visit to doctor.
@@ -45,6 +55,14 @@ class Consultation(models.Model):
         related_name='consultations',
         limit_choices_to={'role': 'DOCTOR'}
     )
+    visit = models.ForeignKey(
+        'patients.Visit',
+        on_delete=models.SET_NULL,
+        related_name='consultations',
+        null=True,
+        blank=True,
+        help_text='Check-in this consultation belongs to'
+    )
     
     # Consultation information
     chief_complaint = models.TextField(help_text='Main reason for visit')
@@ -198,11 +216,14 @@ class Consultation(models.Model):
     @property
     def blood_pressure(self):
         """Format blood pressure as string"""
-        if self.blood_pressure_systolic and self.blood_pressure_diastolic:
-            return f"{self.blood_pressure_systolic}/{self.blood_pressure_diastolic}"
-        return None
+        return format_blood_pressure(self.blood_pressure_systolic, self.blood_pressure_diastolic)
     
     def save(self, *args, **kwargs):
+        # Attach new consultations to the patient's open visit
+        if self._state.adding and self.visit_id is None:
+            from patients.models import Visit
+            self.visit_id = Visit.objects.open_visit_id(self.patient_id)
+
         # Set completed_at when status changes to completed
         if self.status == 'COMPLETED' and not self.completed_at:
             self.completed_at = timezone.now()
@@ -226,7 +247,7 @@ class Consultation(models.Model):
         return "PAID" if self.consultation_fee_paid else "UNPAID"
 
 
-class LabTestRequest(models.Model):
+class LabTestRequest(DirtyFieldsMixin, models.Model):
     """
     Comprehensive lab test requests matching hospital lab form.
     Links to consultation and tracks all possible tests with results.
@@ -246,6 +267,13 @@ class LabTestRequest(models.Model):
         on_delete=models.CASCADE,
         related_name='lab_requests'
     )
+    visit = models.ForeignKey(
+        'patients.Visit',
+        on_delete=models.SET_NULL,
+        related_name='lab_requests',
+        null=True,
+        blank=True
+    )
 
     # Basic patient info (cached for lab use)
     patient_id = models.CharField(max_length=20, default='')
@@ -413,12 +441,22 @@ class LabTestRequest(models.Model):
             models.Index(fields=['consultation']),
             models.Index(fields=['patient_id']),
             models.Index(fields=['status', '-requested_at']),
+            # Lab queue only ever scans open requests
+            models.Index(
+                fields=['requested_at'],
+                name='lab_request_open_idx',
+                condition=models.Q(status__in=['REQUESTED', 'IN_PROGRESS'])
+            ),
         ]
 
     def __str__(self):
         return f"Lab Request for {self.patient_name} ({self.patient_id}) - {self.status}"
 
     def save(self, *args, **kwargs):
+        # Same visit as the consultation that ordered it
+        if self._state.adding and self.visit_id is None:
+            self.visit_id = self.consultation.visit_id
+
         # Set payment date when fee is marked as paid
         if self.lab_fee_paid and not self.lab_fee_payment_date:
             self.lab_fee_payment_date = timezone.now()
@@ -432,25 +470,76 @@ class LabTestRequest(models.Model):
             from datetime import date
             self.investigation_date = date.today()
 
+        sync_items = self.is_dirty(*self.TEST_FIELDS, *LabOrderItem.RESULT_FIELDS)
         super().save(*args, **kwargs)
 
+        if sync_items:
+            self.sync_items()
+
+    def sync_items(self):
+        """
+        Mirror the legacy *_requested / *_result columns into LabOrderItem rows.
+        New tests are priced in one query; unrequested tests still waiting are removed.
+        """
+        existing = {item.test_code: item for item in self.items.all()}
+        requested = [
+            code for code, (flag, _, _) in LabOrderItem.TEST_CATALOG.items()
+            if getattr(self, flag)
+        ]
+
+        new_codes = [code for code in requested if code not in existing]
+        if new_codes:
+            prices = LabOrderItem.prices_for(new_codes)
+            for item in LabOrderItem.objects.bulk_create([
+                LabOrderItem(lab_request=self, test_code=code, price=prices[code])
+                for code in new_codes
+            ]):
+                existing[item.test_code] = item
+
+        dropped = [code for code in existing if code not in requested]
+        if dropped:
+            self.items.filter(test_code__in=dropped, status='REQUESTED').delete()
+
+        # Results entered in the legacy columns complete the matching item
+        now = timezone.now()
+        completed = []
+        for code in requested:
+            item = existing.get(code)
+            result = LabOrderItem.legacy_result(self, code)
+            if item and result and item.result != result:
+                item.result = result
+                item.status = 'COMPLETED'
+                item.result_at = item.result_at or now
+                completed.append(item)
+        if completed:
+            LabOrderItem.objects.bulk_update(completed, ['result', 'status', 'result_at'])
+
     @property
     def can_proceed_to_testing(self):
         """Check if testing can proceed (payment made)"""
         return not self.lab_fee_required or self.lab_fee_paid
 
+    TEST_FIELDS = [
+        'mrdt_requested', 'bs_requested', 'stool_analysis_requested',
+        'urine_sed_requested', 'urinalysis_requested', 'rpr_requested',
+        'h_pylori_requested', 'hepatitis_b_requested', 'hepatitis_c_requested',
+        'ssat_requested', 'upt_requested', 'esr_requested',
+        'blood_grouping_requested', 'hb_requested', 'rheumatoid_factor_requested',
+        'rbg_requested', 'fbg_requested', 'sickling_test_requested'
+    ]
+
+    # Requests the lab still has to work on
+    OPEN_STATUSES = ['REQUESTED', 'IN_PROGRESS']
+
+    @property
+    def requested_tests(self):
+        """Names of the requested tests (e.g. 'mrdt', 'hb')"""
+        return [field[:-len('_requested')] for field in self.TEST_FIELDS if getattr(self, field)]
+
     @property
     def requested_tests_count(self):
         """Count how many tests were requested"""
-        test_fields = [
-            'mrdt_requested', 'bs_requested', 'stool_analysis_requested',
-            'urine_sed_requested', 'urinalysis_requested', 'rpr_requested',
-            'h_pylori_requested', 'hepatitis_b_requested', 'hepatitis_c_requested',
-            'ssat_requested', 'upt_requested', 'esr_requested',
-            'blood_grouping_requested', 'hb_requested', 'rheumatoid_factor_requested',
-            'rbg_requested', 'fbg_requested', 'sickling_test_requested'
-        ]
-        return sum(1 for field in test_fields if getattr(self, field))
+        return sum(1 for field in self.TEST_FIELDS if getattr(self, field))
 
     @property
     def payment_status(self):
@@ -460,6 +549,117 @@ class LabTestRequest(models.Model):
         return "PAID" if self.lab_fee_paid else "UNPAID"
 
 
+class LabOrderItem(models.Model):
+    """
+    One requested test on a LabTestRequest.
+    Kept in sync with the legacy *_requested / *_result columns by
+    LabTestRequest.save(), so counting, pricing and per-test turnaround
+    are plain indexed queries.
+    """
+
+    STATUS_CHOICES = [
+        ('REQUESTED', 'Test Requested'),
+        ('IN_PROGRESS', 'Test In Progress'),
+        ('COMPLETED', 'Test Completed'),
+        ('CANCELLED', 'Test Cancelled'),
+    ]
+
+    # test_code -> requested flag, legacy result columns and ServicePricing code
+    TEST_CATALOG = {
+        'MRDT': ('mrdt_requested', ['mrdt_result'], 'LAB_MRDT'),
+        'BS': ('bs_requested', ['bs_result'], 'LAB_BS'),
+        'STOOL_ANALYSIS': ('stool_analysis_requested', ['stool_macro_result', 'stool_micro_result'], 'LAB_STOOL_ANALYSIS'),
+        'URINE_SED': ('urine_sed_requested', ['urine_sed_macro_result', 'urine_sed_micro_result'], 'LAB_URINE_SED'),
+        'URINALYSIS': ('urinalysis_requested', [
+            'urinalysis_urobilinogen', 'urinalysis_glucose', 'urinalysis_bilirubin',
+            'urinalysis_ketones', 'urinalysis_sg', 'urinalysis_blood', 'urinalysis_ph',
+            'urinalysis_protein', 'urinalysis_nitrite', 'urinalysis_leucocytes',
+        ], 'LAB_URINALYSIS'),
+        'RPR': ('rpr_requested', ['rpr_result'], 'LAB_RPR'),
+        'H_PYLORI': ('h_pylori_requested', ['h_pylori_result'], 'LAB_H_PYLORI'),
+        'HEPATITIS_B': ('hepatitis_b_requested', ['hepatitis_b_result'], 'LAB_HEPATITIS_B'),
+        'HEPATITIS_C': ('hepatitis_c_requested', ['hepatitis_c_result'], 'LAB_HEPATITIS_C'),
+        'SSAT': ('ssat_requested', ['ssat_result'], 'LAB_SSAT'),
+        'UPT': ('upt_requested', ['upt_result'], 'LAB_UPT'),
+        'ESR': ('esr_requested', ['esr_result'], 'LAB_ESR'),
+        'BLOOD_GROUPING': ('blood_grouping_requested', ['blood_grouping_result'], 'LAB_BLOOD_GROUPING'),
+        'HB': ('hb_requested', ['hb_result'], 'LAB_HB'),
+        'RHEUMATOID_FACTOR': ('rheumatoid_factor_requested', ['rheumatoid_factor_result'], 'LAB_RF'),
+        'RBG': ('rbg_requested', ['rbg_result'], 'LAB_RBG'),
+        'FBG': ('fbg_requested', ['fbg_result'], 'LAB_FBG'),
+        'SICKLING_TEST': ('sickling_test_requested', ['sickling_test_result'], 'LAB_SICKLING_TEST'),
+    }
+
+    RESULT_FIELDS = [column for _, columns, _ in TEST_CATALOG.values() for column in columns]
+
+    # Used when a test has no ServicePricing row
+    DEFAULT_PRICE = Decimal('15000.00')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lab_request = models.ForeignKey(
+        LabTestRequest,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    test_code = models.CharField(
+        max_length=30,
+        choices=[(code, code.replace('_', ' ').title()) for code in TEST_CATALOG]
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='REQUESTED'
+    )
+    result = models.TextField(blank=True, null=True)
+    result_at = models.DateTimeField(blank=True, null=True)
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0.00,
+        help_text='Price in TZS when the test was requested'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'lab_order_items'
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['lab_request', 'test_code'], name='unique_test_per_lab_request'),
+        ]
+        indexes = [
+            models.Index(fields=['test_code', 'status']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.test_code} for request {self.lab_request_id} - {self.status}"
+
+    @classmethod
+    def prices_for(cls, test_codes):
+        """Standard prices for test codes in one ServicePricing query"""
+        from finance.models import ServicePricing
+
+        service_codes = {cls.TEST_CATALOG[code][2]: code for code in test_codes}
+        prices = dict.fromkeys(test_codes, cls.DEFAULT_PRICE)
+        for service_code, price in ServicePricing.objects.filter(
+            service_code__in=list(service_codes)
+        ).values_list('service_code', 'standard_price'):
+            prices[service_codes[service_code]] = price
+        return prices
+
+    @classmethod
+    def legacy_result(cls, lab_request, test_code):
+        """Combine the legacy result columns of a test into one text value"""
+        columns = cls.TEST_CATALOG[test_code][1]
+        if len(columns) == 1:
+            return getattr(lab_request, columns[0]) or None
+        parts = [
+            f"{column.split('_', 1)[1] if column.startswith('urinalysis_') else column}: {getattr(lab_request, column)}"
+            for column in columns if getattr(lab_request, column)
+        ]
+        return '; '.join(parts) or None
+
+
 class Prescription(models.Model):
     """
     Medication prescriptions created by doctors.
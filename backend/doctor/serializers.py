@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Consultation, LabTestRequest, Prescription
+from core.fast_serializers import ValuesSerializer
+from .models import Consultation, LabTestRequest, Prescription, format_blood_pressure
 
 User = get_user_model()
 
@@ -63,6 +64,13 @@ class ConsultationListSerializer(serializers.ModelSerializer):
         ]
 
 
+# values() fast path for consultation lists (core/fast_serializers.py)
+consultation_list_rows = ValuesSerializer(
+    ConsultationListSerializer,
+    blood_pressure=(['blood_pressure_systolic', 'blood_pressure_diastolic'], format_blood_pressure),
+)
+
+
 class LabTestRequestSerializer(serializers.ModelSerializer):
     """Comprehensive serializer for lab test requests matching hospital form"""
 
@@ -6,6 +6,7 @@ app_name = 'doctor'
 urlpatterns = [
     # Patient management
     path('waiting-patients/', views.get_waiting_patients, name='get_waiting_patients'),
+    path('changes/', views.queue_changes, name='queue_changes'),
     path('start-consultation/', views.start_consultation, name='start_consultation'),
 
     # Consultation management
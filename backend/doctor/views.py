@@ -3,24 +3,56 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, Sum, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 # Import from patients app for shared access
-from patients.models import Patient, PatientStatusHistory
-from patients.serializers import PatientSearchSerializer
-
-from .models import Consultation, LabTestRequest, Prescription
+from core.caching import cached_response, changes_etag, etag_condition
+from core.fast_serializers import requested_fields, sparse_fieldsets
+from patients.models import Patient, PatientStatusHistory, Visit
+from patients.changes import parse_cursor, read_feed
+from patients.workflow import transition_patient, allowed_next_statuses, InvalidTransition, StaleTransition
+from patients.serializers import PatientSearchSerializer, patient_search_rows
+
+from .models import Consultation, LabTestRequest, LabOrderItem, Prescription
 from .serializers import (
-    ConsultationSerializer, ConsultationListSerializer,
+    ConsultationSerializer, consultation_list_rows,
     LabTestRequestSerializer, LabTestRequestCreateSerializer,
     PrescriptionSerializer, PrescriptionCreateSerializer,
     DoctorDashboardSerializer
 )
 
 
+def _waiting_patients_etag(request):
+    # Queue moves (visit), patient edits and the in-progress consultation
+    # shown next to each patient
+    waiting = Visit.objects.open().filter(status='WAITING_DOCTOR')
+    consultation_changed = Subquery(
+        Consultation.objects.filter(
+            patient_id=OuterRef('patient__patient_id'), status='IN_PROGRESS'
+        ).order_by('-updated_at').values('updated_at')[:1]
+    )
+    return changes_etag(
+        waiting, 'status_changed_at', 'patient__updated_at', consultation_changed,
+        scope=[request.query_params.get('priority', ''), timezone.now().date()]
+    )
+
+
+def _transition_conflict(error, patient):
+    """409 for a workflow move the patient's current status does not allow"""
+    return Response(
+        {
+            'error': str(error),
+            'current_status': patient.current_status,
+            'allowed_statuses': allowed_next_statuses(patient.current_status)
+        },
+        status=status.HTTP_409_CONFLICT
+    )
+
+
 @swagger_auto_schema(
     method='get',
     operation_summary="Get patients waiting for doctor",
@@ -52,6 +84,7 @@ from .serializers import (
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_condition(_waiting_patients_etag)
 def get_waiting_patients(request):
     """
     Get all patients waiting for doctor consultation.
@@ -61,28 +94,32 @@ def get_waiting_patients(request):
     Updates live as patient statuses change across the system.
     """
     try:
-        # Get all patients waiting for doctor (shared access)
-        waiting_patients_query = Patient.objects.filter(
-            current_status='WAITING_DOCTOR'
-        ).order_by('created_at')  # First come, first served
+        # Get all open visits waiting for doctor (shared access)
+        waiting_visits = Visit.objects.open().filter(
+            status='WAITING_DOCTOR'
+        ).order_by('status_changed_at')  # First come, first served
         
         # Filter by priority if specified
         priority_filter = request.query_params.get('priority')
         if priority_filter:
-            # Get consultations for these patients to check priority
-            patient_ids = [p.patient_id for p in waiting_patients_query]
             urgent_consultations = Consultation.objects.filter(
-                patient_id__in=patient_ids,
                 priority=priority_filter.upper(),
                 status='IN_PROGRESS'
-            ).values_list('patient_id', flat=True)
+            ).values('patient_id')
             
-            waiting_patients_query = waiting_patients_query.filter(
-                patient_id__in=urgent_consultations
+            waiting_visits = waiting_visits.filter(
+                patient__patient_id__in=urgent_consultations
             )
-        
         # Serialize patient data
-        waiting_patients = PatientSearchSerializer(waiting_patients_query, many=True).data
+        waiting_patients = []
+        for row in patient_search_rows.rows(
+            waiting_visits, prefix='patient__', extra=('id', 'status_changed_at')
+        ):
+            patient_data = patient_search_rows.to_representation(row)
+            visit_id, queued_at = row[-2:]
+            patient_data['visit_id'] = str(visit_id)
+            patient_data['queued_at'] = queued_at.isoformat()
+            waiting_patients.append(patient_data)
         
         # Add consultation info if exists
         for patient_data in waiting_patients:
@@ -174,9 +211,14 @@ def start_consultation(request):
         
         if existing_consultation:
             # Patient has consultation but wrong status - fix it
-            patient.current_status = 'WITH_DOCTOR'
-            patient.current_location = f"Consultation Room - Dr. {existing_consultation.doctor.full_name}"
-            patient.save()
+            transition_patient(
+                patient,
+                'WITH_DOCTOR',
+                request.user,
+                new_location=f"Consultation Room - Dr. {existing_consultation.doctor.full_name}",
+                notes='Status repaired: consultation already in progress',
+                force=True
+            )
             
             return Response({
                 'error': 'This patient already has a consultation in progress.',
@@ -202,29 +244,17 @@ def start_consultation(request):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        consultation = serializer.save(doctor=request.user)
-        
-        # Update patient status to WITH_DOCTOR using patients app API
-        from patients.models import PatientStatusHistory
-        
-        previous_status = patient.current_status
-        previous_location = patient.current_location
-        
-        patient.current_status = 'WITH_DOCTOR'
-        patient.current_location = f"Consultation Room - Dr. {request.user.full_name}"
-        patient.last_updated_by = request.user
-        patient.save()
-        
-        # Create status history
-        PatientStatusHistory.objects.create(
-            patient=patient,
-            previous_status=previous_status,
-            new_status='WITH_DOCTOR',
-            previous_location=previous_location,
-            new_location=patient.current_location,
-            changed_by=request.user,
-            notes=f"Consultation started by Dr. {request.user.full_name}"
-        )
+        # Claim the patient first: if another doctor started them in the
+        # meantime the version check fails and no consultation is created
+        with transaction.atomic():
+            transition_patient(
+                patient,
+                'WITH_DOCTOR',
+                request.user,
+                new_location=f"Consultation Room - Dr. {request.user.full_name}",
+                notes=f"Consultation started by Dr. {request.user.full_name}"
+            )
+            consultation = serializer.save(doctor=request.user)
         
         return Response({
             'message': 'Consultation started successfully',
@@ -237,6 +267,11 @@ def start_consultation(request):
             'started_at': consultation.consultation_date.isoformat()
         }, status=status.HTTP_201_CREATED)
         
+    except StaleTransition:
+        return Response(
+            {'error': 'Patient was just taken by another doctor. Refresh the queue.'},
+            status=status.HTTP_409_CONFLICT
+        )
     except Exception as e:
         return Response(
             {'error': f'Failed to start consultation: {str(e)}'},
@@ -367,7 +402,6 @@ def request_lab_test(request):
     """
     try:
         from finance.utils import create_pending_payment, get_pending_payment_for_service
-        from patients.models import Patient
         from decimal import Decimal
 
         # Add the requesting doctor to the data
@@ -378,25 +412,20 @@ def request_lab_test(request):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        lab_request = serializer.save(requested_by=request.user)
-
-        # Count requested tests
-        test_fields = [
-            'mrdt_requested', 'bs_requested', 'stool_analysis_requested',
-            'urine_sed_requested', 'urinalysis_requested', 'rpr_requested',
-            'h_pylori_requested', 'hepatitis_b_requested', 'hepatitis_c_requested',
-            'ssat_requested', 'upt_requested', 'esr_requested',
-            'blood_grouping_requested', 'hb_requested', 'rheumatoid_factor_requested',
-            'rbg_requested', 'fbg_requested', 'sickling_test_requested'
-        ]
+        # The request, its payment and the patient's move to Finance stand
+        # or fall together
+        with transaction.atomic():
+            lab_request = serializer.save(requested_by=request.user)
 
-        requested_tests = [field.replace('_requested', '').upper().replace('_', ' ')
-                          for field in test_fields if getattr(lab_request, field, False)]
+            # Order items are created by LabTestRequest.save()
+            requested_tests = [
+                code.replace('_', ' ')
+                for code in lab_request.items.values_list('test_code', flat=True)
+            ]
 
-        # Auto-create PENDING payment for lab tests if fee is required
-        payment_created = False
-        if lab_request.lab_fee_required:
-            try:
+            # Auto-create PENDING payment for lab tests if fee is required
+            payment_created = False
+            if lab_request.lab_fee_required:
                 patient = Patient.objects.get(patient_id=lab_request.patient_id)
 
                 # Check if payment already exists
@@ -411,7 +440,7 @@ def request_lab_test(request):
                     lab_fee = lab_request.lab_fee_amount or Decimal('25000.00')
 
                     # Create PENDING payment
-                    payment = create_pending_payment(
+                    create_pending_payment(
                         patient=patient,
                         service_type='LAB_TEST',
                         service_name=f'Laboratory Tests ({len(requested_tests)} tests)',
@@ -422,13 +451,13 @@ def request_lab_test(request):
                     payment_created = True
 
                     # Update patient status
-                    patient.current_status = 'PENDING_LAB_PAYMENT'
-                    patient.current_location = 'Finance - Lab Payment'
-                    patient.last_updated_by = request.user
-                    patient.save()
-
-            except Exception as payment_error:
-                print(f"Error creating lab payment: {payment_error}")
+                    transition_patient(
+                        patient,
+                        'PENDING_LAB_PAYMENT',
+                        request.user,
+                        new_location='Finance - Lab Payment',
+                        notes=f"Lab tests requested by Dr. {request.user.full_name}. Payment pending."
+                    )
 
         return Response({
             'message': 'Lab tests requested successfully',
@@ -445,6 +474,15 @@ def request_lab_test(request):
             'note': 'Patient must proceed to Finance for payment before lab processing' if payment_created else None
         }, status=status.HTTP_201_CREATED)
 
+    except Patient.DoesNotExist:
+        return Response(
+            {'error': 'Patient not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except InvalidTransition as e:
+        return _transition_conflict(e, patient)
+    except StaleTransition as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response(
             {'error': f'Failed to request lab tests: {str(e)}'},
@@ -463,6 +501,7 @@ def request_lab_test(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_response('patients', 'consultations', per_user=True)
 def doctor_dashboard(request):
     """
     Get doctor's dashboard with daily summary.
@@ -483,8 +522,8 @@ def doctor_dashboard(request):
         ).count()
         
         # Patients waiting for doctor (all doctors see same data)
-        patients_waiting = Patient.objects.filter(
-            current_status='WAITING_DOCTOR'
+        patients_waiting = Visit.objects.open().filter(
+            status='WAITING_DOCTOR'
         ).count()
         
         # Pending lab requests
@@ -498,13 +537,13 @@ def doctor_dashboard(request):
         ).count()
         
         # Recent consultations (last 5)
-        recent_consultations = Consultation.objects.select_related('doctor').order_by('-consultation_date')[:5]
+        recent_consultations = Consultation.objects.order_by('-consultation_date')[:5]
         
         # Urgent cases
         urgent_cases = Consultation.objects.filter(
             priority='URGENT',
             status='IN_PROGRESS'
-        ).select_related('doctor')[:5]
+        )[:5]
         
         dashboard_data = {
             'today_consultations': today_consultations,
@@ -512,8 +551,8 @@ def doctor_dashboard(request):
             'patients_waiting': patients_waiting,
             'lab_requests_pending': lab_requests_pending,
             'prescriptions_today': prescriptions_today,
-            'recent_consultations': ConsultationListSerializer(recent_consultations, many=True).data,
-            'urgent_cases': ConsultationListSerializer(urgent_cases, many=True).data,
+            'recent_consultations': consultation_list_rows.serialize(recent_consultations),
+            'urgent_cases': consultation_list_rows.serialize(urgent_cases),
         }
         
         return Response({
@@ -533,11 +572,20 @@ def doctor_dashboard(request):
     method='get',
     operation_summary="Get consultations",
     operation_description="Get all consultations for viewing in diagnoses page.",
+    manual_parameters=[
+        openapi.Parameter(
+            'fields', openapi.IN_QUERY,
+            description="Comma separated consultation fields to return (default: all)",
+            type=openapi.TYPE_STRING,
+            required=False
+        )
+    ],
     responses={200: openapi.Response(description="List of consultations")},
     tags=['Doctor Portal']
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@sparse_fieldsets(consultation_list_rows)
 def get_consultations(request):
     """Get consultations. Filter by patient_id if provided."""
     try:
@@ -548,11 +596,12 @@ def get_consultations(request):
         if patient_id:
             consultations = consultations.filter(patient_id=patient_id.upper())
 
-        consultations = consultations.order_by('-consultation_date')
-        serializer = ConsultationListSerializer(consultations, many=True)
+        consultations = consultation_list_rows.serialize(
+            consultations.order_by('-consultation_date'), requested_fields(request)
+        )
         return Response({
-            'consultations': serializer.data,
-            'count': len(serializer.data)
+            'consultations': consultations,
+            'count': len(consultations)
         })
     except Exception as e:
         return Response(
@@ -776,18 +825,21 @@ def complete_consultation(request):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Mark consultation as completed
-        consultation.status = 'COMPLETED'
-        consultation.completed_at = timezone.now()
-        consultation.save()
-
-        # Update patient status and create payment
         try:
-            from patients.models import Patient, PatientStatusHistory
             patient = Patient.objects.get(patient_id=consultation.patient_id)
+        except Patient.DoesNotExist:
+            return Response(
+                {'error': 'Patient not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-            previous_status = patient.current_status
-            previous_location = patient.current_location
+        # Completion, its payments and the patient's move to Finance stand
+        # or fall together
+        with transaction.atomic():
+            # Mark consultation as completed
+            consultation.status = 'COMPLETED'
+            consultation.completed_at = timezone.now()
+            consultation.save()
 
             # ALWAYS auto-create PENDING payment for consultation (required in workflow)
             payment_created = False
@@ -841,76 +893,16 @@ def complete_consultation(request):
                     else:
                         print(f"ℹ️ Medication payment already exists: {existing_med_payment.id}")
 
-            # Create lab test payment if there are lab requests
-            lab_requests = consultation.lab_requests.all()
-            if lab_requests.exists():
-                # Calculate total cost from specific test prices
-                from finance.models import ServicePricing
-
-                # Map test IDs to service codes
-                test_id_to_code = {
-                    'mrdt': 'LAB_MRDT',
-                    'bs': 'LAB_BS',
-                    'stool_macro': 'LAB_STOOL_ANALYSIS',
-                    'stool_micro': 'LAB_STOOL_ANALYSIS',
-                    'urine_sed_macro': 'LAB_URINE_SED',
-                    'urine_sed_micro': 'LAB_URINE_SED',
-                    'urinalysis': 'LAB_URINALYSIS',
-                    'rpr': 'LAB_RPR',
-                    'h_pylori': 'LAB_H_PYLORI',
-                    'hepatitis_b': 'LAB_HEPATITIS_B',
-                    'hepatitis_c': 'LAB_HEPATITIS_C',
-                    'ssat': 'LAB_SSAT',
-                    'upt': 'LAB_UPT',
-                    'glucose': 'LAB_BLOOD_SUGAR',
-                    'esr': 'LAB_ESR',
-                    'b_grouping': 'LAB_BLOOD_GROUPING',
-                    'hb': 'LAB_HB',
-                    'rheumatoid_factor': 'LAB_RF',
-                    'rbg': 'LAB_RBG',
-                    'fbg': 'LAB_FBG',
-                    'sickling_test': 'LAB_SICKLING_TEST',
-                }
-
-                total_lab_cost = Decimal('0')
-                test_names = []
-
-                # Map boolean fields to service codes
-                test_field_to_code = {
-                    'mrdt_requested': 'LAB_MRDT',
-                    'bs_requested': 'LAB_BS',
-                    'stool_analysis_requested': 'LAB_STOOL_ANALYSIS',
-                    'urine_sed_requested': 'LAB_URINE_SED',
-                    'urinalysis_requested': 'LAB_URINALYSIS',
-                    'rpr_requested': 'LAB_RPR',
-                    'h_pylori_requested': 'LAB_H_PYLORI',
-                    'hepatitis_b_requested': 'LAB_HEPATITIS_B',
-                    'hepatitis_c_requested': 'LAB_HEPATITIS_C',
-                    'ssat_requested': 'LAB_SSAT',
-                    'upt_requested': 'LAB_UPT',
-                    'esr_requested': 'LAB_ESR',
-                    'blood_grouping_requested': 'LAB_BLOOD_GROUPING',
-                    'hb_requested': 'LAB_HB',
-                    'rheumatoid_factor_requested': 'LAB_RF',
-                    'rbg_requested': 'LAB_RBG',
-                    'fbg_requested': 'LAB_FBG',
-                    'sickling_test_requested': 'LAB_SICKLING_TEST',
-                }
-
-                for lab_request in lab_requests:
-                    # Check each boolean field and add price if requested
-                    for field_name, service_code in test_field_to_code.items():
-                        if getattr(lab_request, field_name, False):
-                            pricing = ServicePricing.objects.filter(service_code=service_code).first()
-                            if pricing:
-                                total_lab_cost += pricing.standard_price
-                                test_names.append(pricing.service_name)
-                                print(f"  Adding {pricing.service_name}: {pricing.standard_price} TZS")
-                            else:
-                                # Fallback price if not in database
-                                total_lab_cost += Decimal('15000.00')
-                                test_names.append(field_name.replace('_requested', ''))
-                                print(f"  Warning: No pricing for {service_code}, using default 15000 TZS")
+            # Create lab test payment from the per-test prices fixed at request time
+            lab_items = LabOrderItem.objects.filter(
+                lab_request__consultation=consultation
+            ).exclude(status='CANCELLED')
+            lab_totals = lab_items.aggregate(total=Sum('price'), tests=Count('id'))
+            if lab_totals['tests']:
+                total_lab_cost = lab_totals['total'] or Decimal('0')
+                test_names = [
+                    code.replace('_', ' ') for code in lab_items.values_list('test_code', flat=True)
+                ]
 
                 if total_lab_cost > 0:
                     # Check if lab payment already exists
@@ -933,37 +925,63 @@ def complete_consultation(request):
                         print(f"ℹ️ Lab test payment already exists: {existing_lab_payment.id}")
 
             # Update patient status to indicate pending consultation payment
-            patient.current_status = 'PENDING_CONSULTATION_PAYMENT'
-            patient.current_location = 'Finance - Consultation Payment'
-            patient.last_updated_by = request.user
-            patient.save()
-
-            # Create status history
-            PatientStatusHistory.objects.create(
-                patient=patient,
-                previous_status=previous_status,
-                new_status='PENDING_CONSULTATION_PAYMENT',
-                previous_location=previous_location,
-                new_location=patient.current_location,
-                changed_by=request.user,
+            transition_patient(
+                patient,
+                'PENDING_CONSULTATION_PAYMENT',
+                request.user,
+                new_location='Finance - Consultation Payment',
                 notes=f"Consultation completed by Dr. {request.user.full_name}. Payment pending."
             )
-        except Exception as patient_error:
-            # Log the error but don't fail the consultation completion
-            print(f"Error updating patient status: {patient_error}")
 
         return Response({
             'message': 'Consultation completed successfully',
             'consultation_id': str(consultation.id),
             'patient_id': consultation.patient_id,
             'completed_at': consultation.completed_at.isoformat(),
-            'patient_status_updated': 'PENDING_CONSULTATION_PAYMENT',
+            'patient_status_updated': patient.current_status,
             'payment_created': payment_created,
             'note': 'Patient must proceed to Finance for payment before next service'
         })
 
+    except InvalidTransition as e:
+        return _transition_conflict(e, patient)
+    except StaleTransition as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response(
             {'error': f'Failed to complete consultation: {str(e)}'},
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Doctor queue changes",
+    operation_description="Patients that entered, changed in or left the doctor queue since ?since=<cursor>. Without a cursor the whole queue is returned with reset=true.",
+    manual_parameters=[
+        openapi.Parameter(
+            'since', openapi.IN_QUERY,
+            description="Cursor from the previous response",
+            type=openapi.TYPE_INTEGER,
+            required=False
+        )
+    ],
+    tags=['Doctor Portal']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def queue_changes(request):
+    """Doctor queue delta feed (see patients/changes.py)"""
+    try:
+        since = parse_cursor(request)
+    except ValueError:
+        return Response(
+            {'error': 'since must be a cursor returned by this endpoint'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    waiting = Patient.objects.filter(current_status='WAITING_DOCTOR').select_related('created_by')
+    return Response(read_feed(
+        'PATIENT', since, waiting,
+        lambda patients: PatientSearchSerializer(patients, many=True).data
+    ))
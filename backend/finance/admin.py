@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ServicePricing, ExpenseCategory, ExpenseRecord, StaffSalary
+from .models import ServicePricing, ExpenseCategory, ExpenseRecord, StaffSalary, NHIFClaimBatch, NHIFClaimLine
 
 # Only register the new expense models to avoid conflicts during migration
 # The existing PatientBill, BillLineItem, DailyBalance will be re-registered after migration
@@ -60,3 +60,36 @@ class StaffSalaryAdmin(admin.ModelAdmin):
     list_filter = ['payment_status', 'salary_month']
     ordering = ['-salary_month']
     readonly_fields = ['net_salary']
+
+
+class NHIFClaimLineInline(admin.TabularInline):
+    model = NHIFClaimLine
+    extra = 0
+    can_delete = False
+    raw_id_fields = ['payment']
+    readonly_fields = [
+        'payment', 'patient_id', 'patient_name', 'nhif_card_number', 'service_date',
+        'service_name', 'amount_claimed', 'status', 'amount_remitted', 'rejection_reason'
+    ]
+    fields = readonly_fields
+
+
+@admin.register(NHIFClaimBatch)
+class NHIFClaimBatchAdmin(admin.ModelAdmin):
+    list_display = [
+        'batch_number',
+        'period_start',
+        'period_end',
+        'status',
+        'line_count',
+        'total_claimed',
+        'total_remitted'
+    ]
+    list_filter = ['status', 'period_start']
+    search_fields = ['batch_number', 'remittance_reference']
+    ordering = ['-period_start']
+    readonly_fields = [
+        'batch_number', 'line_count', 'patient_count', 'total_claimed', 'total_remitted',
+        'submitted_at', 'submitted_by', 'remitted_at', 'created_by', 'created_at', 'updated_at'
+    ]
+    inlines = [NHIFClaimLineInline]
@@ -20,4 +20,5 @@ urlpatterns = [
     path('records/pending/', views.ExpenseRecordViewSet.as_view({'get': 'pending_approval'}), name='records-pending'),
     path('records/unpaid/', views.ExpenseRecordViewSet.as_view({'get': 'approved_unpaid'}), name='records-unpaid'),
     path('records/summary/', views.ExpenseRecordViewSet.as_view({'get': 'summary'}), name='records-summary'),
+    path('records/export/', views.ExpenseRecordViewSet.as_view({'get': 'export'}), name='records-export'),
 ]
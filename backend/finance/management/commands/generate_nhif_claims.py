@@ -0,0 +1,74 @@
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.nhif_claims import ClaimError, generate_claim_batch, previous_month
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Build the NHIF claim batch for a month (default: last month); schedule monthly from cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Employee ID recorded as the creator of the batch'
+        )
+        parser.add_argument(
+            '--month',
+            help='Month to claim as YYYY-MM (default: the previous month)'
+        )
+        parser.add_argument(
+            '--period-start',
+            help='First day to claim (YYYY-MM-DD), with --period-end instead of --month'
+        )
+        parser.add_argument(
+            '--period-end',
+            help='Last day to claim (YYYY-MM-DD)'
+        )
+
+    def _period(self, options):
+        if options['period_start'] or options['period_end']:
+            if not (options['period_start'] and options['period_end']):
+                raise CommandError('Give both --period-start and --period-end')
+            try:
+                return (
+                    date.fromisoformat(options['period_start']),
+                    date.fromisoformat(options['period_end']),
+                )
+            except ValueError as e:
+                raise CommandError(f'Invalid period date: {e}')
+
+        if options['month']:
+            try:
+                first = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must be YYYY-MM')
+            next_month = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+            return previous_month(next_month)
+
+        return previous_month()
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(employee_id=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with employee ID {options['user']}")
+
+        period_start, period_end = self._period(options)
+        try:
+            batch = generate_claim_batch(period_start, period_end, user)
+        except ClaimError as e:
+            raise CommandError(str(e))
+
+        if batch is None:
+            self.stdout.write(f'No unclaimed NHIF payments between {period_start} and {period_end}')
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{batch.batch_number}: {batch.line_count} lines for {batch.patient_count} patients, '
+            f'TZS {batch.total_claimed:,.2f} claimed'
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def link_open_visits(apps, schema_editor):
+    """Attach pending payments to the patient's open visit"""
+    ServicePayment = apps.get_model('finance', 'ServicePayment')
+    Visit = apps.get_model('patients', 'Visit')
+
+    ServicePayment.objects.filter(status='PENDING').update(
+        visit_id=Subquery(
+            Visit.objects.filter(
+                closed_at__isnull=True, patient__patient_id=OuterRef('patient_id')
+            ).values('id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0010_visits'),
+        ('finance', '0006_add_service_payment_only'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicepayment',
+            name='visit',
+            field=models.ForeignKey(blank=True, help_text='Check-in this payment was raised in', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='patients.visit'),
+        ),
+        migrations.AlterField(
+            model_name='servicepayment',
+            name='payment_method',
+            field=models.CharField(choices=[('CASH', 'Cash'), ('MOBILE_MONEY', 'Mobile Money'), ('BANK_TRANSFER', 'Bank Transfer'), ('NHIF', 'NHIF'), ('CREDIT', 'Credit/Deferred')], default='CASH', max_length=20),
+        ),
+        migrations.RunPython(link_open_visits, migrations.RunPython.noop),
+    ]
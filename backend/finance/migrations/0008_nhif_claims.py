@@ -0,0 +1,103 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:39
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('finance', '0007_servicepayment_visit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NHIFClaimBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('batch_number', models.CharField(help_text='CLM-YYYYMM-NN', max_length=30, unique=True)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('SUBMITTED', 'Submitted to NHIF'), ('PARTIALLY_PAID', 'Partially Remitted'), ('PAID', 'Fully Remitted'), ('REJECTED', 'Rejected')], default='DRAFT', max_length=20)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('patient_count', models.PositiveIntegerField(default=0)),
+                ('total_claimed', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_remitted', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('remittance_reference', models.CharField(blank=True, default='', max_length=100)),
+                ('remitted_at', models.DateTimeField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'nhif_claim_batches',
+                'ordering': ['-period_start', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NHIFClaimLine',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('patient_id', models.CharField(max_length=20)),
+                ('patient_name', models.CharField(max_length=100)),
+                ('nhif_card_number', models.CharField(blank=True, default='', max_length=50)),
+                ('service_type', models.CharField(max_length=20)),
+                ('service_name', models.CharField(max_length=200)),
+                ('service_date', models.DateField()),
+                ('receipt_number', models.CharField(blank=True, default='', max_length=50)),
+                ('amount_claimed', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('CLAIMED', 'Claimed'), ('PAID', 'Remitted'), ('REJECTED', 'Rejected')], default='CLAIMED', max_length=10)),
+                ('amount_remitted', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('rejection_reason', models.CharField(blank=True, default='', max_length=200)),
+            ],
+            options={
+                'db_table': 'nhif_claim_lines',
+                'ordering': ['service_date', 'patient_id', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='servicepayment',
+            index=models.Index(condition=models.Q(('payment_method', 'NHIF'), ('status', 'PAID')), fields=['payment_date'], name='nhif_claimable_payment_idx'),
+        ),
+        migrations.AddField(
+            model_name='nhifclaimline',
+            name='batch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='finance.nhifclaimbatch'),
+        ),
+        migrations.AddField(
+            model_name='nhifclaimline',
+            name='payment',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='nhif_claim_line', to='finance.servicepayment'),
+        ),
+        migrations.AddField(
+            model_name='nhifclaimbatch',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='nhif_claims_created', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='nhifclaimbatch',
+            name='submitted_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='nhif_claims_submitted', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='nhifclaimline',
+            index=models.Index(fields=['batch', 'status'], name='nhif_claim__batch_i_9f1080_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nhifclaimline',
+            index=models.Index(fields=['batch', 'service_date', 'patient_id'], name='nhif_claim__batch_i_e13f12_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nhifclaimbatch',
+            index=models.Index(fields=['status', '-period_start'], name='nhif_claim__status_dc0c90_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nhifclaimbatch',
+            index=models.Index(fields=['period_start', 'period_end'], name='nhif_claim__period__eb91ec_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 import uuid
 from decimal import Decimal
 
+from core.mixins import DirtyFieldsMixin
+
 User = get_user_model()
 
 
@@ -566,7 +568,7 @@ class RevenueRecord(models.Model):
 # ==============================================================================
 
 
-class ServicePayment(models.Model):
+class ServicePayment(DirtyFieldsMixin, models.Model):
     """
     Unified payment tracking for all hospital services.
     Links to specific service records (consultations, lab requests, etc.)
@@ -613,6 +615,14 @@ class ServicePayment(models.Model):
         null=True,
         help_text='Reference to consultation_id, lab_request_id, etc.'
     )
+    visit = models.ForeignKey(
+        'patients.Visit',
+        on_delete=models.SET_NULL,
+        related_name='payments',
+        null=True,
+        blank=True,
+        help_text='Check-in this payment was raised in'
+    )
 
     # Payment details
     amount = models.DecimalField(
@@ -667,12 +677,27 @@ class ServicePayment(models.Model):
             models.Index(fields=['service_type', 'status']),
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['payment_date']),
+            # NHIF claim generation scans settled NHIF services by date
+            models.Index(
+                fields=['payment_date'],
+                name='nhif_claimable_payment_idx',
+                condition=models.Q(payment_method='NHIF', status='PAID')
+            ),
         ]
 
     def __str__(self):
         return f"{self.service_name} - {self.patient_name} ({self.amount} TZS) - {self.status}"
 
     def save(self, *args, **kwargs):
+        # Attach new payments to the patient's open visit
+        if self._state.adding and self.visit_id is None:
+            from patients.models import Visit
+            self.visit_id = Visit.objects.open_visit_id(self.patient_id)
+
+        # Payment date and receipt only depend on status; skip when untouched
+        if not self.is_dirty('status', 'payment_date', 'receipt_number'):
+            return super().save(*args, **kwargs)
+
         # Set payment date when status changes to PAID
         if self.status == 'PAID' and not self.payment_date:
             self.payment_date = timezone.now()
@@ -699,3 +724,114 @@ class ServicePayment(models.Model):
     def amount_formatted(self):
         """Format amount with currency"""
         return f"{self.amount:,.2f} TZS"
+
+
+class NHIFClaimBatch(models.Model):
+    """
+    One NHIF claim submission: the NHIF-covered services of a period,
+    tracked from generation through submission to remittance.
+    """
+
+    STATUS_CHOICES = [
+        ('DRAFT', 'Draft'),
+        ('SUBMITTED', 'Submitted to NHIF'),
+        ('PARTIALLY_PAID', 'Partially Remitted'),
+        ('PAID', 'Fully Remitted'),
+        ('REJECTED', 'Rejected'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    batch_number = models.CharField(max_length=30, unique=True, help_text='CLM-YYYYMM-NN')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
+
+    # Totals, kept in step with the lines
+    line_count = models.PositiveIntegerField(default=0)
+    patient_count = models.PositiveIntegerField(default=0)
+    total_claimed = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_remitted = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    # Submission and remittance
+    submitted_at = models.DateTimeField(blank=True, null=True)
+    submitted_by = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        related_name='nhif_claims_submitted',
+        null=True,
+        blank=True
+    )
+    remittance_reference = models.CharField(max_length=100, blank=True, default='')
+    remitted_at = models.DateTimeField(blank=True, null=True)
+    notes = models.TextField(blank=True, default='')
+
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        related_name='nhif_claims_created'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'nhif_claim_batches'
+        ordering = ['-period_start', '-created_at']
+        indexes = [
+            models.Index(fields=['status', '-period_start']),
+            models.Index(fields=['period_start', 'period_end']),
+        ]
+
+    def __str__(self):
+        return f"{self.batch_number} ({self.period_start} to {self.period_end}) - {self.status}"
+
+    @property
+    def outstanding_amount(self):
+        return self.total_claimed - self.total_remitted
+
+
+class NHIFClaimLine(models.Model):
+    """One NHIF-covered ServicePayment claimed in a batch"""
+
+    STATUS_CHOICES = [
+        ('CLAIMED', 'Claimed'),
+        ('PAID', 'Remitted'),
+        ('REJECTED', 'Rejected'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    batch = models.ForeignKey(
+        NHIFClaimBatch,
+        on_delete=models.CASCADE,
+        related_name='lines'
+    )
+    # A payment is claimed at most once
+    payment = models.OneToOneField(
+        ServicePayment,
+        on_delete=models.PROTECT,
+        related_name='nhif_claim_line'
+    )
+
+    # Copied from the payment and patient for the claim file
+    patient_id = models.CharField(max_length=20)
+    patient_name = models.CharField(max_length=100)
+    nhif_card_number = models.CharField(max_length=50, blank=True, default='')
+    service_type = models.CharField(max_length=20)
+    service_name = models.CharField(max_length=200)
+    service_date = models.DateField()
+    receipt_number = models.CharField(max_length=50, blank=True, default='')
+    amount_claimed = models.DecimalField(max_digits=10, decimal_places=2)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='CLAIMED')
+    amount_remitted = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    rejection_reason = models.CharField(max_length=200, blank=True, default='')
+
+    class Meta:
+        db_table = 'nhif_claim_lines'
+        ordering = ['service_date', 'patient_id', 'id']
+        indexes = [
+            models.Index(fields=['batch', 'status']),
+            models.Index(fields=['batch', 'service_date', 'patient_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.batch.batch_number}: {self.patient_id} {self.service_name} ({self.amount_claimed} TZS)"
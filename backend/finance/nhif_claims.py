@@ -0,0 +1,214 @@
+"""
+NHIF claims engine.
+
+create_pending_payment() marks services for NHIF patients with
+payment_method='NHIF'; once settled (status PAID) they are claimable.
+generate_claim_batch() collects every unclaimed NHIF payment of a period
+in one indexed query (patient card numbers joined in the same statement)
+and bulk inserts the claim lines in chunks, so a month of tens of
+thousands of services is a few statements. A payment is claimed at most
+once (one-to-one line), so services settled late fall into the next
+batch for their period. Batches then move DRAFT -> SUBMITTED ->
+PARTIALLY_PAID / PAID / REJECTED as the remittance comes in.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Exists, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from patients.models import Patient
+from .models import NHIFClaimBatch, NHIFClaimLine, ServicePayment
+
+# Advisory lock key serialising claim generation
+NHIF_CLAIM_LOCK_KEY = 7303
+LINE_CHUNK_SIZE = 5000
+
+REMITTABLE_STATUSES = ['SUBMITTED', 'PARTIALLY_PAID']
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+class ClaimError(Exception):
+    """Raised when a batch is not in a state that allows the requested step"""
+
+
+def previous_month(today=None):
+    """(first day, last day) of the month before today"""
+    today = today or timezone.localdate()
+    period_end = today.replace(day=1) - timedelta(days=1)
+    return period_end.replace(day=1), period_end
+
+
+def _period_bounds(period_start, period_end):
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(period_start, time.min), tz),
+        timezone.make_aware(datetime.combine(period_end + timedelta(days=1), time.min), tz),
+    )
+
+
+def claimable_payments(period_start, period_end):
+    """Settled NHIF payments in the period that are not on a claim yet"""
+    start, end = _period_bounds(period_start, period_end)
+    return ServicePayment.objects.filter(
+        payment_method='NHIF',
+        status='PAID',
+        payment_date__gte=start,
+        payment_date__lt=end,
+    ).filter(
+        ~Exists(NHIFClaimLine.objects.filter(payment=OuterRef('pk')))
+    )
+
+
+def _next_batch_number(period_start):
+    # Called under NHIF_CLAIM_LOCK_KEY
+    prefix = f"CLM-{period_start:%Y%m}-"
+    count = NHIFClaimBatch.objects.filter(batch_number__startswith=prefix).count()
+    return f"{prefix}{count + 1:02d}"
+
+
+def refresh_batch_totals(batch):
+    """Recompute a batch's counts and amounts from its lines with one aggregate"""
+    totals = batch.lines.aggregate(
+        line_count=Count('id'),
+        patient_count=Count('patient_id', distinct=True),
+        total_claimed=Coalesce(Sum('amount_claimed'), Value(0), output_field=AMOUNT_FIELD),
+        total_remitted=Coalesce(Sum('amount_remitted'), Value(0), output_field=AMOUNT_FIELD),
+    )
+    NHIFClaimBatch.objects.filter(pk=batch.pk).update(updated_at=timezone.now(), **totals)
+    for name, value in totals.items():
+        setattr(batch, name, value)
+    return batch
+
+
+def generate_claim_batch(period_start, period_end, user):
+    """
+    Claim every unclaimed NHIF service of [period_start, period_end].
+
+    Returns:
+        NHIFClaimBatch or None: None when there is nothing to claim
+    """
+    if period_end < period_start:
+        raise ClaimError('period_end must not be before period_start')
+
+    rows = claimable_payments(period_start, period_end).annotate(
+        card_number=Coalesce(
+            Subquery(
+                Patient.objects.filter(patient_id=OuterRef('patient_id')).values('nhif_card_number')[:1]
+            ),
+            Value('')
+        )
+    ).order_by('payment_date', 'id').values_list(
+        'id', 'patient_id', 'patient_name', 'card_number', 'service_type',
+        'service_name', 'payment_date', 'receipt_number', 'amount'
+    )
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [NHIF_CLAIM_LOCK_KEY])
+
+        batch = None
+        lines = []
+        for payment_id, patient_id, patient_name, card_number, service_type, \
+                service_name, payment_date, receipt_number, amount in rows.iterator(chunk_size=LINE_CHUNK_SIZE):
+            if batch is None:
+                batch = NHIFClaimBatch.objects.create(
+                    batch_number=_next_batch_number(period_start),
+                    period_start=period_start,
+                    period_end=period_end,
+                    created_by=user,
+                )
+            lines.append(NHIFClaimLine(
+                batch=batch,
+                payment_id=payment_id,
+                patient_id=patient_id,
+                patient_name=patient_name,
+                nhif_card_number=card_number or '',
+                service_type=service_type,
+                service_name=service_name,
+                service_date=timezone.localtime(payment_date).date(),
+                receipt_number=receipt_number or '',
+                amount_claimed=amount,
+            ))
+            if len(lines) >= LINE_CHUNK_SIZE:
+                NHIFClaimLine.objects.bulk_create(lines)
+                lines = []
+
+        if batch is None:
+            return None
+        if lines:
+            NHIFClaimLine.objects.bulk_create(lines)
+        refresh_batch_totals(batch)
+
+    return batch
+
+
+def submit_batch(batch, user):
+    """Mark a draft batch as submitted to NHIF"""
+    now = timezone.now()
+    updated = NHIFClaimBatch.objects.filter(pk=batch.pk, status='DRAFT').update(
+        status='SUBMITTED', submitted_at=now, submitted_by=user, updated_at=now
+    )
+    if not updated:
+        raise ClaimError(f'Only draft batches can be submitted ({batch.batch_number} is {batch.status})')
+    batch.refresh_from_db()
+    return batch
+
+
+def record_remittance(batch, reference, lines=(), settle_remaining=False):
+    """
+    Apply an NHIF remittance advice to a submitted batch.
+
+    Args:
+        batch: NHIFClaimBatch in SUBMITTED or PARTIALLY_PAID
+        reference (str): Remittance / payment reference from NHIF
+        lines: dicts with line_id, status (PAID or REJECTED) and optionally
+            amount_remitted (defaults to the claimed amount for PAID, 0 for
+            REJECTED) and rejection_reason
+        settle_remaining (bool): Pay every line still CLAIMED in full
+
+    Raises:
+        ClaimError: Batch not awaiting remittance, or unknown line ids
+    """
+    with transaction.atomic():
+        batch = NHIFClaimBatch.objects.select_for_update().get(pk=batch.pk)
+        if batch.status not in REMITTABLE_STATUSES:
+            raise ClaimError(f'{batch.batch_number} is {batch.status}; remittance needs a submitted batch')
+
+        advice = {int(line['line_id']): line for line in lines}
+        claim_lines = list(batch.lines.filter(id__in=list(advice)).only(
+            'id', 'amount_claimed', 'status', 'amount_remitted', 'rejection_reason'
+        ))
+        missing = set(advice) - {line.id for line in claim_lines}
+        if missing:
+            raise ClaimError(f'Lines not in {batch.batch_number}: {sorted(missing)}')
+
+        for line in claim_lines:
+            entry = advice[line.id]
+            line.status = entry['status']
+            if entry.get('amount_remitted') is not None:
+                line.amount_remitted = entry['amount_remitted']
+            else:
+                line.amount_remitted = line.amount_claimed if line.status == 'PAID' else 0
+            line.rejection_reason = (entry.get('rejection_reason') or '')[:200]
+        NHIFClaimLine.objects.bulk_update(
+            claim_lines, ['status', 'amount_remitted', 'rejection_reason'], batch_size=1000
+        )
+
+        if settle_remaining:
+            batch.lines.filter(status='CLAIMED').update(status='PAID', amount_remitted=F('amount_claimed'))
+
+        refresh_batch_totals(batch)
+        open_lines = batch.lines.filter(status='CLAIMED').exists()
+        if open_lines:
+            batch.status = 'PARTIALLY_PAID' if batch.total_remitted else 'SUBMITTED'
+        else:
+            batch.status = 'PAID' if batch.total_remitted else 'REJECTED'
+        batch.remittance_reference = reference[:100]
+        batch.remitted_at = timezone.now()
+        batch.save(update_fields=['status', 'remittance_reference', 'remitted_at', 'updated_at'])
+
+    return batch
@@ -12,4 +12,5 @@ urlpatterns = [
     path('salaries/pending/', views.StaffSalaryViewSet.as_view({'get': 'pending_payment'}), name='salaries-pending'),
     path('salaries/summary/', views.StaffSalaryViewSet.as_view({'get': 'payroll_summary'}), name='salaries-summary'),
     path('salaries/breakdown/', views.StaffSalaryViewSet.as_view({'get': 'payment_status_breakdown'}), name='salaries-breakdown'),
+    path('salaries/export/', views.StaffSalaryViewSet.as_view({'get': 'export'}), name='salaries-export'),
 ]
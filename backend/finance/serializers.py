@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import ServicePricing, ExpenseCategory, ExpenseRecord, StaffSalary, ServicePayment
+from core.fast_serializers import ValuesSerializer, choice_display
+from .models import (
+    ServicePricing, ExpenseCategory, ExpenseRecord, StaffSalary, ServicePayment,
+    NHIFClaimBatch, NHIFClaimLine
+)
 
 
 class ServicePricingSerializer(serializers.ModelSerializer):
@@ -143,3 +147,72 @@ class ServicePaymentSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Payment amount must be greater than zero.")
         return value
+
+
+# values() fast path for payment lists (core/fast_serializers.py)
+service_payment_rows = ValuesSerializer(
+    ServicePaymentSerializer,
+    service_type_display=choice_display(ServicePayment, 'service_type'),
+    status_display=choice_display(ServicePayment, 'status'),
+)
+
+
+class NHIFClaimLineSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = NHIFClaimLine
+        fields = [
+            'id', 'payment', 'patient_id', 'patient_name', 'nhif_card_number',
+            'service_type', 'service_name', 'service_date', 'receipt_number',
+            'amount_claimed', 'status', 'status_display', 'amount_remitted', 'rejection_reason'
+        ]
+        read_only_fields = fields
+
+
+class NHIFClaimBatchSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
+    submitted_by_name = serializers.CharField(source='submitted_by.full_name', read_only=True, default=None)
+    outstanding_amount = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = NHIFClaimBatch
+        fields = [
+            'id', 'batch_number', 'period_start', 'period_end', 'status', 'status_display',
+            'line_count', 'patient_count', 'total_claimed', 'total_remitted', 'outstanding_amount',
+            'submitted_at', 'submitted_by', 'submitted_by_name', 'remittance_reference',
+            'remitted_at', 'notes', 'created_by', 'created_by_name', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class NHIFClaimGenerateSerializer(serializers.Serializer):
+    """Claim period; both dates or neither (previous month)"""
+    period_start = serializers.DateField(required=False)
+    period_end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if ('period_start' in data) != ('period_end' in data):
+            raise serializers.ValidationError("Give both period_start and period_end, or neither.")
+        if 'period_start' in data and data['period_end'] < data['period_start']:
+            raise serializers.ValidationError("period_end must not be before period_start.")
+        return data
+
+
+class NHIFRemittanceLineSerializer(serializers.Serializer):
+    line_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['PAID', 'REJECTED'])
+    amount_remitted = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, min_value=0)
+    rejection_reason = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+
+class NHIFRemittanceSerializer(serializers.Serializer):
+    reference = serializers.CharField(max_length=100)
+    lines = NHIFRemittanceLineSerializer(many=True, required=False)
+    settle_remaining = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if not data.get('lines') and not data.get('settle_remaining'):
+            raise serializers.ValidationError("Provide remittance lines or set settle_remaining.")
+        return data
@@ -1,3 +1,195 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from doctor.models import Consultation, Prescription
+from patients.models import Patient
+from patients.workflow import StaleTransition
+from pharmacy.models import PrescriptionQueue
+
+from .models import ServicePayment
+from .nhif_claims import ClaimError, generate_claim_batch, record_remittance, submit_batch
+
+User = get_user_model()
+
+
+class MarkPaidTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cashier = User.objects.create_user(
+            password='test-pass-123', full_name='Rehema Cashier', email='cashier@example.com',
+            phone_number='+255700000302', role='FINANCE', is_active=True, is_approved=True,
+        )
+        cls.patient = Patient.objects.create(
+            first_name='Asha', last_name='Juma', phone_number='+255711000003', gender='FEMALE',
+            date_of_birth=date(1990, 2, 28), current_status='PENDING_CONSULTATION_PAYMENT',
+            created_by=cls.cashier,
+        )
+
+    def setUp(self):
+        self.payment = ServicePayment.objects.create(
+            patient_id=self.patient.patient_id, patient_name=self.patient.full_name,
+            service_type='CONSULTATION', service_name='Doctor Consultation - General',
+            amount=Decimal('5000.00'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+
+    def _mark_paid(self):
+        return self.client.post(f'/api/finance/payments/{self.payment.id}/mark-paid/', {}, format='json')
+
+    def test_moves_patient_on(self):
+        response = self._mark_paid()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['patient_status_updated'])
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.current_status, 'CONSULTATION_PAID')
+
+    def test_closed_visit_is_settled_without_a_move(self):
+        Patient.objects.filter(pk=self.patient.pk).update(current_status='COMPLETED')
+
+        response = self._mark_paid()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['patient_status_updated'])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'PAID')
+
+    def test_stale_patient_leaves_payment_unpaid(self):
+        with mock.patch('patients.workflow.transition_patient', side_effect=StaleTransition('changed')):
+            response = self._mark_paid()
+
+        self.assertEqual(response.status_code, 409)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'PENDING')
+
+    def _medication_payment(self):
+        consultation = Consultation.objects.create(
+            patient_id=self.patient.patient_id, patient_name=self.patient.full_name,
+            doctor=self.cashier, chief_complaint='Fever',
+        )
+        Prescription.objects.create(
+            consultation=consultation, medication_name='Paracetamol 500mg', strength='500mg',
+            dosage_form='tablet', frequency='THREE_TIMES_DAILY', dosage_instructions='After meals',
+            duration='5 days', quantity_prescribed=15, prescribed_by=self.cashier,
+        )
+        self.payment = ServicePayment.objects.create(
+            patient_id=self.patient.patient_id, patient_name=self.patient.full_name,
+            service_type='MEDICATION', service_name='Prescription', reference_id=str(consultation.id),
+            amount=Decimal('1500.00'),
+        )
+        return consultation
+
+    def test_prescriptions_are_queued_after_commit(self):
+        consultation = self._medication_payment()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self._mark_paid()
+            self.assertFalse(PrescriptionQueue.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            PrescriptionQueue.objects.filter(consultation_id=str(consultation.id)).exists()
+        )
+
+    def test_feeder_failure_is_logged_and_payment_stands(self):
+        self._medication_payment()
+
+        with mock.patch('pharmacy.feeder.queue_consultation_prescriptions', side_effect=RuntimeError('down')), \
+                self.assertLogs('finance.views', level='ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self._mark_paid()
+
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'PAID')
+
+
+class NHIFClaimsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.officer = User.objects.create_user(
+            password='test-pass-123', full_name='Claims Officer', email='claims@example.com',
+            phone_number='+255700000303', role='FINANCE',
+        )
+        cls.patient = Patient.objects.create(
+            first_name='Baraka', last_name='Mollel', phone_number='+255711000004', gender='MALE',
+            date_of_birth=date(1985, 7, 1), patient_type='NHIF', nhif_card_number='NH00000009',
+            created_by=cls.officer,
+        )
+
+    def _payment(self, day, amount, method='NHIF', status='PAID'):
+        return ServicePayment.objects.create(
+            patient_id=self.patient.patient_id, patient_name=self.patient.full_name,
+            service_type='CONSULTATION', service_name='Doctor Consultation - General',
+            amount=Decimal(amount), payment_method=method, status=status,
+            payment_date=timezone.make_aware(datetime(2026, 9, day, 10)),
+        )
+
+    def _generate(self):
+        return generate_claim_batch(date(2026, 9, 1), date(2026, 9, 30), self.officer)
+
+    def test_payment_is_claimed_once(self):
+        self._payment(3, '5000.00')
+        self._payment(17, '12000.00')
+        self._payment(5, '3000.00', method='CASH')
+        self._payment(6, '3000.00', status='PENDING')
+
+        batch = self._generate()
+
+        self.assertEqual(batch.batch_number, 'CLM-202609-01')
+        self.assertEqual((batch.line_count, batch.patient_count), (2, 1))
+        self.assertEqual(batch.total_claimed, Decimal('17000.00'))
+        self.assertEqual(set(batch.lines.values_list('nhif_card_number', flat=True)), {'NH00000009'})
+        self.assertIsNone(self._generate())
+
+        # Settled after the first batch: claimed in the next one, alone
+        late = self._payment(28, '4000.00')
+        second = self._generate()
+
+        self.assertEqual(second.batch_number, 'CLM-202609-02')
+        self.assertEqual(list(second.lines.values_list('payment_id', flat=True)), [late.id])
+
+    def test_remittance_rolls_up_batch_status(self):
+        for day in (3, 4, 5):
+            self._payment(day, '5000.00')
+        batch = self._generate()
+        paid, rejected, open_line = batch.lines.order_by('service_date')
+
+        with self.assertRaises(ClaimError):
+            record_remittance(batch, 'RA-0')
+
+        submit_batch(batch, self.officer)
+        batch = record_remittance(batch, 'RA-1', lines=[
+            {'line_id': paid.id, 'status': 'PAID'},
+            {'line_id': rejected.id, 'status': 'REJECTED', 'rejection_reason': 'Card expired'},
+        ])
+
+        self.assertEqual(batch.status, 'PARTIALLY_PAID')
+        self.assertEqual(batch.total_remitted, Decimal('5000.00'))
+
+        batch = record_remittance(batch, 'RA-2', settle_remaining=True)
+
+        self.assertEqual(batch.status, 'PAID')
+        self.assertEqual(batch.total_remitted, Decimal('10000.00'))
+        open_line.refresh_from_db()
+        self.assertEqual(open_line.amount_remitted, Decimal('5000.00'))
+
+    def test_fully_rejected_batch(self):
+        self._payment(3, '5000.00')
+        batch = submit_batch(self._generate(), self.officer)
+
+        batch = record_remittance(batch, 'RA-1', lines=[
+            {'line_id': batch.lines.get().id, 'status': 'REJECTED'},
+        ])
 
-# Create your tests here.
+        self.assertEqual(batch.status, 'REJECTED')
+        self.assertEqual(batch.total_remitted, Decimal('0'))
@@ -15,7 +15,9 @@ urlpatterns = [
     # Payment processing for consultations, lab tests, and other services
     # Specific action URLs first (before generic patterns)
     path('payments/pending/', views.ServicePaymentViewSet.as_view({'get': 'pending_payments'}), name='payments-pending'),
+    path('changes/', views.ServicePaymentViewSet.as_view({'get': 'changes'}), name='payments-changes'),
     path('payments/by-service-type/', views.ServicePaymentViewSet.as_view({'get': 'by_service_type'}), name='payments-by-service-type'),
+    path('payments/export/', views.ServicePaymentViewSet.as_view({'get': 'export'}), name='payments-export'),
     path('payments/consultation/', views.ServicePaymentViewSet.as_view({'post': 'process_consultation_payment'}), name='payments-consultation'),
     path('payments/lab-test/', views.ServicePaymentViewSet.as_view({'post': 'process_lab_payment'}), name='payments-lab-test'),
     # Generic CRUD patterns last
@@ -23,12 +25,26 @@ urlpatterns = [
     path('payments/<str:pk>/', views.ServicePaymentViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='payments-detail'),
     path('payments/<str:pk>/mark-paid/', views.ServicePaymentViewSet.as_view({'post': 'mark_paid'}), name='payments-mark-paid'),
 
+    # ==================== NHIF CLAIMS ====================
+    # Monthly claim batches over settled NHIF payments
+    path('nhif-claims/', views.NHIFClaimBatchViewSet.as_view({'get': 'list'}), name='nhif-claims-list'),
+    path('nhif-claims/generate/', views.NHIFClaimBatchViewSet.as_view({'post': 'generate'}), name='nhif-claims-generate'),
+    path('nhif-claims/<int:pk>/', views.NHIFClaimBatchViewSet.as_view({'get': 'retrieve'}), name='nhif-claims-detail'),
+    path('nhif-claims/<int:pk>/lines/', views.NHIFClaimBatchViewSet.as_view({'get': 'lines'}), name='nhif-claims-lines'),
+    path('nhif-claims/<int:pk>/submit/', views.NHIFClaimBatchViewSet.as_view({'post': 'submit'}), name='nhif-claims-submit'),
+    path('nhif-claims/<int:pk>/remittance/', views.NHIFClaimBatchViewSet.as_view({'post': 'remittance'}), name='nhif-claims-remittance'),
+    path('nhif-claims/<int:pk>/export/', views.NHIFClaimBatchViewSet.as_view({'get': 'export'}), name='nhif-claims-export'),
+
     # ==================== EXPENSE MANAGEMENT ====================
     # Expense categories and records (commented out from original - can be added later)
     # path('expenses/categories/', views.ExpenseCategoryViewSet.as_view({'get': 'list', 'post': 'create'}), name='expense-categories'),
     # path('expenses/records/', views.ExpenseRecordViewSet.as_view({'get': 'list', 'post': 'create'}), name='expense-records'),
+    # Streaming export (accepts the ExpenseRecordFilter query params)
+    path('expenses/records/export/', views.ExpenseRecordViewSet.as_view({'get': 'export'}), name='expense-records-export'),
 
     # ==================== PAYROLL MANAGEMENT ====================
     # Staff salary management (commented out from original - can be added later)
     # path('payroll/', views.StaffSalaryViewSet.as_view({'get': 'list', 'post': 'create'}), name='payroll-list'),
+    # Streaming export (accepts the StaffSalaryFilter query params)
+    path('payroll/export/', views.StaffSalaryViewSet.as_view({'get': 'export'}), name='payroll-export'),
 ]
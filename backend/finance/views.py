@@ -1,7 +1,10 @@
+import logging
+
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -9,15 +12,39 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
 import django_filters
 
+from core.caching import cached_response
+from core.fast_serializers import requested_fields, sparse_fieldsets
 from core.permissions import IsAdminUser, IsStaffMember
-from .models import ServicePricing, ExpenseCategory, ExpenseRecord, StaffSalary, ServicePayment
+from .models import ServicePricing, ExpenseCategory, ExpenseRecord, StaffSalary, ServicePayment, NHIFClaimBatch
+from .exports import (
+    export_response, SERVICE_PAYMENT_EXPORT_COLUMNS, EXPENSE_EXPORT_COLUMNS, STAFF_SALARY_EXPORT_COLUMNS,
+    NHIF_CLAIM_EXPORT_COLUMNS
+)
+from patients.changes import parse_cursor, read_feed
+from .nhif_claims import ClaimError, generate_claim_batch, previous_month, record_remittance, submit_batch
 from .serializers import (
     ServicePricingSerializer, ExpenseCategorySerializer,
     ExpenseRecordSerializer, StaffSalarySerializer,
     ExpenseSummarySerializer, PayrollSummarySerializer,
-    PaymentStatusBreakdownSerializer, ServicePaymentSerializer
+    PaymentStatusBreakdownSerializer, ServicePaymentSerializer, service_payment_rows,
+    NHIFClaimBatchSerializer, NHIFClaimLineSerializer,
+    NHIFClaimGenerateSerializer, NHIFRemittanceSerializer
 )
 
+logger = logging.getLogger(__name__)
+
+
+def _queue_prescriptions(consultation):
+    """Send a paid consultation's prescriptions to the pharmacy queue"""
+    from pharmacy.feeder import queue_consultation_prescriptions
+
+    try:
+        queue_consultation_prescriptions(consultation)
+    except Exception:
+        # The payment has committed; the feeder is idempotent, so the
+        # consultation can be queued again once the cause is fixed
+        logger.exception('Could not queue prescriptions for consultation %s', consultation.id)
+
 
 # Service Pricing Views (Admin Only)
 
@@ -52,6 +79,7 @@ class ServicePricingViewSet(viewsets.ModelViewSet):
         serializer.save(created_by=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response('pricing', timeout=300)
     def active_services(self, request):
         """Get all active services for frontend selection"""
         active_services = self.get_queryset().filter(is_active=True)
@@ -59,6 +87,7 @@ class ServicePricingViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_response('pricing', timeout=300)
     def by_category(self, request):
         """Get services grouped by category"""
         categories = self.get_queryset().values_list('service_category', flat=True).distinct()
@@ -230,6 +259,19 @@ class ExpenseRecordViewSet(viewsets.ModelViewSet):
         serializer = ExpenseSummarySerializer(summary_data, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream filtered expense records as CSV/XLSX (?file_format=csv|xlsx)"""
+        try:
+            return export_response(
+                self.filter_queryset(self.get_queryset()),
+                EXPENSE_EXPORT_COLUMNS,
+                'expenses',
+                request.query_params.get('file_format', 'csv')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 
 # Payroll Views
 
@@ -356,6 +398,19 @@ class StaffSalaryViewSet(viewsets.ModelViewSet):
         serializer = PaymentStatusBreakdownSerializer(breakdown_data, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream filtered salaries as CSV/XLSX (?file_format=csv|xlsx)"""
+        try:
+            return export_response(
+                self.filter_queryset(self.get_queryset()),
+                STAFF_SALARY_EXPORT_COLUMNS,
+                'payroll',
+                request.query_params.get('file_format', 'csv')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 
 # Service Payment Views
 
@@ -387,6 +442,16 @@ class ServicePaymentViewSet(viewsets.ModelViewSet):
     ordering_fields = ['payment_date', 'amount', 'status', 'created_at']
     ordering = ['-created_at']
 
+    @sparse_fieldsets(service_payment_rows)
+    def list(self, request, *args, **kwargs):
+        # ListModelMixin.list over values() rows (core/fast_serializers.py)
+        fields = requested_fields(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(service_payment_rows.rows(queryset, fields=fields))
+        if page is not None:
+            return self.get_paginated_response(service_payment_rows.render(page, fields))
+        return Response(service_payment_rows.serialize(queryset, fields))
+
     def perform_create(self, serializer):
         serializer.save(processed_by=self.request.user)
 
@@ -405,105 +470,124 @@ class ServicePaymentViewSet(viewsets.ModelViewSet):
             )
 
         payment_date = request.data.get('payment_date')
-        payment_method = request.data.get('payment_method', 'CASH')
+        # Keep the method the payment was raised with (NHIF rows stay claimable)
+        payment_method = request.data.get('payment_method', payment.payment_method or 'CASH')
         notes = request.data.get('notes', '')
 
         if not payment_date:
             payment_date = timezone.now()
 
-        payment.status = 'PAID'
-        payment.payment_date = payment_date
-        payment.payment_method = payment_method
-        payment.notes = notes
-        payment.processed_by = request.user
-        payment.save()
+        from doctor.models import Consultation, LabTestRequest
+        from patients.models import Patient
+        from patients.workflow import (
+            transition_patient, allowed_next_statuses, InvalidTransition, StaleTransition, OPEN_STATUSES
+        )
+
+        patient = Patient.objects.filter(patient_id=payment.patient_id).first()
 
-        # Update patient status based on payment service type
+        # The payment, the records it clears and the patient's next status
+        # are written together: a rejected move leaves the payment unpaid
         try:
-            from patients.models import Patient, PatientStatusHistory
-            patient = Patient.objects.get(patient_id=payment.patient_id)
-            previous_status = patient.current_status
-            previous_location = patient.current_location
-            new_status = previous_status  # Default: no change
-            new_location = previous_location
-
-            # Update status based on service type
-            if payment.service_type == 'CONSULTATION':
-                new_status = 'CONSULTATION_PAID'
-                new_location = 'Ready for Next Service'
-
-                # Update consultation record
-                if payment.reference_id:
-                    try:
-                        from doctor.models import Consultation
-                        consultation = Consultation.objects.get(id=payment.reference_id)
-                        consultation.consultation_fee_paid = True
-                        consultation.consultation_fee_payment_date = payment_date
-                        consultation.save()
-                    except Consultation.DoesNotExist:
-                        pass
-
-            elif payment.service_type == 'LAB_TEST':
-                new_status = 'LAB_PAID'
-                new_location = 'Laboratory - Ready for Testing'
-
-                # Update lab request record
-                if payment.reference_id:
-                    try:
-                        from doctor.models import LabTestRequest
-                        lab_request = LabTestRequest.objects.get(id=payment.reference_id)
-                        lab_request.lab_fee_paid = True
-                        lab_request.lab_fee_payment_date = payment_date
-                        lab_request.save()
-                    except LabTestRequest.DoesNotExist:
-                        pass
-
-            elif payment.service_type == 'MEDICATION':
-                new_status = 'PHARMACY_PAID'
-                new_location = 'Pharmacy - Ready for Dispensing'
-
-            # Update patient status if it changed
-            if new_status != previous_status:
-                patient.current_status = new_status
-                patient.current_location = new_location
-                patient.last_updated_by = request.user
-                patient.save()
-
-                # Create status history
-                PatientStatusHistory.objects.create(
-                    patient=patient,
-                    previous_status=previous_status,
-                    new_status=new_status,
-                    previous_location=previous_location,
-                    new_location=new_location,
-                    changed_by=request.user,
-                    notes=f'Payment cleared for {payment.service_type} - {payment.service_name}'
+            with transaction.atomic():
+                payment.status = 'PAID'
+                payment.payment_date = payment_date
+                payment.payment_method = payment_method
+                payment.notes = notes
+                payment.processed_by = request.user
+                payment.save()
+
+                new_status = new_location = None
+
+                # Update status based on service type
+                if payment.service_type == 'CONSULTATION':
+                    new_status = 'CONSULTATION_PAID'
+                    new_location = 'Ready for Next Service'
+
+                    # Update consultation record
+                    if payment.reference_id:
+                        try:
+                            consultation = Consultation.objects.get(id=payment.reference_id)
+                            consultation.consultation_fee_paid = True
+                            consultation.consultation_fee_payment_date = payment_date
+                            consultation.save()
+                        except Consultation.DoesNotExist:
+                            pass
+
+                elif payment.service_type == 'LAB_TEST':
+                    new_status = 'LAB_PAID'
+                    new_location = 'Laboratory - Ready for Testing'
+
+                    # Update lab request record
+                    if payment.reference_id:
+                        try:
+                            lab_request = LabTestRequest.objects.get(id=payment.reference_id)
+                            lab_request.lab_fee_paid = True
+                            lab_request.lab_fee_payment_date = payment_date
+                            lab_request.save()
+                        except LabTestRequest.DoesNotExist:
+                            pass
+
+                elif payment.service_type == 'MEDICATION':
+                    new_status = 'PHARMACY_PAID'
+                    new_location = 'Pharmacy - Ready for Dispensing'
+
+                    # Send the consultation's prescriptions to the pharmacy
+                    # queue once the payment and the move have committed
+                    if payment.reference_id:
+                        try:
+                            consultation = Consultation.objects.get(id=payment.reference_id)
+                            transaction.on_commit(lambda: _queue_prescriptions(consultation))
+                        except Consultation.DoesNotExist:
+                            pass
+
+                # Walk-in charges (no patient record) and bills settled after
+                # the visit closed have no workflow to move
+                patient_status_updated = bool(
+                    patient and new_status and new_status != patient.current_status
+                    and patient.current_status in OPEN_STATUSES
                 )
-
-        except Patient.DoesNotExist:
-            pass  # Payment processed but patient status not updated
-        except Exception as e:
-            print(f"Error updating patient status after payment: {str(e)}")
+                if patient_status_updated:
+                    transition_patient(
+                        patient,
+                        new_status,
+                        request.user,
+                        new_location=new_location,
+                        notes=f'Payment cleared for {payment.service_type} - {payment.service_name}'
+                    )
+        except InvalidTransition as e:
+            return Response(
+                {
+                    'error': str(e),
+                    'current_status': patient.current_status,
+                    'allowed_statuses': allowed_next_statuses(patient.current_status)
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        except StaleTransition as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
 
         serializer = self.get_serializer(payment)
         return Response({
             'message': 'Payment marked as paid successfully',
             'payment': serializer.data,
             'receipt_number': payment.receipt_number,
-            'patient_status_updated': True
+            'patient_status_updated': patient_status_updated
         })
 
     @action(detail=False, methods=['get'])
+    @sparse_fieldsets(service_payment_rows)
     def pending_payments(self, request):
         """Get all pending service payments"""
-        pending_payments = self.get_queryset().filter(status='PENDING')
-        serializer = self.get_serializer(pending_payments, many=True)
+        pending_payments = service_payment_rows.serialize(
+            self.get_queryset().filter(status='PENDING'), requested_fields(request)
+        )
         return Response({
-            'pending_payments': serializer.data,
-            'count': len(serializer.data)
+            'pending_payments': pending_payments,
+            'count': len(pending_payments)
         })
 
     @action(detail=False, methods=['get'])
+    @sparse_fieldsets(service_payment_rows)
     def by_service_type(self, request):
         """Get payments grouped by service type"""
         service_type = request.query_params.get('service_type')
@@ -517,10 +601,10 @@ class ServicePaymentViewSet(viewsets.ModelViewSet):
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id.upper())
 
-        serializer = self.get_serializer(queryset, many=True)
+        payments = service_payment_rows.serialize(queryset, requested_fields(request))
         return Response({
-            'payments': serializer.data,
-            'count': len(serializer.data)
+            'payments': payments,
+            'count': len(payments)
         })
 
     @action(detail=False, methods=['post'])
@@ -663,3 +747,130 @@ class ServicePaymentViewSet(viewsets.ModelViewSet):
                 {'error': f'Failed to process lab payment: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Pending payments changed since ?since=<cursor> (see patients/changes.py)"""
+        try:
+            since = parse_cursor(request)
+        except ValueError:
+            return Response(
+                {'error': 'since must be a cursor returned by this endpoint'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(read_feed(
+            'PAYMENT', since, self.get_queryset().filter(status='PENDING'),
+            lambda payments: self.get_serializer(payments, many=True).data
+        ))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream filtered service payments as CSV/XLSX (?file_format=csv|xlsx)"""
+        try:
+            return export_response(
+                self.filter_queryset(self.get_queryset()),
+                SERVICE_PAYMENT_EXPORT_COLUMNS,
+                'service_payments',
+                request.query_params.get('file_format', 'csv')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class NHIFClaimBatchViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    NHIF CLAIMS
+
+    Monthly claim batches built from settled NHIF service payments, their
+    submission to NHIF and the remittance that pays them.
+    """
+    queryset = NHIFClaimBatch.objects.select_related('created_by', 'submitted_by')
+    serializer_class = NHIFClaimBatchSerializer
+    permission_classes = [IsAuthenticated, IsStaffMember]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status', 'period_start']
+    ordering_fields = ['period_start', 'created_at', 'total_claimed']
+    ordering = ['-period_start', '-created_at']
+
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Claim every unclaimed NHIF payment of a period (default: last month)"""
+        serializer = NHIFClaimGenerateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        default_start, default_end = previous_month()
+        period_start = serializer.validated_data.get('period_start', default_start)
+        period_end = serializer.validated_data.get('period_end', default_end)
+
+        try:
+            batch = generate_claim_batch(period_start, period_end, request.user)
+        except ClaimError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if batch is None:
+            return Response({
+                'message': f'No unclaimed NHIF payments between {period_start} and {period_end}',
+                'batch': None
+            })
+        return Response({
+            'message': f'Claim batch {batch.batch_number} generated with {batch.line_count} lines',
+            'batch': self.get_serializer(batch).data
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def lines(self, request, pk=None):
+        """Claim lines of a batch (?status=CLAIMED|PAID|REJECTED)"""
+        lines = self.get_object().lines.order_by('service_date', 'id')
+        line_status = request.query_params.get('status')
+        if line_status:
+            lines = lines.filter(status=line_status.upper())
+
+        page = self.paginate_queryset(lines)
+        if page is not None:
+            return self.get_paginated_response(NHIFClaimLineSerializer(page, many=True).data)
+        return Response(NHIFClaimLineSerializer(lines, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """Mark a draft batch as submitted to NHIF"""
+        try:
+            batch = submit_batch(self.get_object(), request.user)
+        except ClaimError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': f'Claim batch {batch.batch_number} submitted',
+            'batch': self.get_serializer(batch).data
+        })
+
+    @action(detail=True, methods=['post'])
+    def remittance(self, request, pk=None):
+        """Record NHIF's remittance advice against a submitted batch"""
+        serializer = NHIFRemittanceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            batch = record_remittance(
+                self.get_object(),
+                serializer.validated_data['reference'],
+                serializer.validated_data.get('lines', []),
+                serializer.validated_data.get('settle_remaining', False)
+            )
+        except ClaimError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': f'Remittance recorded for {batch.batch_number}',
+            'batch': self.get_serializer(batch).data
+        })
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Stream a batch's claim lines as CSV/XLSX (?file_format=csv|xlsx)"""
+        batch = self.get_object()
+        try:
+            return export_response(
+                batch.lines.select_related('batch').order_by('service_date', 'id'),
+                NHIF_CLAIM_EXPORT_COLUMNS,
+                f'nhif_claims_{batch.batch_number}',
+                request.query_params.get('file_format', 'csv')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,229 @@
+"""
+Lab dashboard and workload analytics.
+
+Dashboard numbers come from single conditional-aggregate queries. Workload
+analysis reads the LabHourlyRollup table for closed hours and aggregates
+only the results completed since the last rolled-up hour, so a week of
+workload is a few indexed GROUP BY queries instead of a scan of all results.
+Technicians are summed and ranked with ROW_NUMBER() in the same query.
+Results are bucketed on test_completed_at, which is set once when a result
+is first completed, so later edits do not move it to another hour.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (
+    Avg, Count, DurationField, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, Window
+)
+from django.db.models.functions import Coalesce, RowNumber, TruncHour
+from django.utils import timezone
+
+from doctor.models import LabTestRequest
+from .models import LabTestResult, LabOrder, LabHourlyRollup
+
+User = get_user_model()
+
+COMPLETED_RESULT_STATUSES = ['COMPLETED', 'ABNORMAL', 'CRITICAL']
+
+RECENT_LIMIT = 10
+
+
+def _completed_results():
+    return LabTestResult.objects.filter(result_status__in=COMPLETED_RESULT_STATUSES)
+
+
+def _hourly_buckets(queryset):
+    """GROUP BY hour, test type and technician over LabTestResult rows"""
+    return queryset.annotate(
+        bucket_hour=TruncHour('test_completed_at')
+    ).values(
+        'bucket_hour', 'test_type', 'processed_by'
+    ).annotate(
+        tests_completed=Count('id'),
+        abnormal_count=Count('id', filter=Q(result_status='ABNORMAL')),
+        critical_count=Count('id', filter=Q(result_status='CRITICAL')),
+        urgent_count=Count('id', filter=Q(urgent_flag=True)),
+        total_processing_time=Sum(F('test_completed_at') - F('test_started_at')),
+    ).order_by()
+
+
+def rebuild_hourly_rollup(start, end=None):
+    """
+    Recompute rollup rows for the closed hours in [start, end).
+
+    Replaces the rows for those hours, so re-running over the same window
+    is safe. end defaults to the start of the current hour.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    end = end or timezone.now().replace(minute=0, second=0, microsecond=0)
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if start >= end:
+        return 0
+
+    buckets = _hourly_buckets(
+        _completed_results().filter(test_completed_at__gte=start, test_completed_at__lt=end)
+    )
+    rows = [
+        LabHourlyRollup(
+            hour=bucket['bucket_hour'],
+            test_type=bucket['test_type'],
+            processed_by_id=bucket['processed_by'],
+            tests_completed=bucket['tests_completed'],
+            abnormal_count=bucket['abnormal_count'],
+            critical_count=bucket['critical_count'],
+            urgent_count=bucket['urgent_count'],
+            total_processing_time=bucket['total_processing_time'] or timedelta(0),
+        )
+        for bucket in buckets
+    ]
+
+    with transaction.atomic():
+        LabHourlyRollup.objects.filter(hour__gte=start, hour__lt=end).delete()
+        LabHourlyRollup.objects.bulk_create(rows)
+    return len(rows)
+
+
+def refresh_hourly_rollup(lookback_hours=2):
+    """
+    Hourly job: roll up every closed hour since the last rollup, re-doing
+    the last lookback_hours as results can still be edited after completion.
+    """
+    last_hour = LabHourlyRollup.objects.aggregate(last=Max('hour'))['last']
+    now_hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    if last_hour is None:
+        # First run: backfill from the oldest completed result
+        start = _completed_results().aggregate(first=Min('test_completed_at'))['first'] or now_hour
+    else:
+        start = last_hour + timedelta(hours=1)
+
+    start = min(start, now_hour - timedelta(hours=lookback_hours))
+    return rebuild_hourly_rollup(start, now_hour)
+
+
+def _ranked_technicians(rollups, live):
+    """
+    Technicians with work in the window, busiest first.
+
+    Rollup and live totals are correlated subqueries per user, so the sums
+    and the ROW_NUMBER() ranking run in one query.
+    """
+    def total(queryset, aggregate, default):
+        per_user = queryset.filter(processed_by=OuterRef('pk')).order_by().values('processed_by')
+        return Coalesce(Subquery(per_user.annotate(total=aggregate).values('total')), default)
+
+    no_time = Value(timedelta(0), output_field=DurationField())
+    return User.objects.annotate(
+        tests_completed=(
+            total(rollups, Sum('tests_completed'), 0) + total(live, Count('id'), 0)
+        ),
+        processing_time=(
+            total(rollups, Sum('total_processing_time'), no_time)
+            + total(live, Sum(F('test_completed_at') - F('test_started_at')), no_time)
+        ),
+    ).filter(tests_completed__gt=0).annotate(
+        position=Window(RowNumber(), order_by=[F('tests_completed').desc(), F('full_name').asc()])
+    ).order_by('position').values('full_name', 'tests_completed', 'processing_time')
+
+
+def lab_dashboard_stats():
+    """Data for LabDashboardStatsSerializer"""
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    pending_tests = LabTestRequest.objects.filter(
+        status__in=['REQUESTED', 'IN_PROGRESS']
+    ).count()
+
+    results = LabTestResult.objects.aggregate(
+        completed_today=Count('id', filter=Q(
+            result_status__in=COMPLETED_RESULT_STATUSES,
+            test_completed_at__gte=today_start
+        )),
+        urgent_results=Count('id', filter=Q(urgent_flag=True, doctor_viewed=False)),
+        critical_results=Count('id', filter=Q(result_status='CRITICAL', doctor_viewed=False)),
+        average_processing_time=Avg(
+            F('test_completed_at') - F('test_started_at'),
+            filter=Q(
+                result_status__in=COMPLETED_RESULT_STATUSES,
+                test_completed_at__gte=today_start - timedelta(days=7)
+            )
+        ),
+    )
+
+    pending_orders = LabOrder.objects.filter(status__in=['SUBMITTED', 'APPROVED']).count()
+
+    recent = LabTestResult.objects.select_related('processed_by')
+    average = results['average_processing_time']
+
+    return {
+        'pending_tests': pending_tests,
+        'completed_today': results['completed_today'],
+        'urgent_results': results['urgent_results'],
+        'critical_results': results['critical_results'],
+        # Minutes, over the last 7 days
+        'average_processing_time': round(average.total_seconds() / 60, 1) if average else 0.0,
+        'pending_orders': pending_orders,
+        'recent_completions': recent.filter(
+            result_status__in=COMPLETED_RESULT_STATUSES
+        ).order_by('-test_completed_at')[:RECENT_LIMIT],
+        'urgent_cases': recent.filter(
+            Q(urgent_flag=True) | Q(result_status='CRITICAL'),
+            doctor_viewed=False
+        ).order_by('-test_completed_at')[:RECENT_LIMIT],
+    }
+
+
+def lab_workload(days=7):
+    """
+    Data for LabWorkloadSerializer over the last `days` days.
+
+    Closed hours come from LabHourlyRollup; results completed after the
+    newest rolled-up hour are aggregated live with the same GROUP BY.
+    """
+    since = (timezone.now() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+
+    rollups = LabHourlyRollup.objects.filter(hour__gte=since)
+    last_hour = rollups.aggregate(last=Max('hour'))['last']
+    live_from = last_hour + timedelta(hours=1) if last_hour else since
+
+    live = _completed_results().filter(test_completed_at__gte=live_from)
+
+    buckets = list(rollups.values('test_type', 'tests_completed', bucket_hour=F('hour')))
+    buckets += list(_hourly_buckets(live))
+
+    # Day and hour-of-day keys are in local time, so they are folded from
+    # the hourly rows here; there are at most `days` and 24 of them
+    total = 0
+    tests_by_type = defaultdict(int)
+    tests_by_day = defaultdict(int)
+    busiest_hours = defaultdict(int)
+
+    for bucket in buckets:
+        count = bucket['tests_completed']
+        local_hour = timezone.localtime(bucket['bucket_hour'])
+        total += count
+        tests_by_type[bucket['test_type']] += count
+        tests_by_day[local_hour.date().isoformat()] += count
+        busiest_hours[f"{local_hour.hour:02d}:00"] += count
+
+    technician_performance = {
+        technician['full_name']: {
+            'tests_completed': technician['tests_completed'],
+            'average_processing_minutes': round(
+                technician['processing_time'].total_seconds() / 60 / technician['tests_completed'], 1
+            ),
+        }
+        for technician in _ranked_technicians(rollups, live)
+    }
+
+    return {
+        'total_tests_this_week': total,
+        'tests_by_type': dict(sorted(tests_by_type.items(), key=lambda item: -item[1])),
+        'tests_by_day': dict(sorted(tests_by_day.items())),
+        'technician_performance': technician_performance,
+        'busiest_hours': dict(sorted(busiest_hours.items(), key=lambda item: -item[1])),
+    }
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from lab.analytics import rebuild_hourly_rollup, refresh_hourly_rollup
+
+
+class Command(BaseCommand):
+    help = 'Refresh the hourly lab results rollup (run hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-days',
+            type=int,
+            help='Rebuild the last N days instead of only the new hours'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_days']:
+            written = rebuild_hourly_rollup(timezone.now() - timedelta(days=options['rebuild_days']))
+        else:
+            written = refresh_hourly_rollup()
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} lab rollup row(s)'))
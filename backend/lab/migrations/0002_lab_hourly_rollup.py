@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('lab', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField(help_text='Start of the hour the results were completed in')),
+                ('test_type', models.CharField(max_length=50)),
+                ('tests_completed', models.PositiveIntegerField(default=0)),
+                ('abnormal_count', models.PositiveIntegerField(default=0)),
+                ('critical_count', models.PositiveIntegerField(default=0)),
+                ('urgent_count', models.PositiveIntegerField(default=0)),
+                ('total_processing_time', models.DurationField(help_text='Sum of completed minus started time for the hour')),
+                ('processed_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lab_hourly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'lab_hourly_rollups',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='lab_hourly__hour_418f7d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='labhourlyrollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'test_type', 'processed_by'), name='unique_lab_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+BATCH_SIZE = 1000
+
+
+def link_results_to_requests(apps, schema_editor):
+    """
+    Backfill test_request from the lab_request_id string.
+    Values that are not UUIDs or point at deleted requests stay unlinked.
+    """
+    LabTestResult = apps.get_model('lab', 'LabTestResult')
+    LabTestRequest = apps.get_model('doctor', 'LabTestRequest')
+
+    request_ids = set(LabTestRequest.objects.values_list('id', flat=True))
+
+    batch = []
+    for result_id, lab_request_id in LabTestResult.objects.values_list('id', 'lab_request_id').iterator():
+        try:
+            request_uuid = uuid.UUID(str(lab_request_id))
+        except ValueError:
+            continue
+        if request_uuid in request_ids:
+            batch.append(LabTestResult(id=result_id, test_request_id=request_uuid))
+        if len(batch) >= BATCH_SIZE:
+            LabTestResult.objects.bulk_update(batch, ['test_request'])
+            batch = []
+
+    if batch:
+        LabTestResult.objects.bulk_update(batch, ['test_request'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0007_lab_request_open_index'),
+        ('lab', '0002_lab_hourly_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labtestresult',
+            name='test_request',
+            field=models.ForeignKey(blank=True, help_text='Linked LabTestRequest (resolved from lab_request_id on save)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='doctor.labtestrequest'),
+        ),
+        migrations.RunPython(link_results_to_requests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+def clear_unfinished_completion_times(apps, schema_editor):
+    """
+    test_completed_at was auto_now, so results still in progress carry
+    their last edit time. Completed results keep theirs, the closest value
+    there is to when they were completed.
+    """
+    LabTestResult = apps.get_model('lab', 'LabTestResult')
+    LabTestResult.objects.exclude(
+        result_status__in=['COMPLETED', 'ABNORMAL', 'CRITICAL']
+    ).update(test_completed_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0003_link_results_to_requests'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='labtestresult',
+            name='test_completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the result was first completed; set once, later edits keep it', null=True),
+        ),
+        migrations.RunPython(clear_unfinished_completion_times, migrations.RunPython.noop),
+    ]
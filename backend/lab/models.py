@@ -3,10 +3,12 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 import uuid
 
+from core.mixins import DirtyFieldsMixin
+
 User = get_user_model()
 
 
-class LabTestResult(models.Model):
+class LabTestResult(DirtyFieldsMixin, models.Model):
     """
     Lab test results created by lab technicians.
     Links to LabTestRequest from doctor app and sends results back to doctors.
@@ -27,6 +29,14 @@ class LabTestResult(models.Model):
         max_length=36,
         help_text='UUID of LabTestRequest from doctor app'
     )
+    test_request = models.ForeignKey(
+        'doctor.LabTestRequest',
+        on_delete=models.SET_NULL,
+        related_name='results',
+        blank=True,
+        null=True,
+        help_text='Linked LabTestRequest (resolved from lab_request_id on save)'
+    )
     
     # Patient info (cached for performance)
     patient_id = models.CharField(
@@ -91,7 +101,11 @@ class LabTestResult(models.Model):
     
     # Timestamps
     test_started_at = models.DateTimeField(auto_now_add=True)
-    test_completed_at = models.DateTimeField(auto_now=True)
+    test_completed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='When the result was first completed; set once, later edits keep it'
+    )
     
     # Staff tracking
     processed_by = models.ForeignKey(
@@ -133,10 +147,21 @@ class LabTestResult(models.Model):
         return None
     
     def save(self, *args, **kwargs):
-        # Auto-set completion time when status changes to completed
-        if self.result_status in ['COMPLETED', 'ABNORMAL', 'CRITICAL']:
-            if not self.test_completed_at or self.test_completed_at == self.test_started_at:
-                self.test_completed_at = timezone.now()
+        # Keep the real FK in step with the lab_request_id string
+        if self.is_dirty('lab_request_id'):
+            from doctor.models import LabTestRequest
+            try:
+                request_uuid = uuid.UUID(str(self.lab_request_id))
+            except ValueError:
+                self.test_request_id = None
+            else:
+                self.test_request_id = LabTestRequest.objects.filter(
+                    pk=request_uuid
+                ).values_list('pk', flat=True).first()
+
+        # Completion time is set once, the first time a completed status is saved
+        if self.result_status in ['COMPLETED', 'ABNORMAL', 'CRITICAL'] and not self.test_completed_at:
+            self.test_completed_at = timezone.now()
         
         super().save(*args, **kwargs)
 
@@ -229,3 +254,43 @@ class LabOrder(models.Model):
     
     def __str__(self):
         return f"Lab Order: {self.order_title} ({self.status})"
+
+
+class LabHourlyRollup(models.Model):
+    """
+    Completed lab results pre-aggregated per hour, test type and technician.
+    Rebuilt by the rollup_lab_stats command; feeds the workload analytics.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    hour = models.DateTimeField(help_text='Start of the hour the results were completed in')
+    test_type = models.CharField(max_length=50)
+    processed_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='lab_hourly_rollups'
+    )
+
+    tests_completed = models.PositiveIntegerField(default=0)
+    abnormal_count = models.PositiveIntegerField(default=0)
+    critical_count = models.PositiveIntegerField(default=0)
+    urgent_count = models.PositiveIntegerField(default=0)
+    total_processing_time = models.DurationField(
+        help_text='Sum of completed minus started time for the hour'
+    )
+
+    class Meta:
+        db_table = 'lab_hourly_rollups'
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'test_type', 'processed_by'],
+                name='unique_lab_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}:00 {self.test_type} x{self.tests_completed}"
@@ -38,7 +38,9 @@ class LabTestResultSerializer(serializers.ModelSerializer):
             'doctor_viewed',
             'processing_time_display',
         ]
-        read_only_fields = ['id', 'test_started_at', 'processed_by_name', 'processing_time_display']
+        read_only_fields = [
+            'id', 'test_started_at', 'test_completed_at', 'processed_by_name', 'processing_time_display'
+        ]
     
     def get_processing_time_display(self, obj):
         """Return processing time in human-readable format"""
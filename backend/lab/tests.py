@@ -1,3 +1,101 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from doctor.models import Consultation, LabTestRequest
+from .analytics import lab_workload
+from .models import LabHourlyRollup, LabTestResult
+
+User = get_user_model()
+
+
+class LabPatientsQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            password='test-pass-123', full_name='Neema Kweka', email='doctor@example.com',
+            phone_number='+255700000501', role='DOCTOR', is_active=True, is_approved=True,
+        )
+        cls.technician = User.objects.create_user(
+            password='test-pass-123', full_name='Juma Lab', email='lab@example.com',
+            phone_number='+255700000502', role='LAB', is_active=True, is_approved=True,
+        )
+        consultation = Consultation.objects.create(
+            patient_id='PAT1', patient_name='Asha Juma', doctor=cls.doctor,
+            chief_complaint='Fever', priority='URGENT',
+        )
+        cls.open_request = LabTestRequest.objects.create(
+            consultation=consultation, patient_id='PAT1', patient_name='Asha Juma',
+            requested_by=cls.doctor, mrdt_requested=True, status='REQUESTED',
+        )
+        done = LabTestRequest.objects.create(
+            consultation=consultation, patient_id='PAT1', patient_name='Asha Juma',
+            requested_by=cls.doctor, hb_requested=True, status='REQUESTED',
+        )
+        LabTestResult.objects.create(
+            lab_request_id=str(done.id), patient_id='PAT1', patient_name='Asha Juma',
+            test_type='HB', result_summary='12.5 g/dL', processed_by=cls.technician,
+        )
+
+    def test_lists_open_requests_without_results(self):
+        client = APIClient()
+        client.force_authenticate(self.technician)
+
+        response = client.get('/api/lab/patients/')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['queue_count'], 1)
+        entry = body['patients_queue'][0]
+        self.assertEqual(entry['request_id'], str(self.open_request.id))
+        self.assertEqual(entry['requested_by'], 'Neema Kweka')
+        self.assertEqual(entry['priority'], 'URGENT')
+        self.assertEqual(entry['requested_tests'], ['mrdt'])
+
+
+class LabWorkloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(
+            password='test-pass-123', full_name='Amina Lab', email='lab1@example.com',
+            phone_number='+255700000503', role='LAB',
+        )
+        cls.second = User.objects.create_user(
+            password='test-pass-123', full_name='Baraka Lab', email='lab2@example.com',
+            phone_number='+255700000504', role='LAB',
+        )
+
+    def test_technicians_ranked_across_rollup_and_live_results(self):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        LabHourlyRollup.objects.create(
+            hour=hour, test_type='HB', processed_by=self.first,
+            tests_completed=2, total_processing_time=timedelta(minutes=20),
+        )
+        LabHourlyRollup.objects.create(
+            hour=hour, test_type='MRDT', processed_by=self.second,
+            tests_completed=1, total_processing_time=timedelta(minutes=5),
+        )
+        for _ in range(2):
+            result = LabTestResult.objects.create(
+                lab_request_id='1', patient_id='PAT1', patient_name='Asha Juma',
+                test_type='MRDT', result_summary='Negative', processed_by=self.second,
+                result_status='COMPLETED',
+            )
+            LabTestResult.objects.filter(pk=result.pk).update(
+                test_started_at=result.test_completed_at - timedelta(minutes=10)
+            )
+
+        workload = lab_workload()
 
-# Create your tests here.
+        self.assertEqual(workload['total_tests_this_week'], 5)
+        self.assertEqual(workload['tests_by_type'], {'MRDT': 3, 'HB': 2})
+        self.assertEqual(list(workload['technician_performance']), ['Baraka Lab', 'Amina Lab'])
+        self.assertEqual(workload['technician_performance']['Baraka Lab'], {
+            'tests_completed': 3, 'average_processing_minutes': 8.3,
+        })
+        self.assertEqual(workload['technician_performance']['Amina Lab'], {
+            'tests_completed': 2, 'average_processing_minutes': 10.0,
+        })
@@ -6,8 +6,11 @@ app_name = 'lab'
 urlpatterns = [
     # Essential Lab Operations Only
     path('patients/', views.lab_patients_queue, name='patients-queue'),           # See patients waiting for lab
+    path('changes/', views.queue_changes, name='queue-changes'),                 # Queue delta feed (?since=)
     path('results/', views.lab_results_list, name='results-list'),               # View/create test results  
     path('results/<uuid:pk>/', views.lab_result_detail, name='result-detail'),   # Update specific result
     path('orders/', views.lab_orders_list, name='orders-list'),                  # View/create supply orders
     path('orders/<uuid:pk>/submit/', views.submit_lab_order, name='submit-order'), # Send order to pharmacy
+    path('dashboard/', views.lab_dashboard, name='dashboard'),                   # Dashboard summary
+    path('workload/', views.lab_workload_view, name='workload'),                 # Workload analytics
 ]
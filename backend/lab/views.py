@@ -3,11 +3,46 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
 
 from .models import LabTestResult, LabOrder
-from .serializers import LabTestResultSerializer, LabOrderSerializer
+from .serializers import (
+    LabTestResultSerializer, LabOrderSerializer, LabDashboardStatsSerializer, LabWorkloadSerializer
+)
+from .analytics import lab_dashboard_stats, lab_workload
 from core.permissions import IsLabStaff
 from doctor.models import LabTestRequest  # Integration with doctor app
+from patients.changes import parse_cursor, read_feed
+
+
+def _pending_lab_requests():
+    # Open requests with no recorded result yet (NOT EXISTS anti-join,
+    # served by the partial index on open requests)
+    return LabTestRequest.objects.filter(
+        status__in=LabTestRequest.OPEN_STATUSES
+    ).exclude(
+        Exists(LabTestResult.objects.filter(test_request=OuterRef('pk')))
+    ).select_related(
+        'requested_by', 'consultation'
+    ).order_by('requested_at')
+
+
+def _queue_entries(lab_requests):
+    return [
+        {
+            'request_id': str(lab_request.id),
+            'patient_id': lab_request.patient_id,
+            'patient_name': lab_request.patient_name,
+            'requested_tests': lab_request.requested_tests,
+            'requested_by': lab_request.requested_by.full_name,
+            'requested_at': lab_request.requested_at,
+            'status': lab_request.status,
+            'priority': lab_request.consultation.priority,
+            'instructions': lab_request.short_clinical_notes
+        }
+        for lab_request in lab_requests
+    ]
 
 
 @api_view(['GET'])
@@ -18,25 +53,7 @@ def lab_patients_queue(request):
     Shows pending lab requests from doctors.
     """
     try:
-        # Get all pending lab requests that don't have results yet
-        pending_requests = LabTestRequest.objects.filter(
-            status='PENDING'
-        ).exclude(
-            id__in=LabTestResult.objects.values_list('lab_request_id', flat=True)
-        ).order_by('-created_at')
-        
-        patients_queue = []
-        for request in pending_requests:
-            patients_queue.append({
-                'request_id': str(request.id),
-                'patient_id': request.patient_id,
-                'patient_name': request.patient_name,
-                'test_type': request.test_type,
-                'requested_by': request.doctor.get_full_name(),
-                'requested_at': request.created_at,
-                'priority': request.priority,
-                'instructions': request.instructions
-            })
+        patients_queue = _queue_entries(_pending_lab_requests())
         
         return Response({
             'success': True,
@@ -51,6 +68,27 @@ def lab_patients_queue(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsLabStaff])
+def queue_changes(request):
+    """
+    Lab queue changes since ?since=<cursor> (see patients/changes.py).
+    Removed ids are request_ids.
+    """
+    try:
+        since = parse_cursor(request)
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': 'since must be a cursor returned by this endpoint'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        **read_feed('LAB_REQUEST', since, _pending_lab_requests(), _queue_entries)
+    })
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated, IsLabStaff])
 def lab_results_list(request):
@@ -59,7 +97,7 @@ def lab_results_list(request):
     POST: Create new test result
     """
     if request.method == 'GET':
-        results = LabTestResult.objects.all().order_by('-test_completed_at')
+        results = LabTestResult.objects.select_related('processed_by').order_by('-test_completed_at')
         serializer = LabTestResultSerializer(results, many=True)
         return Response({
             'success': True,
@@ -75,12 +113,13 @@ def lab_results_list(request):
             result = serializer.save()
             
             # Update lab request status to COMPLETED
-            try:
-                lab_request = LabTestRequest.objects.get(id=data['lab_request_id'])
-                lab_request.status = 'COMPLETED'
-                lab_request.save()
-            except LabTestRequest.DoesNotExist:
-                pass
+            if result.test_request_id:
+                LabTestRequest.objects.filter(id=result.test_request_id).update(
+                    status='COMPLETED',
+                    completed_at=timezone.now(),
+                    updated_at=timezone.now()
+                )
+                # Saving the result already logged the request for the changes feed
             
             return Response({
                 'success': True,
@@ -196,3 +235,53 @@ def submit_lab_order(request, pk):
             'success': False,
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsLabStaff])
+def lab_dashboard(request):
+    """
+    Lab dashboard summary: pending work, today's output, urgent and critical results.
+    """
+    try:
+        serializer = LabDashboardStatsSerializer(lab_dashboard_stats())
+        return Response({
+            'success': True,
+            'dashboard': serializer.data
+        })
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsLabStaff])
+def lab_workload_view(request):
+    """
+    Lab workload over the last N days (?days=7): tests by type, by day,
+    per technician and by hour of day.
+    """
+    try:
+        days = min(max(int(request.GET.get('days', 7)), 1), 90)
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': 'days must be a number'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        serializer = LabWorkloadSerializer(lab_workload(days))
+        return Response({
+            'success': True,
+            'days': days,
+            'workload': serializer.data
+        })
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nursing.wards import accrue_ward_charges
+
+
+class Command(BaseCommand):
+    help = 'Post unbilled ward days for admitted patients as pending ward payments (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--through',
+            help='Bill up to and including this date (YYYY-MM-DD, default: yesterday)'
+        )
+
+    def handle(self, *args, **options):
+        through_date = None
+        if options['through']:
+            try:
+                through_date = date.fromisoformat(options['through'])
+            except ValueError:
+                raise CommandError('--through must be YYYY-MM-DD')
+
+        payments = accrue_ward_charges(through_date)
+        total = sum(payment.amount for payment in payments)
+        self.stdout.write(self.style.SUCCESS(
+            f'Posted {len(payments)} ward charge(s) totalling {total} TZS'
+        ))
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def build_bed_inventory(apps, schema_editor):
+    """
+    Create beds from existing assignments and link them.
+    Occupied beds are linked to their most recent ADMITTED assignment only.
+    """
+    WardAssignment = apps.get_model('nursing', 'WardAssignment')
+    WardBed = apps.get_model('nursing', 'WardBed')
+
+    for ward_type, bed_number in WardAssignment.objects.values_list('ward_type', 'bed_number').distinct():
+        latest = WardAssignment.objects.filter(
+            ward_type=ward_type, bed_number=bed_number
+        ).order_by('-admission_date').first()
+        admitted = WardAssignment.objects.filter(
+            ward_type=ward_type, bed_number=bed_number, status='ADMITTED'
+        ).order_by('-admission_date').first()
+
+        bed = WardBed.objects.create(
+            ward_type=ward_type,
+            bed_number=bed_number,
+            daily_fee=latest.daily_ward_fee,
+            is_occupied=admitted is not None
+        )
+        WardAssignment.objects.filter(
+            ward_type=ward_type, bed_number=bed_number
+        ).exclude(status='ADMITTED').update(bed=bed)
+        if admitted:
+            WardAssignment.objects.filter(pk=admitted.pk).update(bed=bed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nursing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WardBed',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('ward_type', models.CharField(choices=[('GENERAL', 'General Ward'), ('PRIVATE', 'Private Room'), ('ICU', 'Intensive Care Unit'), ('MATERNITY', 'Maternity Ward'), ('PEDIATRIC', 'Pediatric Ward'), ('SURGERY', 'Surgical Ward')], max_length=15)),
+                ('bed_number', models.CharField(help_text='Bed identifier (A1, B2, etc.)', max_length=10)),
+                ('daily_fee', models.DecimalField(decimal_places=2, help_text='Default daily charge for this bed', max_digits=10)),
+                ('is_occupied', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True, help_text='Inactive beds are out of service')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'ward_beds',
+                'ordering': ['ward_type', 'bed_number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='wardassignment',
+            name='billed_through',
+            field=models.DateField(blank=True, help_text='Last day already posted to finance as ward charges', null=True),
+        ),
+        migrations.AddField(
+            model_name='wardassignment',
+            name='bed',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='assignments', to='nursing.wardbed'),
+        ),
+        migrations.RunPython(build_bed_inventory, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wardassignment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'ADMITTED')), fields=('bed',), name='one_admission_per_bed'),
+        ),
+        migrations.AddIndex(
+            model_name='wardbed',
+            index=models.Index(fields=['ward_type', 'is_active', 'is_occupied'], name='ward_beds_ward_ty_f230be_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='wardbed',
+            constraint=models.UniqueConstraint(fields=('ward_type', 'bed_number'), name='unique_ward_bed'),
+        ),
+    ]
@@ -3,10 +3,12 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 import uuid
 
+from core.mixins import DirtyFieldsMixin
+
 User = get_user_model()
 
 
-class NursingService(models.Model):
+class NursingService(DirtyFieldsMixin, models.Model):
     """
     Record of nursing services provided to patients.
     Covers ward care, injections, monitoring, etc.
@@ -146,10 +148,11 @@ class NursingService(models.Model):
     
     def save(self, *args, **kwargs):
         # Auto-set timestamps based on status
-        if self.status == 'IN_PROGRESS' and not self.started_at:
-            self.started_at = timezone.now()
-        elif self.status == 'COMPLETED' and not self.completed_at:
-            self.completed_at = timezone.now()
+        if self.is_dirty('status'):
+            if self.status == 'IN_PROGRESS' and not self.started_at:
+                self.started_at = timezone.now()
+            elif self.status == 'COMPLETED' and not self.completed_at:
+                self.completed_at = timezone.now()
         
         super().save(*args, **kwargs)
 
@@ -196,6 +199,13 @@ class WardAssignment(models.Model):
         max_length=10,
         help_text='Bed identifier (A1, B2, etc.)'
     )
+    bed = models.ForeignKey(
+        'WardBed',
+        on_delete=models.PROTECT,
+        related_name='assignments',
+        null=True,
+        blank=True
+    )
     
     # Assignment details
     admission_date = models.DateTimeField()
@@ -236,10 +246,23 @@ class WardAssignment(models.Model):
         decimal_places=2,
         help_text='Daily charge for this ward type'
     )
+    billed_through = models.DateField(
+        blank=True,
+        null=True,
+        help_text='Last day already posted to finance as ward charges'
+    )
     
     class Meta:
         db_table = 'ward_assignments'
         ordering = ['-admission_date']
+        constraints = [
+            # A bed can only hold one admitted patient
+            models.UniqueConstraint(
+                fields=['bed'],
+                condition=models.Q(status='ADMITTED'),
+                name='one_admission_per_bed'
+            ),
+        ]
         indexes = [
             models.Index(fields=['patient_id']),
             models.Index(fields=['ward_type', 'status']),
@@ -260,3 +283,44 @@ class WardAssignment(models.Model):
     def total_ward_charges(self):
         """Calculate total ward charges based on days"""
         return self.daily_ward_fee * self.days_admitted
+
+
+class WardBed(models.Model):
+    """
+    Bed inventory per ward.
+    is_occupied is kept in step with ADMITTED assignments so ward occupancy
+    is a single indexed GROUP BY.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ward_type = models.CharField(
+        max_length=15,
+        choices=WardAssignment.WARD_TYPE_CHOICES
+    )
+    bed_number = models.CharField(
+        max_length=10,
+        help_text='Bed identifier (A1, B2, etc.)'
+    )
+    daily_fee = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Default daily charge for this bed'
+    )
+    is_occupied = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True, help_text='Inactive beds are out of service')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ward_beds'
+        ordering = ['ward_type', 'bed_number']
+        constraints = [
+            models.UniqueConstraint(fields=['ward_type', 'bed_number'], name='unique_ward_bed'),
+        ]
+        indexes = [
+            models.Index(fields=['ward_type', 'is_active', 'is_occupied']),
+        ]
+
+    def __str__(self):
+        return f"{self.ward_type} bed {self.bed_number}"
@@ -11,4 +11,5 @@ urlpatterns = [
     # Ward Management
     path('wards/', views.ward_assignments, name='ward-assignments'),
     path('wards/<uuid:assignment_id>/discharge/', views.discharge_patient, name='discharge-patient'),
+    path('wards/beds/', views.ward_beds, name='ward-beds'),
 ]
@@ -3,8 +3,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from .models import NursingService, WardAssignment
+from .models import NursingService, WardAssignment, WardBed
+from .wards import with_stay, ward_occupancy, admit_to_bed, discharge_from_bed, BedUnavailable
 from core.permissions import IsStaffMember
 
 
@@ -122,7 +125,9 @@ def ward_assignments(request):
     POST: Admit patient to ward
     """
     if request.method == 'GET':
-        assignments = WardAssignment.objects.filter(status='ADMITTED')
+        assignments = with_stay(
+            WardAssignment.objects.filter(status='ADMITTED').select_related('primary_nurse', 'attending_doctor')
+        )
         
         assignments_data = []
         for assignment in assignments:
@@ -133,31 +138,33 @@ def ward_assignments(request):
                 'ward_type': assignment.ward_type,
                 'bed_number': assignment.bed_number,
                 'admission_date': assignment.admission_date,
-                'days_admitted': assignment.days_admitted,
+                'days_admitted': assignment.stay_days,
                 'primary_nurse': assignment.primary_nurse.get_full_name(),
                 'attending_doctor': assignment.attending_doctor.get_full_name(),
                 'daily_ward_fee': float(assignment.daily_ward_fee),
-                'total_charges': float(assignment.total_ward_charges)
+                'total_charges': float(assignment.stay_charges),
+                'billed_through': assignment.billed_through
             })
         
         return Response({
             'success': True,
             'current_patients': len(assignments_data),
-            'ward_assignments': assignments_data
+            'ward_assignments': assignments_data,
+            'occupancy': ward_occupancy()
         })
     
     elif request.method == 'POST':
         try:
-            assignment = WardAssignment.objects.create(
+            assignment = admit_to_bed(
+                request.data['ward_type'],
+                request.data['bed_number'],
+                daily_fee=request.data.get('daily_ward_fee'),
                 patient_id=request.data['patient_id'],
                 patient_name=request.data['patient_name'],
-                ward_type=request.data['ward_type'],
-                bed_number=request.data['bed_number'],
                 admission_date=request.data['admission_date'],
                 primary_nurse_id=request.data['primary_nurse_id'],
                 attending_doctor_id=request.data['attending_doctor_id'],
-                admission_notes=request.data['admission_notes'],
-                daily_ward_fee=request.data['daily_ward_fee']
+                admission_notes=request.data['admission_notes']
             )
             
             return Response({
@@ -166,6 +173,11 @@ def ward_assignments(request):
                 'assignment_id': str(assignment.id)
             }, status=status.HTTP_201_CREATED)
             
+        except BedUnavailable as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response({
                 'success': False,
@@ -181,19 +193,36 @@ def discharge_patient(request, assignment_id):
     """
     try:
         assignment = get_object_or_404(WardAssignment, id=assignment_id)
+        if assignment.status != 'ADMITTED':
+            return Response({
+                'success': False,
+                'error': f'Patient is already {assignment.status.lower()}'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        assignment.status = 'DISCHARGED'
-        assignment.discharge_date = request.data['discharge_date']
-        assignment.discharge_notes = request.data.get('discharge_notes', '')
-        assignment.save()
+        discharge_date = parse_datetime(str(request.data['discharge_date']))
+        if discharge_date is None:
+            return Response({
+                'success': False,
+                'error': 'discharge_date must be an ISO datetime'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(discharge_date):
+            discharge_date = timezone.make_aware(discharge_date)
         
-        # TODO: Send to finance for final ward billing
+        # Frees the bed and sends the unbilled days to finance
+        final_charges = discharge_from_bed(
+            assignment,
+            discharge_date,
+            discharge_notes=request.data.get('discharge_notes', ''),
+            user=request.user
+        )
         
         return Response({
             'success': True,
             'message': 'Patient discharged successfully',
             'total_days': assignment.days_admitted,
-            'total_ward_charges': float(assignment.total_ward_charges)
+            'total_ward_charges': float(assignment.total_ward_charges),
+            'final_bill_amount': float(sum(payment.amount for payment in final_charges)),
+            'payment_ids': [str(payment.id) for payment in final_charges]
         })
         
     except Exception as e:
@@ -201,3 +230,47 @@ def discharge_patient(request, assignment_id):
             'success': False,
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated, IsStaffMember])
+def ward_beds(request):
+    """
+    GET: Bed inventory with per-ward occupancy
+    POST: Add a bed to the inventory
+    """
+    if request.method == 'GET':
+        beds = WardBed.objects.all()
+        ward_type = request.GET.get('ward_type')
+        if ward_type:
+            beds = beds.filter(ward_type=ward_type)
+        if request.GET.get('available') == 'true':
+            beds = beds.filter(is_active=True, is_occupied=False)
+        
+        return Response({
+            'success': True,
+            'occupancy': ward_occupancy(),
+            'beds': list(beds.values(
+                'id', 'ward_type', 'bed_number', 'daily_fee', 'is_occupied', 'is_active'
+            ))
+        })
+    
+    elif request.method == 'POST':
+        try:
+            bed = WardBed.objects.create(
+                ward_type=request.data['ward_type'],
+                bed_number=request.data['bed_number'],
+                daily_fee=request.data['daily_fee']
+            )
+            
+            return Response({
+                'success': True,
+                'message': 'Bed added successfully',
+                'bed_id': str(bed.id)
+            }, status=status.HTTP_201_CREATED)
+            
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
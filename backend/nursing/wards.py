@@ -0,0 +1,197 @@
+"""
+Ward occupancy and billing engine.
+
+Stay length and charges are computed in SQL, occupancy is one GROUP BY over
+the bed inventory, and ward charges are posted to finance as ServicePayment
+rows in bulk: per discharge, and nightly for patients still admitted
+(see the accrue_ward_charges management command).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Count, DateTimeField, DecimalField, DurationField, ExpressionWrapper, F, Q, Value
+)
+from django.db.models.functions import Coalesce, ExtractDay, TruncDate
+from django.utils import timezone
+
+from .models import WardAssignment, WardBed
+
+
+class BedUnavailable(Exception):
+    """Raised when the requested bed is occupied or out of service"""
+
+
+def with_stay(queryset, as_of=None):
+    """
+    Annotate stay_days and stay_charges on WardAssignment rows.
+
+    Mirrors the days_admitted / total_ward_charges properties (admission
+    day counts as a full day) without loading rows into Python.
+    """
+    as_of = as_of or timezone.now()
+    stay = ExpressionWrapper(
+        TruncDate(Coalesce('discharge_date', Value(as_of, output_field=DateTimeField())))
+        - TruncDate('admission_date'),
+        output_field=DurationField()
+    )
+    return queryset.annotate(
+        stay_days=ExtractDay(stay) + 1
+    ).annotate(
+        stay_charges=ExpressionWrapper(
+            F('stay_days') * F('daily_ward_fee'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        )
+    )
+
+
+def ward_occupancy():
+    """Beds, occupied beds and free beds per ward in one query"""
+    rows = WardBed.objects.filter(is_active=True).values('ward_type').annotate(
+        total_beds=Count('id'),
+        occupied_beds=Count('id', filter=Q(is_occupied=True))
+    ).order_by('ward_type')
+
+    return [
+        {
+            'ward_type': row['ward_type'],
+            'total_beds': row['total_beds'],
+            'occupied_beds': row['occupied_beds'],
+            'available_beds': row['total_beds'] - row['occupied_beds'],
+            'occupancy_rate': round(row['occupied_beds'] * 100 / row['total_beds'], 1) if row['total_beds'] else 0,
+        }
+        for row in rows
+    ]
+
+
+def admit_to_bed(ward_type, bed_number, daily_fee=None, **assignment_fields):
+    """
+    Create an ADMITTED assignment and mark the bed occupied.
+
+    Beds missing from the inventory are added on first use with the given
+    daily fee, so wards that have not been set up keep working.
+    """
+    with transaction.atomic():
+        bed, _ = WardBed.objects.select_for_update().get_or_create(
+            ward_type=ward_type,
+            bed_number=bed_number,
+            defaults={'daily_fee': daily_fee or Decimal('0.00')}
+        )
+        if bed.is_occupied or not bed.is_active:
+            raise BedUnavailable(f'{ward_type} bed {bed_number} is not available')
+
+        assignment = WardAssignment.objects.create(
+            ward_type=ward_type,
+            bed_number=bed_number,
+            bed=bed,
+            daily_ward_fee=daily_fee if daily_fee is not None else bed.daily_fee,
+            status='ADMITTED',
+            **assignment_fields
+        )
+        WardBed.objects.filter(pk=bed.pk).update(is_occupied=True, updated_at=timezone.now())
+
+    return assignment
+
+
+def _unbilled_period(assignment, through_date):
+    """First and last unbilled day for an assignment, or None if nothing is due"""
+    start = assignment['billed_through'] + timedelta(days=1) if assignment['billed_through'] \
+        else timezone.localtime(assignment['admission_date']).date()
+    if start > through_date:
+        return None
+    return start, through_date
+
+
+def post_ward_charges(assignments, through_date, user=None):
+    """
+    Post unbilled ward days up to through_date as PENDING ServicePayments.
+
+    assignments are dicts with id, patient_id, patient_name, ward_type,
+    bed_number, daily_ward_fee, admission_date and billed_through. Payments
+    are inserted with one bulk_create and billed_through is advanced with
+    one UPDATE, so running it twice for the same day posts nothing new.
+
+    Each charge is referenced as <assignment id>:<last day billed>, so
+    every nightly charge of an admission is told apart. bulk_create skips
+    ServicePayment.save() and its signals, so the open visit is linked and
+    the change feed entries are written here.
+
+    Returns:
+        list: The ServicePayment rows created
+    """
+    from finance.models import ServicePayment
+    from patients.changes import record_changes
+    from patients.models import Visit
+
+    payments = []
+    billed_ids = []
+    for assignment in assignments:
+        period = _unbilled_period(assignment, through_date)
+        if not period:
+            continue
+        start, end = period
+        days = (end - start).days + 1
+        payments.append(ServicePayment(
+            patient_id=assignment['patient_id'],
+            patient_name=assignment['patient_name'],
+            service_type='WARD',
+            service_name=f"Ward charges - {assignment['ward_type']} bed {assignment['bed_number']} ({start} to {end}, {days} days)",
+            reference_id=f"{assignment['id']}:{end:%Y%m%d}",
+            amount=assignment['daily_ward_fee'] * days,
+            status='PENDING',
+            processed_by=user,
+            notes=f"{days} x {assignment['daily_ward_fee']} TZS"
+        ))
+        billed_ids.append(assignment['id'])
+
+    if not payments:
+        return []
+
+    with transaction.atomic():
+        open_visits = dict(
+            Visit.objects.open().filter(
+                patient__patient_id__in={payment.patient_id for payment in payments}
+            ).values_list('patient__patient_id', 'id')
+        )
+        for payment in payments:
+            payment.visit_id = open_visits.get(payment.patient_id)
+        created = ServicePayment.objects.bulk_create(payments)
+        WardAssignment.objects.filter(id__in=billed_ids).update(billed_through=through_date)
+        record_changes('PAYMENT', [payment.id for payment in created])
+        # No cached response is built from payments or ward assignments
+        # (core.caching.TAG_MODELS), so there is no cache tag to invalidate
+    return created
+
+
+BILLING_FIELDS = [
+    'id', 'patient_id', 'patient_name', 'ward_type', 'bed_number',
+    'daily_ward_fee', 'admission_date', 'billed_through',
+]
+
+
+def accrue_ward_charges(through_date=None, user=None):
+    """Nightly job: bill every admitted patient up to through_date (default yesterday)"""
+    through_date = through_date or timezone.localdate() - timedelta(days=1)
+    assignments = WardAssignment.objects.filter(status='ADMITTED').values(*BILLING_FIELDS)
+    return post_ward_charges(assignments, through_date, user=user)
+
+
+def discharge_from_bed(assignment, discharge_date, discharge_notes='', user=None):
+    """
+    Discharge a patient, free the bed and post the remaining ward days.
+
+    Returns:
+        list: The ServicePayment rows created for the final bill
+    """
+    with transaction.atomic():
+        assignment.status = 'DISCHARGED'
+        assignment.discharge_date = discharge_date
+        assignment.discharge_notes = discharge_notes
+        assignment.save(update_fields=['status', 'discharge_date', 'discharge_notes'])
+
+        if assignment.bed_id:
+            WardBed.objects.filter(pk=assignment.bed_id).update(is_occupied=False, updated_at=timezone.now())
+
+        row = {field: getattr(assignment, field) for field in BILLING_FIELDS}
+        return post_ward_charges([row], timezone.localtime(assignment.discharge_date).date(), user=user)
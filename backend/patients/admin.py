@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Patient, PatientStatusHistory, PatientNote
+from .models import (
+    Patient, PatientStatusHistory, PatientNote, Visit, StageDurationRollup, WorkflowRepairRun
+)
 
 
 @admin.register(Patient)
@@ -65,6 +67,20 @@ class PatientStatusHistoryAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('patient', 'changed_by')
 
 
+@admin.register(Visit)
+class VisitAdmin(admin.ModelAdmin):
+    list_display = [
+        'patient', 'status', 'location', 'checked_in_at',
+        'consultation_started_at', 'closed_at'
+    ]
+    list_filter = ['status', 'checked_in_at']
+    search_fields = ['patient__patient_id', 'patient__full_name']
+    readonly_fields = ['checked_in_at', 'status_changed_at', 'consultation_started_at', 'closed_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('patient', 'checked_in_by')
+
+
 @admin.register(PatientNote)
 class PatientNoteAdmin(admin.ModelAdmin):
     list_display = ['patient', 'note_type', 'created_by', 'created_at']
@@ -74,3 +90,20 @@ class PatientNoteAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('patient', 'created_by')
+
+
+@admin.register(StageDurationRollup)
+class StageDurationRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'department', 'metric', 'count', 'p50_seconds', 'p90_seconds']
+    list_filter = ['department', 'metric']
+    date_hierarchy = 'hour'
+
+
+@admin.register(WorkflowRepairRun)
+class WorkflowRepairRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'dry_run', 'total_found', 'total_fixed', 'run_by']
+    list_filter = ['dry_run', 'started_at']
+    readonly_fields = [
+        'started_at', 'finished_at', 'dry_run', 'stale_hours', 'results',
+        'total_found', 'total_fixed', 'run_by'
+    ]
@@ -0,0 +1,249 @@
+"""
+Per-visit turnaround analytics from PatientStatusHistory.
+
+Every history row starts a stage that lasts until the patient's next
+history row. build_stage_durations pairs the rows with a LEAD window over
+changed_at partitioned by patient, writes one StageDuration fact per
+finished stage and rebuilds the StageDurationRollup hours it touched with
+PERCENTILE_CONT, so turnaround dashboards read precomputed p50/p90.
+
+Runs are incremental: only history from a little before the newest
+finished stage is read again, and facts are keyed by their history row so
+re-reading a stage is a no-op.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Aggregate, Avg, Count, DurationField, ExpressionWrapper, F, FloatField, Max, Window
+)
+from django.db.models.functions import Cast, Extract, Lead, TruncHour
+from django.utils import timezone
+
+from .models import PatientStatusHistory, StageDuration, StageDurationRollup, Visit
+
+# status -> (metric, department). COMPLETED and DISCHARGED end the visit, so
+# the time until the next visit is not a stage.
+STAGES = {
+    'REGISTERED': ('door_to_doctor', 'RECEPTION'),
+    'WAITING_DOCTOR': ('door_to_doctor', 'DOCTOR'),
+    'WITH_DOCTOR': ('consultation', 'DOCTOR'),
+    'PENDING_CONSULTATION_PAYMENT': ('cashier_wait', 'FINANCE'),
+    'PENDING_LAB_PAYMENT': ('cashier_wait', 'FINANCE'),
+    'PAYMENT_PENDING': ('cashier_wait', 'FINANCE'),
+    'TREATMENT_PRESCRIBED': ('cashier_wait', 'FINANCE'),
+    'CONSULTATION_PAID': ('paid_to_service', 'FINANCE'),
+    'LAB_PAID': ('doctor_to_lab', 'LAB'),
+    'WAITING_LAB': ('doctor_to_lab', 'LAB'),
+    'IN_LAB': ('lab_turnaround', 'LAB'),
+    'LAB_COMPLETED': ('lab_turnaround', 'LAB'),
+    'LAB_RESULTS_READY': ('results_to_doctor', 'DOCTOR'),
+    'PHARMACY_PAID': ('pharmacy_wait', 'PHARMACY'),
+    'WAITING_PHARMACY': ('pharmacy_wait', 'PHARMACY'),
+    'IN_PHARMACY': ('dispensing', 'PHARMACY'),
+}
+
+# Whole visits (check-in to close) are rolled up from Visit
+VISIT_METRIC = ('visit_total', 'ALL')
+
+# History is re-read from this far before the newest finished stage, which
+# bounds the stages measured: one still open after a day is an abandoned
+# visit (see repair_stuck_workflows), not a turnaround figure
+REOPEN_WINDOW = timedelta(days=1)
+# Leave recent rows to the next run so a transition committed late is not
+# paired with the wrong next row
+SETTLE_LAG = timedelta(minutes=5)
+
+
+class Percentile(Aggregate):
+    """PostgreSQL PERCENTILE_CONT(fraction) WITHIN GROUP (ORDER BY expression)"""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def _rollup_aggregates(seconds):
+    return {
+        'count': Count('pk'),
+        'avg_seconds': Avg(seconds, output_field=FloatField()),
+        'p50_seconds': Percentile(seconds, 0.5),
+        'p90_seconds': Percentile(seconds, 0.9),
+        'max_seconds': Max(seconds),
+    }
+
+
+def _visit_seconds():
+    return Cast(Extract(
+        ExpressionWrapper(F('closed_at') - F('checked_in_at'), output_field=DurationField()),
+        'epoch'
+    ), FloatField())
+
+
+def rebuild_rollups(hours):
+    """
+    Recompute the StageDurationRollup rows for the given hours.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    hours = sorted(set(hours))
+    if not hours:
+        return 0
+
+    buckets = list(
+        StageDuration.objects.filter(hour__in=hours).values(
+            'hour', 'department', 'metric'
+        ).annotate(**_rollup_aggregates('duration_seconds')).order_by()
+    )
+
+    metric, department = VISIT_METRIC
+    visit_buckets = Visit.objects.filter(
+        closed_at__isnull=False,
+        checked_in_at__gte=hours[0],
+        checked_in_at__lt=hours[-1] + timedelta(hours=1),
+    ).annotate(
+        hour=TruncHour('checked_in_at')
+    ).filter(hour__in=hours).values('hour').annotate(
+        **_rollup_aggregates(_visit_seconds())
+    ).order_by()
+    buckets += [dict(bucket, metric=metric, department=department) for bucket in visit_buckets]
+
+    rows = [
+        StageDurationRollup(
+            hour=bucket['hour'],
+            department=bucket['department'],
+            metric=bucket['metric'],
+            count=bucket['count'],
+            avg_seconds=bucket['avg_seconds'],
+            p50_seconds=bucket['p50_seconds'],
+            p90_seconds=bucket['p90_seconds'],
+            max_seconds=int(bucket['max_seconds']),
+        )
+        for bucket in buckets
+    ]
+
+    with transaction.atomic():
+        StageDurationRollup.objects.filter(hour__in=hours).delete()
+        StageDurationRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def build_stage_durations(now=None):
+    """
+    Batch job: write StageDuration facts for stages finished since the
+    last run and refresh the rollups of the hours they fall in.
+
+    Returns:
+        tuple: (facts written, rollup rows written)
+    """
+    now = now or timezone.now()
+    watermark = StageDuration.objects.aggregate(last=Max('exited_at'))['last']
+    since = watermark - REOPEN_WINDOW if watermark else None
+
+    history = PatientStatusHistory.objects.filter(changed_at__lte=now - SETTLE_LAG)
+    if since:
+        history = history.filter(changed_at__gte=since)
+
+    # The window runs over every row in range, terminal ones included, so
+    # each row is paired with the patient's true next change
+    following = {
+        'partition_by': [F('patient_id')],
+        'order_by': [F('changed_at').asc(), F('id').asc()],
+    }
+    stages = history.order_by().annotate(
+        exited_at=Window(Lead('changed_at'), **following),
+        next_status=Window(Lead('new_status'), **following),
+    ).filter(exited_at__isnull=False).values_list(
+        'id', 'patient_id', 'new_status', 'next_status', 'changed_at', 'exited_at'
+    )
+
+    stages = [stage for stage in stages if stage[2] in STAGES]
+    seen = set(StageDuration.objects.filter(
+        history_id__in=[stage[0] for stage in stages]
+    ).values_list('history_id', flat=True)) if since else set()
+    stages = [stage for stage in stages if stage[0] not in seen]
+
+    # Visit each stage belongs to: the patient's latest check-in before it
+    visits = defaultdict(list)
+    if stages:
+        for visit_id, patient_id, checked_in_at in Visit.objects.filter(
+            patient_id__in={stage[1] for stage in stages},
+            checked_in_at__lte=max(stage[4] for stage in stages),
+        ).order_by('checked_in_at').values_list('id', 'patient_id', 'checked_in_at'):
+            visits[patient_id].append((checked_in_at, visit_id))
+
+    facts = []
+    for history_id, patient_id, status, next_status, entered_at, exited_at in stages:
+        metric, department = STAGES[status]
+        visit_id = None
+        for checked_in_at, candidate in visits.get(patient_id, []):
+            if checked_in_at > entered_at:
+                break
+            visit_id = candidate
+        facts.append(StageDuration(
+            history_id=history_id,
+            patient_id=patient_id,
+            visit_id=visit_id,
+            status=status,
+            next_status=next_status,
+            metric=metric,
+            department=department,
+            entered_at=entered_at,
+            exited_at=exited_at,
+            hour=entered_at.replace(minute=0, second=0, microsecond=0),
+            duration_seconds=max(int((exited_at - entered_at).total_seconds()), 0),
+        ))
+
+    StageDuration.objects.bulk_create(facts, batch_size=1000, ignore_conflicts=True)
+
+    hours = {fact.hour for fact in facts}
+    closed_visits = Visit.objects.filter(closed_at__isnull=False)
+    if since:
+        closed_visits = closed_visits.filter(closed_at__gte=since)
+    hours |= set(closed_visits.annotate(
+        hour=TruncHour('checked_in_at')
+    ).values_list('hour', flat=True).distinct())
+
+    return len(facts), rebuild_rollups(hours)
+
+
+def turnaround_summary(days=7, department=None):
+    """
+    Turnaround figures for the last `days` days.
+
+    hourly comes straight from the rollups; overall percentiles per metric
+    are taken over the narrow fact table (and Visit for whole visits).
+    """
+    since = (timezone.now() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+
+    rollups = StageDurationRollup.objects.filter(hour__gte=since)
+    facts = StageDuration.objects.filter(hour__gte=since)
+    if department:
+        rollups = rollups.filter(department=department)
+        facts = facts.filter(department=department)
+
+    overall = list(
+        facts.values('metric', 'department').annotate(
+            **_rollup_aggregates('duration_seconds')
+        ).order_by('department', 'metric')
+    )
+    metric, visit_department = VISIT_METRIC
+    if department in (None, visit_department):
+        visits = Visit.objects.filter(closed_at__isnull=False, checked_in_at__gte=since).aggregate(
+            **_rollup_aggregates(_visit_seconds())
+        )
+        if visits['count']:
+            overall.append(dict(visits, metric=metric, department=visit_department))
+
+    return {
+        'since': since,
+        'overall': overall,
+        'hourly': list(rollups.order_by('hour', 'department', 'metric').values(
+            'hour', 'department', 'metric', 'count',
+            'avg_seconds', 'p50_seconds', 'p90_seconds', 'max_seconds'
+        )),
+    }
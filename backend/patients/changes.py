@@ -0,0 +1,196 @@
+"""
+Change feeds for portal queues.
+
+Every write to a row a queue shows (patient status, service payment, lab
+request, prescription queue entry) appends a ChangeLogEntry in the same
+transaction: model signals cover save() and delete(), and the bulk
+writers that bypass them call record_changes() themselves.
+
+GET <portal>/changes/?since=<cursor> returns the rows changed since the
+cursor that are in the portal's queue now (upserts) and the ids that
+changed but are no longer in it (removed), plus the next cursor. Without
+a cursor, or when the cursor predates pruned history, the whole queue is
+returned with reset=true.
+
+Cursors are PostgreSQL transaction id horizons, not entry ids: entry ids
+are handed out before commit, so a slow transaction can commit an id
+below one a client has already passed. Every transaction below the
+snapshot's xmin has finished, so a page covers txids in
+[since, xmin) and nothing can still appear in a range already served.
+"""
+import time
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+
+from .models import ChangeLogEntry
+
+# Entries per page; a transaction is never split across pages
+FEED_PAGE_SIZE = 500
+
+
+def _current_txid():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT txid_current()')
+            return cursor.fetchone()[0]
+    # Single-writer development databases: a microsecond clock
+    return time.time_ns() // 1000
+
+
+def _horizon():
+    """Lowest txid that may still be in flight"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+            return cursor.fetchone()[0]
+    return time.time_ns() // 1000
+
+
+def record_changes(entity, object_ids):
+    """
+    Log writes to rows of an entity (call inside the writing transaction).
+
+    The txid is read and the entries inserted in one transaction (the
+    caller's, or a new one after an autocommit save()), so an entry
+    always commits together with the txid it carries.
+    """
+    object_ids = {str(object_id) for object_id in object_ids if object_id}
+    if not object_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        txid = _current_txid()
+        ChangeLogEntry.objects.bulk_create([
+            ChangeLogEntry(entity=entity, object_id=object_id, txid=txid)
+            for object_id in sorted(object_ids)
+        ])
+
+
+def _recorder(entity, key=lambda instance: instance.pk):
+    def receiver(sender, instance, raw=False, **kwargs):
+        if not raw:
+            record_changes(entity, [key(instance)])
+    return receiver
+
+
+def connect_signals():
+    """Called from PatientsConfig.ready()"""
+    # Transitions update Patient with QuerySet.update() and insert a
+    # history row, so the history row stands for the patient write
+    tracked = [
+        ('patients.Patient', 'PATIENT', lambda instance: instance.pk, True),
+        ('patients.PatientStatusHistory', 'PATIENT', lambda instance: instance.patient_id, False),
+        ('finance.ServicePayment', 'PAYMENT', lambda instance: instance.pk, True),
+        ('doctor.LabTestRequest', 'LAB_REQUEST', lambda instance: instance.pk, True),
+        # A recorded result takes a request off the lab queue
+        ('lab.LabTestResult', 'LAB_REQUEST', lambda instance: instance.test_request_id, False),
+        ('pharmacy.PrescriptionQueue', 'PRESCRIPTION', lambda instance: instance.pk, True),
+    ]
+    for model, entity, key, track_delete in tracked:
+        post_save.connect(
+            _recorder(entity, key), sender=model, weak=False,
+            dispatch_uid=f'change_log:save:{model}'
+        )
+        if track_delete:
+            post_delete.connect(
+                _recorder(entity, key), sender=model, weak=False,
+                dispatch_uid=f'change_log:delete:{model}'
+            )
+
+
+def _pruned_below():
+    marker = ChangeLogEntry.objects.filter(entity='PRUNED').order_by('-txid').values_list('txid', flat=True).first()
+    return marker or 0
+
+
+def prune_change_log(before):
+    """
+    Delete entries written before `before`. Feeds whose cursor falls in
+    the pruned range are sent a full reset instead of a partial page.
+
+    Returns:
+        int: Entries deleted
+    """
+    with transaction.atomic():
+        last_txid = ChangeLogEntry.objects.exclude(entity='PRUNED').filter(
+            created_at__lt=before
+        ).aggregate(last=Max('txid'))['last']
+        if last_txid is None:
+            return 0
+        # Whole transactions go, so a page never sees half of one
+        deleted, _ = ChangeLogEntry.objects.exclude(entity='PRUNED').filter(txid__lte=last_txid).delete()
+        ChangeLogEntry.objects.filter(entity='PRUNED').delete()
+        ChangeLogEntry.objects.create(entity='PRUNED', txid=last_txid + 1)
+    return deleted
+
+
+def read_feed(entity, since, queryset, serialize, key='pk'):
+    """
+    One page of an entity's changes for a portal queue.
+
+    Args:
+        entity (str): ChangeLogEntry entity
+        since (int or None): Cursor from the previous page
+        queryset: The rows currently in the portal's queue
+        serialize: Callable turning a list of rows into JSON-ready dicts
+        key (str): Field of queryset matching ChangeLogEntry.object_id
+
+    Returns:
+        dict: cursor, reset, has_more, upserts, removed
+    """
+    horizon = _horizon()
+
+    if since is None or since < _pruned_below():
+        return {
+            'cursor': horizon,
+            'reset': True,
+            'has_more': False,
+            'upserts': serialize(list(queryset)),
+            'removed': [],
+        }
+
+    page = list(
+        ChangeLogEntry.objects.filter(
+            entity=entity, txid__gte=since, txid__lt=horizon
+        ).order_by('txid', 'id').values_list('txid', 'object_id')[:FEED_PAGE_SIZE]
+    )
+    cursor, has_more = horizon, False
+    if len(page) == FEED_PAGE_SIZE:
+        boundary = page[-1][0]
+        has_more = True
+        if boundary > since:
+            # Stop before the last transaction so it is served whole next time
+            page = [entry for entry in page if entry[0] < boundary]
+            cursor = boundary
+        else:
+            # One transaction fills the page: serve all of it
+            page = list(
+                ChangeLogEntry.objects.filter(entity=entity, txid=boundary).values_list('txid', 'object_id')
+            )
+            cursor = boundary + 1
+
+    changed = list(dict.fromkeys(object_id for _, object_id in page))
+    rows = list(queryset.filter(**{f'{key}__in': changed})) if changed else []
+    present = {str(getattr(row, key)) for row in rows}
+
+    return {
+        'cursor': cursor,
+        'reset': False,
+        'has_more': has_more,
+        'upserts': serialize(rows),
+        'removed': [object_id for object_id in changed if object_id not in present],
+    }
+
+
+def parse_cursor(request):
+    """
+    ?since= as an int, None when absent.
+
+    Raises:
+        ValueError: since is not an integer
+    """
+    since = request.query_params.get('since')
+    if since in (None, ''):
+        return None
+    return int(since)
@@ -0,0 +1,202 @@
+"""
+Bulk patient import from legacy CSV/XLSX registers.
+
+Rows are streamed from the file, validated with the PatientCreateSerializer
+rules, checked against existing records one batch at a time and written with
+bulk_create. Memory use depends on the batch size, not the file size.
+
+Imported patients are registry entries only: no visit, payment or status
+history is created for them, and they are written with a closed status
+(IMPORTED_STATUS) so they stay out of the queues until they check in.
+"""
+import csv
+import io
+from datetime import datetime
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Patient
+from .serializers import PatientCreateSerializer
+
+IMPORT_BATCH_SIZE = 1000
+# Not a queue status: imported patients have not checked in
+IMPORTED_STATUS = 'COMPLETED'
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'paid'}
+
+
+def normalize_header(header):
+    """'Phone Number ' -> 'phone_number'"""
+    return str(header or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def clean_value(value):
+    """Turn spreadsheet cell values into what the serializer expects"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, float) and value.is_integer():
+        # Excel stores numeric columns (phones, card numbers) as floats
+        return str(int(value))
+    value = str(value).strip()
+    return value or None
+
+
+def iter_csv_rows(fileobj):
+    """Yield dict rows from a CSV file object (text or binary)"""
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+    reader = csv.reader(text)
+    headers = [normalize_header(h) for h in next(reader, [])]
+    for values in reader:
+        yield dict(zip(headers, values))
+
+
+def iter_xlsx_rows(fileobj):
+    """Yield dict rows from the first sheet of an XLSX workbook"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('XLSX import requires openpyxl. Install it or upload a CSV file.')
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [normalize_header(h) for h in next(rows, [])]
+        for values in rows:
+            yield dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    """Pick the reader from the file extension"""
+    name = (filename or '').lower()
+    if name.endswith('.xlsx'):
+        return iter_xlsx_rows(fileobj)
+    if name.endswith('.csv'):
+        return iter_csv_rows(fileobj)
+    raise ValueError('Unsupported file type. Upload a .csv or .xlsx file.')
+
+
+def _flatten_errors(detail):
+    """ValidationError detail -> {field: 'message; message'}"""
+    if isinstance(detail, dict):
+        return {
+            field: '; '.join(str(message) for message in messages)
+            if isinstance(messages, list) else str(messages)
+            for field, messages in detail.items()
+        }
+    return {'non_field_errors': '; '.join(str(message) for message in detail)}
+
+
+class PatientImporter:
+    """
+    Stream rows into Patient records.
+
+    Errors are reported through on_error(row_number, errors) as they are
+    found, so callers decide whether to write them to a file or collect them.
+    Row numbers match the spreadsheet (header is row 1).
+    """
+
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE, dry_run=False, on_error=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_error = on_error or (lambda row_number, errors: None)
+        # One serializer instance validates every row, so field objects are
+        # built once instead of per row
+        self.validator = PatientCreateSerializer()
+        self.total_rows = 0
+        self.imported = 0
+        self.failed = 0
+
+    def run(self, rows):
+        batch = []
+        for row_number, row in enumerate(rows, start=2):
+            data = {key: clean_value(value) for key, value in row.items() if key}
+            if not any(data.values()):
+                continue  # Blank line
+
+            self.total_rows += 1
+            file_fee_paid = str(data.pop('file_fee_paid', '') or '').lower() in TRUE_VALUES
+            data = {key: value for key, value in data.items() if value is not None}
+
+            try:
+                validated = self.validator.run_validation(data)
+            except serializers.ValidationError as e:
+                self._fail(row_number, _flatten_errors(e.detail))
+                continue
+
+            patient = Patient(
+                created_by=self.user,
+                file_fee_paid=file_fee_paid,
+                current_status=IMPORTED_STATUS,
+                current_location=None,
+                **validated
+            )
+            patient.normalize_names()
+            patient.apply_file_fee_rules()
+            batch.append((row_number, patient))
+
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+
+        if batch:
+            self._write_batch(batch)
+
+        return self.summary()
+
+    def summary(self):
+        return {
+            'total_rows': self.total_rows,
+            'imported': self.imported,
+            'failed': self.failed,
+            'dry_run': self.dry_run,
+        }
+
+    def _fail(self, row_number, errors):
+        self.failed += 1
+        self.on_error(row_number, errors)
+
+    def _write_batch(self, batch):
+        patients = self._drop_duplicates(batch)
+        if not patients:
+            return
+        if self.dry_run:
+            self.imported += len(patients)
+            return
+
+        with transaction.atomic():
+            patient_ids = Patient.objects.allocate_patient_ids(len(patients))
+            for patient, patient_id in zip(patients, patient_ids):
+                patient.patient_id = patient_id
+            Patient.objects.bulk_create(patients, batch_size=self.batch_size)
+        self.imported += len(patients)
+
+    def _drop_duplicates(self, batch):
+        """
+        Skip rows matching an existing patient (or an earlier row in the batch)
+        on name, phone and date of birth, so re-running an import is safe.
+        """
+        existing = set(
+            Patient.objects.filter(
+                phone_number__in={patient.phone_number for _, patient in batch}
+            ).values_list('full_name', 'phone_number', 'date_of_birth')
+        )
+
+        patients = []
+        for row_number, patient in batch:
+            key = (patient.full_name, patient.phone_number, patient.date_of_birth)
+            if key in existing:
+                self._fail(row_number, {'non_field_errors': 'Patient already registered'})
+                continue
+            existing.add(key)
+            patients.append(patient)
+        return patients
@@ -0,0 +1,103 @@
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, OuterRef, Subquery
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import renderers
+from core.renderers import FastJSONParser, FastJSONRenderer
+from doctor.models import Consultation
+from patients.models import Patient
+from patients.repairs import default_repair_user
+
+User = get_user_model()
+
+# The largest bodies the portals fetch
+ENDPOINTS = [
+    '/api/doctor/consultations/',
+    '/api/finance/payments/by-service-type/',
+    '/api/finance/payments/pending/',
+]
+
+
+def _busiest_patient():
+    """patient_id with the most consultations, so its history is the largest"""
+    return Patient.objects.annotate(
+        consultations=Subquery(
+            Consultation.objects.filter(patient_id=OuterRef('patient_id')).order_by().values(
+                'patient_id'
+            ).annotate(count=Count('id')).values('count')[:1]
+        )
+    ).order_by('-consultations', 'created_at').values_list('patient_id', flat=True).first()
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the largest endpoint bodies with DRF\'s JSONRenderer and the orjson '
+        'FastJSONRenderer, check the bytes are identical and compare render and parse times.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee-id', help='Account to fetch as (default: first administrator)')
+        parser.add_argument('--patient-id', help='Patient for complete-history (default: most consultations)')
+        parser.add_argument('--url', action='append', default=[], help='Extra endpoint to include')
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per measurement (best is reported)')
+
+    def _best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError('orjson is not installed; FastJSONRenderer is plain JSONRenderer')
+
+        if options['employee_id']:
+            user = User.objects.filter(employee_id=options['employee_id'].upper()).first()
+        else:
+            user = default_repair_user()
+        if user is None:
+            raise CommandError('No account to fetch the endpoints as')
+
+        urls = ENDPOINTS + options['url']
+        patient_id = options['patient_id'] or _busiest_patient()
+        if patient_id:
+            urls.append(f'/api/patients/{patient_id}/complete-history/')
+
+        client = APIClient()
+        client.force_authenticate(user)
+        repeat = options['repeat']
+
+        self.stdout.write(
+            f'{"endpoint":<48} {"bytes":>9} {"render":>9} {"orjson":>9} {"speedup":>8} '
+            f'{"parse":>9} {"orjson":>9} {"speedup":>8}'
+        )
+        for url in urls:
+            response = client.get(url)
+            if response.status_code != 200:
+                self.stdout.write(f'{url:<48} skipped ({response.status_code})')
+                continue
+            data = response.data
+
+            body = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != body:
+                raise CommandError(f'{url}: rendered bodies differ')
+            if FastJSONParser().parse(io.BytesIO(body)) != JSONParser().parse(io.BytesIO(body)):
+                raise CommandError(f'{url}: parsed bodies differ')
+
+            render = self._best(repeat, lambda: JSONRenderer().render(data))
+            fast_render = self._best(repeat, lambda: FastJSONRenderer().render(data))
+            parse = self._best(repeat, lambda: JSONParser().parse(io.BytesIO(body)))
+            fast_parse = self._best(repeat, lambda: FastJSONParser().parse(io.BytesIO(body)))
+            self.stdout.write(
+                f'{url[:48]:<48} {len(body):>9} '
+                f'{render * 1000:>7.2f}ms {fast_render * 1000:>7.2f}ms {render / fast_render:>7.1f}x '
+                f'{parse * 1000:>7.2f}ms {fast_parse * 1000:>7.2f}ms {parse / fast_parse:>7.1f}x'
+            )
@@ -0,0 +1,179 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import cycle
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from doctor.models import Consultation
+from doctor.serializers import ConsultationListSerializer, consultation_list_rows
+from finance.models import ServicePayment
+from finance.serializers import ServicePaymentSerializer, service_payment_rows
+from patients.models import Patient
+from patients.serializers import PatientSearchSerializer, patient_search_rows
+from pharmacy.models import Medication
+from pharmacy.serializers import MedicationListSerializer, medication_list_rows
+
+User = get_user_model()
+
+# Synthetic rows carry this prefix in a key column so only they are listed
+MARKER = 'BNC'
+BATCH_SIZE = 5000
+PARITY_SAMPLE = 1000
+
+
+def _choices(model, field_name):
+    return cycle([value for value, _ in model._meta.get_field(field_name).choices])
+
+
+def _patients(count, user):
+    genders, types, statuses = (_choices(Patient, name) for name in ('gender', 'patient_type', 'current_status'))
+    for index in range(count):
+        patient_type = next(types)
+        yield Patient(
+            patient_id=f'{MARKER}{index:08d}',
+            first_name='BENCH', last_name=f'PATIENT {index}', full_name=f'BENCH PATIENT {index}',
+            phone_number=f'+2557{index:08d}',
+            gender=next(genders),
+            date_of_birth=date(1950, 1, 1) + timedelta(days=index % 25000),
+            patient_type=patient_type,
+            nhif_card_number=f'NH{index:08d}' if patient_type == 'NHIF' else None,
+            current_status=next(statuses),
+            created_by=user,
+        )
+
+
+def _consultations(count, user):
+    priorities, statuses = _choices(Consultation, 'priority'), _choices(Consultation, 'status')
+    for index in range(count):
+        recorded = index % 3 != 0
+        yield Consultation(
+            patient_id=f'{MARKER}{index:08d}',
+            patient_name=f'BENCH PATIENT {index}',
+            doctor=user,
+            chief_complaint='Headache and fever',
+            diagnosis='Malaria' if index % 2 else '',
+            priority=next(priorities),
+            status=next(statuses),
+            blood_pressure_systolic=110 + index % 30 if recorded else None,
+            blood_pressure_diastolic=70 + index % 20 if recorded else None,
+        )
+
+
+def _payments(count, user):
+    types, statuses = _choices(ServicePayment, 'service_type'), _choices(ServicePayment, 'status')
+    now = timezone.now()
+    for index in range(count):
+        paid = next(statuses)
+        yield ServicePayment(
+            patient_id=f'{MARKER}{index:08d}',
+            patient_name=f'BENCH PATIENT {index}',
+            service_type=next(types),
+            service_name='Benchmark service',
+            reference_id=str(index) if index % 2 else None,
+            amount=Decimal(1000 + index % 50000) / 4,
+            status=paid,
+            payment_date=now - timedelta(minutes=index) if paid == 'PAID' else None,
+            processed_by=user if index % 2 else None,
+        )
+
+
+def _medications(count, user):
+    categories = _choices(Medication, 'category')
+    for index in range(count):
+        yield Medication(
+            name=f'Bench Medication {index}',
+            generic_name='Benchmarkol',
+            manufacturer='Bench Pharma',
+            barcode=f'{MARKER}-{index:08d}',
+            category=next(categories),
+            current_stock=index % 40,
+            reorder_level=10,
+            unit_price=Decimal(index % 10000) / 100,
+            is_active=index % 7 != 0,
+            created_by=user,
+        )
+
+
+# name -> (serializer, fast path, synthetic rows, marker column, select_related)
+CASES = {
+    'patients': (PatientSearchSerializer, patient_search_rows, _patients, 'patient_id', []),
+    'consultations': (ConsultationListSerializer, consultation_list_rows, _consultations, 'patient_id', ['doctor']),
+    'payments': (ServicePaymentSerializer, service_payment_rows, _payments, 'patient_id', ['processed_by']),
+    'medications': (MedicationListSerializer, medication_list_rows, _medications, 'barcode', []),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the values() list fast paths render exactly what their serializers do, '
+        'on live rows and on synthetic ones, and time both at several list sizes. '
+        'Synthetic rows are written in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='1000,10000,100000', help='Comma separated list sizes')
+        parser.add_argument('--repeat', type=int, default=3, help='Timings per size (best is reported)')
+        parser.add_argument('--employee-id', help='Account set as creator / doctor of synthetic rows')
+        parser.add_argument('--case', choices=sorted(CASES), action='append', help='Only these lists')
+
+    def _check_parity(self, name, serializer_class, fast, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        actual = JSONRenderer().render(fast.serialize(queryset))
+        if expected != actual:
+            for index, (want, got) in enumerate(zip(serializer_class(queryset, many=True).data,
+                                                    fast.serialize(queryset))):
+                if JSONRenderer().render(want) != JSONRenderer().render(got):
+                    raise CommandError(f'{name}: item {index} differs\n  serializer: {want}\n  fast path:  {got}')
+            raise CommandError(f'{name}: list bodies differ')
+
+    def _best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['rows'].split(',') if size.strip()})
+        except ValueError:
+            raise CommandError('--rows must be comma separated integers')
+        cases = {name: CASES[name] for name in options['case'] or CASES}
+
+        if options['employee_id']:
+            user = User.objects.filter(employee_id=options['employee_id'].upper()).first()
+        else:
+            user = User.objects.order_by('created_at').first()
+        if user is None:
+            raise CommandError('No account to attach synthetic rows to')
+
+        self.stdout.write('Parity on live rows')
+        for name, (serializer_class, fast, _, _, related) in cases.items():
+            model = serializer_class.Meta.model
+            live = model.objects.select_related(*related).order_by('pk')[:PARITY_SAMPLE]
+            self._check_parity(name, serializer_class, fast, live)
+            self.stdout.write(f'  {name:<14} {live.count()} rows identical')
+
+        self.stdout.write(f'{"list":<14} {"rows":>8} {"serializer":>12} {"fast path":>12} {"speedup":>8}')
+        for size in sizes:
+            with transaction.atomic():
+                for name, (serializer_class, fast, build, marker, related) in cases.items():
+                    model = serializer_class.Meta.model
+                    model.objects.bulk_create(build(size, user), batch_size=BATCH_SIZE)
+                    queryset = model.objects.select_related(*related).filter(
+                        **{f'{marker}__startswith': MARKER}
+                    ).order_by('pk')
+                    self._check_parity(name, serializer_class, fast, queryset)
+
+                    slow = self._best(options['repeat'], lambda: serializer_class(queryset.all(), many=True).data)
+                    quick = self._best(options['repeat'], lambda: fast.serialize(queryset.all()))
+                    self.stdout.write(
+                        f'{name:<14} {size:>8} {slow * 1000:>10.1f}ms {quick * 1000:>10.1f}ms {slow / quick:>7.1f}x'
+                    )
+                transaction.set_rollback(True)
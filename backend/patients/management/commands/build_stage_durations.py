@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from patients.analytics import build_stage_durations
+
+
+class Command(BaseCommand):
+    help = 'Turn new patient status history into stage durations and percentile rollups (run every 15 minutes)'
+
+    def handle(self, *args, **options):
+        facts, rollups = build_stage_durations()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {facts} stage duration(s) and {rollups} rollup row(s)'
+        ))
@@ -0,0 +1,63 @@
+import csv
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.importers import IMPORT_BATCH_SIZE, PatientImporter, iter_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import patients from a legacy CSV/XLSX register'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .xlsx file (header row required)')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Employee ID recorded as created_by on imported patients'
+        )
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--errors',
+            help='Write rejected rows to this CSV file (default: stderr)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(employee_id=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with employee ID {options['user']}")
+
+        error_file = open(options['errors'], 'w', newline='') if options['errors'] else sys.stderr
+        error_writer = csv.writer(error_file)
+        error_writer.writerow(['row', 'field', 'error'])
+
+        def on_error(row_number, errors):
+            for field, message in errors.items():
+                error_writer.writerow([row_number, field, message])
+
+        importer = PatientImporter(
+            user,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            on_error=on_error
+        )
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                summary = importer.run(iter_rows(fileobj, options['path']))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if error_file is not sys.stderr:
+                error_file.close()
+
+        prefix = 'Dry run: ' if summary['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{summary['imported']} imported, {summary['failed']} rejected "
+            f"of {summary['total_rows']} rows"
+        ))
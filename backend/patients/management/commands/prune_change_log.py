@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from patients.changes import prune_change_log
+
+RETENTION_HOURS = 48
+
+
+class Command(BaseCommand):
+    help = 'Delete old change feed entries (run daily); clients behind the pruned range resync'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=RETENTION_HOURS,
+            help='Keep entries written in the last N hours'
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entr{"y" if deleted == 1 else "ies"}'))
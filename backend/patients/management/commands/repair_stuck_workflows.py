@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.repairs import STALE_HOURS, default_repair_user, repair_stuck_workflows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Detect and repair stuck patient workflows and payments (safe to run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-hours',
+            type=int,
+            default=STALE_HOURS,
+            help='Age after which an empty in-progress consultation counts as abandoned'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be repaired without changing anything'
+        )
+        parser.add_argument(
+            '--user',
+            help='Employee ID recorded on the repairs (default: first active administrator)'
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = User.objects.get(employee_id=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user with employee ID {options['user']}")
+        else:
+            user = default_repair_user()
+            if user is None:
+                raise CommandError('No active administrator to record repairs; pass --user')
+
+        run = repair_stuck_workflows(user, options['stale_hours'], options['dry_run'])
+        if run is None:
+            self.stdout.write(self.style.WARNING('Another repair run is in progress; skipped'))
+            return
+
+        for name, result in run.results.items():
+            if result['found']:
+                self.stdout.write(f"{name}: found {result['found']}, fixed {result['fixed']}")
+
+        verb = 'Would repair' if run.dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {run.total_found} stuck item(s)'))
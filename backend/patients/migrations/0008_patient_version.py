@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0007_alter_patient_current_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every status transition (optimistic locking)'),
+        ),
+    ]
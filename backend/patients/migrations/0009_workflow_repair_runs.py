@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('patients', '0008_patient_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowRepairRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('dry_run', models.BooleanField(default=False)),
+                ('stale_hours', models.PositiveIntegerField()),
+                ('results', models.JSONField(default=dict)),
+                ('total_found', models.PositiveIntegerField(default=0)),
+                ('total_fixed', models.PositiveIntegerField(default=0)),
+                ('run_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='workflow_repair_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'workflow_repair_runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['-started_at'], name='workflow_re_started_38b542_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:33
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+# patients.workflow.OPEN_STATUSES when visits were introduced
+OPEN_STATUSES = [
+    'REGISTERED', 'WAITING_DOCTOR', 'WITH_DOCTOR',
+    'PENDING_CONSULTATION_PAYMENT', 'CONSULTATION_PAID',
+    'PENDING_LAB_PAYMENT', 'LAB_PAID', 'WAITING_LAB', 'IN_LAB',
+    'LAB_COMPLETED', 'LAB_RESULTS_READY',
+    'TREATMENT_PRESCRIBED', 'PHARMACY_PAID', 'WAITING_PHARMACY', 'IN_PHARMACY',
+    'PAYMENT_PENDING',
+]
+
+
+def open_current_visits(apps, schema_editor):
+    """Open a visit for every patient currently inside a visit"""
+    Patient = apps.get_model('patients', 'Patient')
+    Visit = apps.get_model('patients', 'Visit')
+
+    visits = [
+        Visit(
+            patient_id=patient.id,
+            status=patient.current_status,
+            location=patient.current_location,
+            checked_in_at=patient.updated_at,
+            status_changed_at=patient.updated_at,
+            consultation_started_at=patient.updated_at if patient.current_status == 'WITH_DOCTOR' else None,
+            temperature=patient.temperature,
+            blood_pressure_systolic=patient.blood_pressure_systolic,
+            blood_pressure_diastolic=patient.blood_pressure_diastolic,
+            pulse_rate=patient.pulse_rate,
+            respiratory_rate=patient.respiratory_rate,
+            weight=patient.weight,
+            checked_in_by_id=patient.last_updated_by_id or patient.created_by_id,
+        )
+        for patient in Patient.objects.filter(current_status__in=OPEN_STATUSES).iterator(chunk_size=1000)
+    ]
+    Visit.objects.bulk_create(visits, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('patients', '0009_workflow_repair_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Visit',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('visit_reason', models.CharField(blank=True, default='', max_length=200)),
+                ('status', models.CharField(choices=[('REGISTERED', 'Just Registered'), ('WAITING_DOCTOR', 'Waiting for Doctor'), ('WITH_DOCTOR', 'Currently with Doctor'), ('PENDING_CONSULTATION_PAYMENT', 'Pending Consultation Payment'), ('CONSULTATION_PAID', 'Consultation Payment Completed'), ('PENDING_LAB_PAYMENT', 'Pending Lab Payment'), ('LAB_PAID', 'Lab Payment Completed'), ('WAITING_LAB', 'Waiting for Lab Tests'), ('IN_LAB', 'Currently in Laboratory'), ('LAB_COMPLETED', 'Lab Tests Completed'), ('LAB_RESULTS_READY', 'Lab Results Ready'), ('TREATMENT_PRESCRIBED', 'Treatment Prescribed - Pending Pharmacy Payment'), ('PHARMACY_PAID', 'Pharmacy Payment Completed'), ('WAITING_PHARMACY', 'Waiting for Pharmacy'), ('IN_PHARMACY', 'Currently in Pharmacy'), ('PAYMENT_PENDING', 'Payment Required'), ('COMPLETED', 'Visit Completed'), ('DISCHARGED', 'Discharged')], default='WAITING_DOCTOR', max_length=40)),
+                ('location', models.CharField(blank=True, max_length=100, null=True)),
+                ('checked_in_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status_changed_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the visit entered its current status (queue position)')),
+                ('consultation_started_at', models.DateTimeField(blank=True, null=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('temperature', models.DecimalField(blank=True, decimal_places=1, help_text='Body temperature in Celsius', max_digits=4, null=True, validators=[django.core.validators.MinValueValidator(30.0), django.core.validators.MaxValueValidator(50.0)])),
+                ('blood_pressure_systolic', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(50), django.core.validators.MaxValueValidator(300)])),
+                ('blood_pressure_diastolic', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(30), django.core.validators.MaxValueValidator(200)])),
+                ('pulse_rate', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(30), django.core.validators.MaxValueValidator(250)])),
+                ('respiratory_rate', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(60)])),
+                ('weight', models.DecimalField(blank=True, decimal_places=2, help_text='Weight in kg', max_digits=5, null=True, validators=[django.core.validators.MinValueValidator(0.5), django.core.validators.MaxValueValidator(999.99)])),
+                ('checked_in_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='visits_checked_in', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='patients.patient')),
+            ],
+            options={
+                'db_table': 'patient_visits',
+                'ordering': ['-checked_in_at'],
+                'indexes': [models.Index(fields=['patient', '-checked_in_at'], name='patient_vis_patient_cab665_idx'), models.Index(fields=['checked_in_at'], name='patient_vis_checked_4a36ce_idx'), models.Index(condition=models.Q(('closed_at__isnull', True)), fields=['status', 'status_changed_at'], name='visit_open_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='visit',
+            constraint=models.UniqueConstraint(condition=models.Q(('closed_at__isnull', True)), fields=('patient',), name='one_open_visit_per_patient'),
+        ),
+        migrations.RunPython(open_current_visits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0010_visits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageDuration',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('REGISTERED', 'Just Registered'), ('WAITING_DOCTOR', 'Waiting for Doctor'), ('WITH_DOCTOR', 'Currently with Doctor'), ('PENDING_CONSULTATION_PAYMENT', 'Pending Consultation Payment'), ('CONSULTATION_PAID', 'Consultation Payment Completed'), ('PENDING_LAB_PAYMENT', 'Pending Lab Payment'), ('LAB_PAID', 'Lab Payment Completed'), ('WAITING_LAB', 'Waiting for Lab Tests'), ('IN_LAB', 'Currently in Laboratory'), ('LAB_COMPLETED', 'Lab Tests Completed'), ('LAB_RESULTS_READY', 'Lab Results Ready'), ('TREATMENT_PRESCRIBED', 'Treatment Prescribed - Pending Pharmacy Payment'), ('PHARMACY_PAID', 'Pharmacy Payment Completed'), ('WAITING_PHARMACY', 'Waiting for Pharmacy'), ('IN_PHARMACY', 'Currently in Pharmacy'), ('PAYMENT_PENDING', 'Payment Required'), ('COMPLETED', 'Visit Completed'), ('DISCHARGED', 'Discharged')], max_length=40)),
+                ('next_status', models.CharField(choices=[('REGISTERED', 'Just Registered'), ('WAITING_DOCTOR', 'Waiting for Doctor'), ('WITH_DOCTOR', 'Currently with Doctor'), ('PENDING_CONSULTATION_PAYMENT', 'Pending Consultation Payment'), ('CONSULTATION_PAID', 'Consultation Payment Completed'), ('PENDING_LAB_PAYMENT', 'Pending Lab Payment'), ('LAB_PAID', 'Lab Payment Completed'), ('WAITING_LAB', 'Waiting for Lab Tests'), ('IN_LAB', 'Currently in Laboratory'), ('LAB_COMPLETED', 'Lab Tests Completed'), ('LAB_RESULTS_READY', 'Lab Results Ready'), ('TREATMENT_PRESCRIBED', 'Treatment Prescribed - Pending Pharmacy Payment'), ('PHARMACY_PAID', 'Pharmacy Payment Completed'), ('WAITING_PHARMACY', 'Waiting for Pharmacy'), ('IN_PHARMACY', 'Currently in Pharmacy'), ('PAYMENT_PENDING', 'Payment Required'), ('COMPLETED', 'Visit Completed'), ('DISCHARGED', 'Discharged')], max_length=40)),
+                ('metric', models.CharField(max_length=30)),
+                ('department', models.CharField(max_length=20)),
+                ('entered_at', models.DateTimeField()),
+                ('exited_at', models.DateTimeField()),
+                ('hour', models.DateTimeField(help_text='Start of the hour the stage was entered')),
+                ('duration_seconds', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'stage_durations',
+                'ordering': ['-entered_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StageDurationRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField()),
+                ('department', models.CharField(max_length=20)),
+                ('metric', models.CharField(max_length=30)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('avg_seconds', models.FloatField()),
+                ('p50_seconds', models.FloatField()),
+                ('p90_seconds', models.FloatField()),
+                ('max_seconds', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'stage_duration_rollups',
+                'ordering': ['-hour'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='patientstatushistory',
+            index=models.Index(fields=['changed_at'], name='patient_sta_changed_ad7be0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stagedurationrollup',
+            index=models.Index(fields=['hour'], name='stage_durat_hour_dbbed4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stagedurationrollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'department', 'metric'), name='unique_stage_rollup_bucket'),
+        ),
+        migrations.AddField(
+            model_name='stageduration',
+            name='history',
+            field=models.OneToOneField(help_text='Status change that started the stage', on_delete=django.db.models.deletion.CASCADE, related_name='stage_duration', to='patients.patientstatushistory'),
+        ),
+        migrations.AddField(
+            model_name='stageduration',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_durations', to='patients.patient'),
+        ),
+        migrations.AddField(
+            model_name='stageduration',
+            name='visit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stage_durations', to='patients.visit'),
+        ),
+        migrations.AddIndex(
+            model_name='stageduration',
+            index=models.Index(fields=['metric', 'hour'], name='stage_durat_metric_8ed2a6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stageduration',
+            index=models.Index(fields=['hour'], name='stage_durat_hour_448a73_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stageduration',
+            index=models.Index(fields=['exited_at'], name='stage_durat_exited__ed1ada_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0011_stage_durations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['current_status', 'updated_at'], name='patients_current_fb74da_idx'),
+        ),
+    ]
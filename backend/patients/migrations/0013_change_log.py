@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0012_patient_queue_change_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('PATIENT', 'Patient'), ('PAYMENT', 'Service Payment'), ('LAB_REQUEST', 'Lab Test Request'), ('PRESCRIPTION', 'Prescription Queue Entry'), ('PRUNED', 'Pruned Below')], max_length=20)),
+                ('object_id', models.CharField(blank=True, max_length=36)),
+                ('txid', models.BigIntegerField(help_text='Writing transaction id; feed cursors are txid horizons')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'change_log',
+                'ordering': ['txid', 'id'],
+                'indexes': [models.Index(fields=['entity', 'txid'], name='change_log_entity_1bae42_idx'), models.Index(fields=['created_at'], name='change_log_created_a94786_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Copied from patients.models so the migration does not depend on live code
+PATIENT_NUMBER_SEQUENCE = 'patients_patient_number_seq'
+
+
+def create_patient_number_sequence(apps, schema_editor):
+    """Start the sequence after the highest PATn already issued (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {PATIENT_NUMBER_SEQUENCE}')
+        cursor.execute(
+            "SELECT COALESCE(MAX(CAST(SUBSTRING(patient_id FROM 4) AS BIGINT)), 0) "
+            "FROM patients WHERE patient_id ~ '^PAT[1-9][0-9]*$'"
+        )
+        max_number = cursor.fetchone()[0]
+        cursor.execute('SELECT setval(%s, %s, %s)', [PATIENT_NUMBER_SEQUENCE, max(max_number, 1), max_number > 0])
+
+
+def drop_patient_number_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP SEQUENCE IF EXISTS {PATIENT_NUMBER_SEQUENCE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0013_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_patient_number_sequence, drop_patient_number_sequence),
+    ]
@@ -5,43 +5,58 @@ from django.contrib.auth import get_user_model
 import uuid
 from datetime import date
 
+from core.mixins import DirtyFieldsMixin
+
 User = get_user_model()
 
+# PostgreSQL sequence patient numbers (the n in PATn) are taken from
+PATIENT_NUMBER_SEQUENCE = 'patients_patient_number_seq'
+# Advisory lock key keeping workflow repair runs from overlapping
+WORKFLOW_REPAIR_LOCK_KEY = 7302
+
+
+def age_from_date_of_birth(date_of_birth):
+    """Age in whole years today (Patient.age, also used by list fast paths)"""
+    today = date.today()
+    return today.year - date_of_birth.year - (
+        (today.month, today.day) < (date_of_birth.month, date_of_birth.day)
+    )
+
 
 class PatientManager(models.Manager):
+    def _next_patient_numbers(self, count):
+        """
+        Take count patient numbers. On PostgreSQL they come from
+        PATIENT_NUMBER_SEQUENCE, so concurrent registrations and imports
+        never share a number and nothing scans the patients table; numbers
+        taken by a transaction that rolls back are skipped. Elsewhere
+        (development databases) they follow the highest PATn in use.
+        """
+        from django.db import connection
+        from django.db.models import Max, IntegerField
+        from django.db.models.functions import Cast, Substr
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT nextval(%s) FROM generate_series(1, %s)',
+                    [PATIENT_NUMBER_SEQUENCE, count]
+                )
+                return [number for number, in cursor.fetchall()]
+
+        max_number = self.filter(patient_id__regex=r'^PAT[1-9][0-9]*$').aggregate(
+            max_num=Max(Cast(Substr('patient_id', 4), IntegerField()))
+        )['max_num'] or 0
+        return list(range(max_number + 1, max_number + 1 + count))
+
     def _generate_patient_id(self):
         """
         Auto-generate patient ID with unlimited growth.
         Format: PAT1, PAT2, ..., PAT999, PAT1000, PAT10000, etc.
         No fixed padding - grows as needed.
         """
-        try:
-            # Get the highest patient number (extract number part after PAT)
-            from django.db.models import Max
-            from django.db.models.functions import Cast, Substr
-            from django.db.models import IntegerField
-            
-            # Find the highest numeric part of existing patient IDs
-            max_result = self.exclude(patient_id__isnull=True).exclude(patient_id='').aggregate(
-                max_num=Max(
-                    Cast(
-                        Substr('patient_id', 4),  # Remove 'PAT' prefix
-                        IntegerField()
-                    )
-                )
-            )
-            
-            max_number = max_result['max_num'] or 0
-            new_number = max_number + 1
-            
-            return f"PAT{new_number}"
-            
-        except Exception:
-            # Fallback: Use timestamp-based ID if sequential fails
-            from django.utils import timezone
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            return f"PAT{timestamp}"
-    
+        return f"PAT{self._next_patient_numbers(1)[0]}"
+
     def _generate_uuid_patient_id(self):
         """
         Alternative UUID-based patient ID (for distributed systems).
@@ -52,6 +67,15 @@ class PatientManager(models.Manager):
         uuid_segment = str(uuid.uuid4()).replace('-', '')[:8]
         return f"PAT-{uuid_segment.upper()}"
     
+    def allocate_patient_ids(self, count):
+        """
+        Reserve a block of sequential patient IDs for bulk insertion.
+
+        The whole block is taken in one round trip, so an import does not
+        look up the highest ID once per batch.
+        """
+        return [f"PAT{number}" for number in self._next_patient_numbers(count)]
+
     def create_patient(self, **extra_fields):
         """Create new patient with auto-generated ID"""
         if 'patient_id' not in extra_fields:
@@ -60,7 +84,7 @@ class PatientManager(models.Manager):
         return self.create(**extra_fields)
 
 
-class Patient(models.Model):
+class Patient(DirtyFieldsMixin, models.Model):
     GENDER_CHOICES = [
         ('MALE', 'Male'),
         ('FEMALE', 'Female'),
@@ -266,6 +290,10 @@ class Patient(models.Model):
         null=True,
         help_text='Current department or staff member handling patient'
     )
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text='Bumped on every status transition (optimistic locking)'
+    )
     
     # Audit fields
     created_at = models.DateTimeField(auto_now_add=True)
@@ -283,6 +311,13 @@ class Patient(models.Model):
         null=True,
         blank=True
     )
+
+    # Statuses listed by the shared patient queue
+    QUEUE_STATUSES = [
+        'REGISTERED', 'WAITING_DOCTOR', 'WITH_DOCTOR',
+        'WAITING_LAB', 'IN_LAB', 'LAB_RESULTS_READY',
+        'WAITING_PHARMACY', 'IN_PHARMACY', 'PAYMENT_PENDING'
+    ]
     
     objects = PatientManager()
     
@@ -294,6 +329,8 @@ class Patient(models.Model):
             models.Index(fields=['phone_number']),
             models.Index(fields=['full_name']),
             models.Index(fields=['current_status']),
+            # Queue change detection (max(updated_at) per status)
+            models.Index(fields=['current_status', 'updated_at']),
             models.Index(fields=['created_at']),
         ]
     
@@ -303,10 +340,7 @@ class Patient(models.Model):
     @property
     def age(self):
         """Calculate age from date of birth"""
-        today = date.today()
-        return today.year - self.date_of_birth.year - (
-            (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day)
-        )
+        return age_from_date_of_birth(self.date_of_birth)
     
     @property
     def bmi(self):
@@ -338,17 +372,15 @@ class Patient(models.Model):
             return f"{self.blood_pressure_systolic}/{self.blood_pressure_diastolic}"
         return None
     
-    def save(self, *args, **kwargs):
-        # Auto-generate patient_id if not provided
-        if not self.patient_id:
-            self.patient_id = Patient.objects._generate_patient_id()
-
-        # Convert names to uppercase and generate full_name
+    def normalize_names(self):
+        """Convert names to uppercase and generate full_name"""
         self.first_name = self.first_name.upper().strip()
         self.middle_name = self.middle_name.upper().strip()
         self.last_name = self.last_name.upper().strip()
         self.full_name = f"{self.first_name} {self.middle_name} {self.last_name}".strip()
 
+    def apply_file_fee_rules(self):
+        """Fill file fee fields from the paid flag and NHIF coverage"""
         # Set file fee payment date if fee is marked as paid
         if self.file_fee_paid and not self.file_fee_payment_date:
             self.file_fee_payment_date = timezone.now()
@@ -359,9 +391,161 @@ class Patient(models.Model):
             self.file_fee_amount = 0.00  # NHIF covers file fee
             self.file_fee_payment_date = timezone.now()
 
+    def save(self, *args, **kwargs):
+        # Auto-generate patient_id if not provided
+        if not self.patient_id:
+            self.patient_id = Patient.objects._generate_patient_id()
+
+        if self.is_dirty('first_name', 'middle_name', 'last_name', 'full_name'):
+            self.normalize_names()
+
+        if self.is_dirty('patient_type', 'file_fee_paid', 'file_fee_payment_date'):
+            self.apply_file_fee_rules()
+
         super().save(*args, **kwargs)
 
 
+class VisitManager(models.Manager):
+    def open(self):
+        """Visits that have not been closed yet"""
+        return self.filter(closed_at__isnull=True)
+
+    def open_visit_id(self, patient_code):
+        """Id of the open visit for a patient ID (PAT123), or None"""
+        return self.open().filter(patient__patient_id=patient_code).values_list('id', flat=True).first()
+
+
+class Visit(models.Model):
+    """
+    One check-in of a patient.
+
+    Carries the workflow state of the visit (status, location, queue
+    timestamps and vitals) so queues and turnaround figures read this
+    narrow table instead of the patient master row. A patient has at most
+    one open visit; it is closed when the workflow reaches COMPLETED or
+    DISCHARGED. Patient.current_status and current_location mirror the
+    open visit for existing readers.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='visits'
+    )
+    visit_reason = models.CharField(max_length=200, blank=True, default='')
+
+    # Workflow state
+    status = models.CharField(
+        max_length=40,
+        choices=Patient.STATUS_CHOICES,
+        default='WAITING_DOCTOR'
+    )
+    location = models.CharField(max_length=100, blank=True, null=True)
+
+    # Queue timestamps
+    checked_in_at = models.DateTimeField(default=timezone.now)
+    status_changed_at = models.DateTimeField(
+        default=timezone.now,
+        help_text='When the visit entered its current status (queue position)'
+    )
+    consultation_started_at = models.DateTimeField(blank=True, null=True)
+    closed_at = models.DateTimeField(blank=True, null=True)
+
+    # Vital signs taken at check-in
+    temperature = models.DecimalField(
+        max_digits=4,
+        decimal_places=1,
+        validators=[MinValueValidator(30.0), MaxValueValidator(50.0)],
+        blank=True,
+        null=True,
+        help_text='Body temperature in Celsius'
+    )
+    blood_pressure_systolic = models.IntegerField(
+        validators=[MinValueValidator(50), MaxValueValidator(300)],
+        blank=True,
+        null=True
+    )
+    blood_pressure_diastolic = models.IntegerField(
+        validators=[MinValueValidator(30), MaxValueValidator(200)],
+        blank=True,
+        null=True
+    )
+    pulse_rate = models.IntegerField(
+        validators=[MinValueValidator(30), MaxValueValidator(250)],
+        blank=True,
+        null=True
+    )
+    respiratory_rate = models.IntegerField(
+        validators=[MinValueValidator(5), MaxValueValidator(60)],
+        blank=True,
+        null=True
+    )
+    weight = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        validators=[MinValueValidator(0.5), MaxValueValidator(999.99)],
+        blank=True,
+        null=True,
+        help_text='Weight in kg'
+    )
+
+    checked_in_by = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        related_name='visits_checked_in'
+    )
+
+    objects = VisitManager()
+
+    VITAL_FIELDS = [
+        'temperature', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+        'pulse_rate', 'respiratory_rate', 'weight',
+    ]
+
+    class Meta:
+        db_table = 'patient_visits'
+        ordering = ['-checked_in_at']
+        indexes = [
+            models.Index(fields=['patient', '-checked_in_at']),
+            models.Index(fields=['checked_in_at']),
+            # Queue scans: open visits in a status, oldest first
+            models.Index(
+                fields=['status', 'status_changed_at'],
+                name='visit_open_queue_idx',
+                condition=models.Q(closed_at__isnull=True)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['patient'],
+                condition=models.Q(closed_at__isnull=True),
+                name='one_open_visit_per_patient'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Visit {self.patient.patient_id} {self.checked_in_at:%Y-%m-%d %H:%M} ({self.status})"
+
+    @property
+    def is_open(self):
+        return self.closed_at is None
+
+    @property
+    def wait_minutes(self):
+        """Minutes from check-in to the start of the consultation"""
+        if self.consultation_started_at:
+            return round((self.consultation_started_at - self.checked_in_at).total_seconds() / 60)
+        return None
+
+    @property
+    def duration_minutes(self):
+        """Minutes from check-in to the visit being closed"""
+        if self.closed_at:
+            return round((self.closed_at - self.checked_in_at).total_seconds() / 60)
+        return None
+
+
 class PatientStatusHistory(models.Model):
     """Track patient status changes for audit and timeline"""
     
@@ -400,6 +584,7 @@ class PatientStatusHistory(models.Model):
         indexes = [
             models.Index(fields=['patient', '-changed_at']),
             models.Index(fields=['new_status', '-changed_at']),
+            models.Index(fields=['changed_at']),
         ]
     
     def __str__(self):
@@ -441,3 +626,155 @@ class PatientNote(models.Model):
     
     def __str__(self):
         return f"Note for {self.patient.patient_id} by {self.created_by.employee_id}"
+
+
+class StageDuration(models.Model):
+    """
+    Fact row: how long a patient stayed in one workflow status.
+
+    Built from consecutive PatientStatusHistory rows by the
+    build_stage_durations command; one row per history row that has been
+    left again. metric and department group statuses into the stages
+    management reports on (door-to-doctor, cashier wait, lab turnaround...).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    history = models.OneToOneField(
+        PatientStatusHistory,
+        on_delete=models.CASCADE,
+        related_name='stage_duration',
+        help_text='Status change that started the stage'
+    )
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='stage_durations'
+    )
+    visit = models.ForeignKey(
+        Visit,
+        on_delete=models.SET_NULL,
+        related_name='stage_durations',
+        null=True,
+        blank=True
+    )
+
+    status = models.CharField(max_length=40, choices=Patient.STATUS_CHOICES)
+    next_status = models.CharField(max_length=40, choices=Patient.STATUS_CHOICES)
+    metric = models.CharField(max_length=30)
+    department = models.CharField(max_length=20)
+
+    entered_at = models.DateTimeField()
+    exited_at = models.DateTimeField()
+    hour = models.DateTimeField(help_text='Start of the hour the stage was entered')
+    duration_seconds = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = 'stage_durations'
+        ordering = ['-entered_at']
+        indexes = [
+            models.Index(fields=['metric', 'hour']),
+            models.Index(fields=['hour']),
+            models.Index(fields=['exited_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.status} -> {self.next_status} ({self.duration_seconds}s)"
+
+
+class StageDurationRollup(models.Model):
+    """
+    Stage durations pre-aggregated per hour, department and metric, with
+    percentiles, so turnaround dashboards never scan the fact table.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    hour = models.DateTimeField()
+    department = models.CharField(max_length=20)
+    metric = models.CharField(max_length=30)
+
+    count = models.PositiveIntegerField(default=0)
+    avg_seconds = models.FloatField()
+    p50_seconds = models.FloatField()
+    p90_seconds = models.FloatField()
+    max_seconds = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = 'stage_duration_rollups'
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'department', 'metric'],
+                name='unique_stage_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}:00 {self.metric} p50={self.p50_seconds:.0f}s"
+
+
+class WorkflowRepairRun(models.Model):
+    """Audit record of one repair_stuck_workflows run"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    dry_run = models.BooleanField(default=False)
+    stale_hours = models.PositiveIntegerField()
+
+    # check name -> {'found': n, 'fixed': n, 'ids': [...]}
+    results = models.JSONField(default=dict)
+    total_found = models.PositiveIntegerField(default=0)
+    total_fixed = models.PositiveIntegerField(default=0)
+
+    run_by = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        related_name='workflow_repair_runs'
+    )
+
+    class Meta:
+        db_table = 'workflow_repair_runs'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['-started_at']),
+        ]
+
+    def __str__(self):
+        return f"Workflow repair {self.started_at:%Y-%m-%d %H:%M} ({self.total_fixed}/{self.total_found} fixed)"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One write to a row that portal queues show, read by the changes feeds
+    (see patients/changes.py). Entries carry no state: feeds re-read the
+    current rows, so a row written many times costs one read.
+    """
+
+    ENTITY_CHOICES = [
+        ('PATIENT', 'Patient'),
+        ('PAYMENT', 'Service Payment'),
+        ('LAB_REQUEST', 'Lab Test Request'),
+        ('PRESCRIPTION', 'Prescription Queue Entry'),
+        # Marker left by prune_change_log: feeds older than txid must resync
+        ('PRUNED', 'Pruned Below'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.CharField(max_length=36, blank=True)
+    txid = models.BigIntegerField(help_text='Writing transaction id; feed cursors are txid horizons')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'change_log'
+        ordering = ['txid', 'id']
+        indexes = [
+            models.Index(fields=['entity', 'txid']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id} @ {self.txid}"
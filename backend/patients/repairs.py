@@ -0,0 +1,326 @@
+"""
+Detection and repair of stuck patient workflows.
+
+Replaces the one-off cleanup scripts (cleanup_stuck_patients.py,
+fix_all_in_progress.py, fix_pat71.py and
+cleanup_duplicate_medication_payments.py). Every check selects its rows
+with one set-based query and fixes them with bulk writes, so a run costs
+a handful of statements however many rows are stuck. Checks only touch
+rows that are still in the stuck state, which makes a run idempotent;
+an advisory lock keeps two runs from overlapping, so the
+repair_stuck_workflows command can be scheduled every few minutes.
+Each run is recorded as a WorkflowRepairRun.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import CharField, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from core.caching import invalidate_cache_tags
+from doctor.models import Consultation, LabTestRequest, Prescription
+from finance.models import ServicePayment
+from .changes import record_changes
+from .models import Patient, PatientStatusHistory, Visit, WorkflowRepairRun, WORKFLOW_REPAIR_LOCK_KEY
+
+User = get_user_model()
+
+STALE_HOURS = 4
+# Ids kept per check in the audit record
+AUDIT_ID_LIMIT = 50
+
+PATIENT_FIELDS = ['id', 'patient_id', 'current_status', 'current_location', 'version']
+
+# Services charged once per reference (consultation or lab request), so a
+# second PENDING charge for the same reference is a duplicate. Ward stays
+# are charged night by night and are never deduplicated.
+SINGLE_CHARGE_SERVICE_TYPES = ['CONSULTATION', 'LAB_TEST', 'MEDICATION']
+
+
+def _result(found, fixed, ids, **extra):
+    ids = [str(value) for value in ids]
+    return dict(found=found, fixed=fixed, ids=ids[:AUDIT_ID_LIMIT], **extra)
+
+
+def _move_patients(patients, new_status, location, user, notes):
+    """
+    Bulk move locked Patient rows and their open visits to new_status,
+    with one history row each.
+
+    location is a callable returning the new location for a patient. The
+    version bump makes concurrent transition_patient() calls that read the
+    old row fail with StaleTransition instead of overwriting the repair.
+    """
+    now = timezone.now()
+    history = []
+    for patient in patients:
+        new_location = location(patient)
+        history.append(PatientStatusHistory(
+            patient=patient,
+            previous_status=patient.current_status,
+            new_status=new_status,
+            previous_location=patient.current_location,
+            new_location=new_location,
+            changed_by=user,
+            notes=notes,
+        ))
+        patient.current_status = new_status
+        patient.current_location = new_location
+        patient.version = F('version') + 1
+        patient.last_updated_by = user
+        patient.updated_at = now
+
+    Patient.objects.bulk_update(
+        patients,
+        ['current_status', 'current_location', 'version', 'last_updated_by', 'updated_at'],
+        batch_size=500
+    )
+    PatientStatusHistory.objects.bulk_create(history, batch_size=500)
+
+    # Move the open visits along with the patients
+    visits = {visit.patient_id: visit for visit in Visit.objects.open().filter(patient__in=patients)}
+    new_visits = []
+    for patient in patients:
+        visit = visits.get(patient.id)
+        if visit is None:
+            visit = Visit(patient=patient, checked_in_at=now, checked_in_by=user)
+            new_visits.append(visit)
+        visit.status = new_status
+        visit.location = patient.current_location
+        visit.status_changed_at = now
+        if new_status == 'WITH_DOCTOR' and not visit.consultation_started_at:
+            visit.consultation_started_at = now
+    Visit.objects.bulk_update(
+        visits.values(), ['status', 'location', 'status_changed_at', 'consultation_started_at'], batch_size=500
+    )
+    Visit.objects.bulk_create(new_visits, batch_size=500)
+    invalidate_cache_tags('patients')
+    record_changes('PATIENT', [patient.pk for patient in patients])
+
+
+def _abandoned_consultations(cutoff):
+    """IN_PROGRESS consultations started before cutoff with nothing recorded on them"""
+    return Consultation.objects.filter(
+        Q(diagnosis='') | Q(diagnosis__isnull=True),
+        status='IN_PROGRESS',
+        consultation_date__lt=cutoff,
+    ).filter(
+        ~Exists(LabTestRequest.objects.filter(consultation=OuterRef('pk'))),
+        ~Exists(Prescription.objects.filter(consultation=OuterRef('pk'))),
+    )
+
+
+def reset_abandoned_consultations(cutoff, user, dry_run):
+    """
+    Patients left WITH_DOCTOR behind an empty consultation older than the
+    cutoff go back to the doctor queue and the consultation is removed.
+    Patients with another consultation still under way are left alone.
+    """
+    abandoned = _abandoned_consultations(cutoff)
+    patients = Patient.objects.filter(
+        current_status='WITH_DOCTOR',
+        patient_id__in=abandoned.values('patient_id'),
+    ).exclude(
+        Exists(
+            Consultation.objects.filter(
+                patient_id=OuterRef('patient_id'), status='IN_PROGRESS'
+            ).exclude(pk__in=abandoned.values('pk'))
+        )
+    ).only(*PATIENT_FIELDS)
+
+    if dry_run:
+        patient_ids = list(patients.values_list('patient_id', flat=True))
+        return _result(abandoned.count(), 0, patient_ids, patients_reset=0)
+
+    patients = list(patients.select_for_update())
+    consultation_ids = list(abandoned.select_for_update().values_list('id', flat=True))
+
+    _move_patients(
+        patients, 'WAITING_DOCTOR', lambda patient: 'Doctor Queue', user,
+        'Reset by workflow repair: consultation abandoned without notes'
+    )
+    Consultation.objects.filter(id__in=consultation_ids).delete()
+
+    return _result(len(consultation_ids), len(consultation_ids),
+                   [patient.patient_id for patient in patients], patients_reset=len(patients))
+
+
+def restore_with_doctor_status(cutoff, user, dry_run):
+    """
+    Patients still queued (REGISTERED / WAITING_DOCTOR) while a doctor has a
+    live consultation open for them are moved to WITH_DOCTOR.
+    """
+    live = Consultation.objects.filter(
+        patient_id=OuterRef('patient_id'), status='IN_PROGRESS'
+    ).exclude(pk__in=_abandoned_consultations(cutoff).values('pk'))
+
+    patients = Patient.objects.filter(
+        Exists(live), current_status__in=['REGISTERED', 'WAITING_DOCTOR']
+    ).annotate(
+        consultation_room=Subquery(
+            live.order_by('-consultation_date').annotate(
+                room=Concat(Value('Consultation Room - Dr. '), 'doctor__full_name', output_field=CharField())
+            ).values('room')[:1]
+        )
+    ).only(*PATIENT_FIELDS)
+
+    if dry_run:
+        patient_ids = list(patients.values_list('patient_id', flat=True))
+        return _result(len(patient_ids), 0, patient_ids)
+
+    patients = list(patients.select_for_update())
+    _move_patients(
+        patients, 'WITH_DOCTOR', lambda patient: patient.consultation_room[:100], user,
+        'Restored by workflow repair: consultation in progress'
+    )
+    return _result(len(patients), len(patients), [patient.patient_id for patient in patients])
+
+
+def remove_duplicate_pending_payments(cutoff, user, dry_run):
+    """
+    PENDING payments repeating an earlier PENDING payment for the same
+    (patient, service type, reference), for services charged once per
+    reference. The oldest one is kept.
+    """
+    earlier = ServicePayment.objects.filter(
+        Q(created_at__lt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), id__lt=OuterRef('id')),
+        status='PENDING',
+        patient_id=OuterRef('patient_id'),
+        service_type=OuterRef('service_type'),
+        reference_id=OuterRef('reference_id'),
+    )
+    duplicates = ServicePayment.objects.filter(
+        Exists(earlier),
+        status='PENDING',
+        service_type__in=SINGLE_CHARGE_SERVICE_TYPES,
+        reference_id__isnull=False,
+    )
+    return _delete_payments(duplicates, dry_run)
+
+
+def remove_prescription_medication_payments(cutoff, user, dry_run):
+    """
+    PENDING MEDICATION payments raised per prescription when the
+    consultation already carries the medication payment for all of them.
+    """
+    consultation_payment = ServicePayment.objects.filter(
+        service_type='MEDICATION',
+        reference_id=Cast(OuterRef('consultation_id'), CharField()),
+    ).exclude(status='REFUNDED')
+    covered_prescriptions = Prescription.objects.filter(
+        Exists(consultation_payment)
+    ).annotate(reference=Cast('id', CharField())).values('reference')
+
+    duplicates = ServicePayment.objects.filter(
+        service_type='MEDICATION', status='PENDING', reference_id__in=covered_prescriptions
+    )
+    return _delete_payments(duplicates, dry_run)
+
+
+def _delete_payments(payments, dry_run):
+    ids = list(payments.values_list('id', flat=True))
+    if dry_run or not ids:
+        return _result(len(ids), 0, ids)
+
+    deleted, _ = ServicePayment.objects.filter(id__in=ids, status='PENDING').delete()
+    return _result(len(ids), deleted, ids)
+
+
+def complete_paid_payments(cutoff, user, dry_run):
+    """
+    PAID payments missing their payment date or receipt number (status set
+    through a bulk update that bypassed ServicePayment.save). Receipts
+    continue each day's RCT-YYYYMMDD-NNNNN sequence.
+    """
+    incomplete = ServicePayment.objects.filter(
+        Q(payment_date__isnull=True) | Q(receipt_number__isnull=True) | Q(receipt_number=''),
+        status='PAID',
+    )
+    ids = list(incomplete.values_list('id', flat=True))
+    if dry_run or not ids:
+        return _result(len(ids), 0, ids)
+
+    ServicePayment.objects.filter(id__in=ids, payment_date__isnull=True).update(payment_date=F('updated_at'))
+
+    payments = list(
+        ServicePayment.objects.filter(
+            Q(receipt_number__isnull=True) | Q(receipt_number=''), id__in=ids
+        ).select_for_update().order_by('payment_date', 'id').only('id', 'payment_date', 'receipt_number')
+    )
+    days = {payment.payment_date.strftime('%Y%m%d') for payment in payments}
+
+    last_number = defaultdict(int)
+    if days:
+        issued = ServicePayment.objects.filter(
+            receipt_number__regex=r'^RCT-(%s)-[0-9]+$' % '|'.join(sorted(days))
+        ).values_list('receipt_number', flat=True)
+        for receipt_number in issued:
+            _, day, number = receipt_number.split('-')
+            last_number[day] = max(last_number[day], int(number))
+
+    for payment in payments:
+        day = payment.payment_date.strftime('%Y%m%d')
+        last_number[day] += 1
+        payment.receipt_number = f"RCT-{day}-{last_number[day]:05d}"
+    ServicePayment.objects.bulk_update(payments, ['receipt_number'], batch_size=500)
+    record_changes('PAYMENT', ids)
+
+    return _result(len(ids), len(ids), ids)
+
+
+# Run in this order: the consultation checks depend on abandoned
+# consultations being cleared first
+CHECKS = [
+    ('abandoned_consultations', reset_abandoned_consultations),
+    ('queued_while_with_doctor', restore_with_doctor_status),
+    ('duplicate_pending_payments', remove_duplicate_pending_payments),
+    ('prescription_medication_payments', remove_prescription_medication_payments),
+    ('paid_without_receipt', complete_paid_payments),
+]
+
+
+def default_repair_user():
+    """Account recorded on repairs when none is given: the first active administrator"""
+    return User.objects.filter(
+        Q(is_superuser=True) | Q(role='ADMIN'), is_active=True
+    ).order_by('-is_superuser', 'created_at').first()
+
+
+def repair_stuck_workflows(user, stale_hours=STALE_HOURS, dry_run=False):
+    """
+    Run every check and record the outcome.
+
+    Runs that find nothing are not stored, so frequent scheduling does not
+    fill the audit table with empty rows.
+
+    Returns:
+        WorkflowRepairRun or None: None when another run holds the lock
+    """
+    started_at = timezone.now()
+    cutoff = started_at - timedelta(hours=stale_hours)
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [WORKFLOW_REPAIR_LOCK_KEY])
+                if not cursor.fetchone()[0]:
+                    return None
+
+        results = {name: check(cutoff, user, dry_run) for name, check in CHECKS}
+
+        run = WorkflowRepairRun(
+            started_at=started_at,
+            finished_at=timezone.now(),
+            dry_run=dry_run,
+            stale_hours=stale_hours,
+            results=results,
+            total_found=sum(result['found'] for result in results.values()),
+            total_fixed=sum(result['fixed'] for result in results.values()),
+            run_by=user,
+        )
+        if run.total_found or dry_run:
+            run.save()
+        return run
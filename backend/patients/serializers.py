@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Patient, PatientStatusHistory, PatientNote
+from core.fast_serializers import ValuesSerializer
+from .models import Patient, PatientStatusHistory, PatientNote, age_from_date_of_birth
 
 User = get_user_model()
 
@@ -79,6 +80,13 @@ class PatientSearchSerializer(serializers.ModelSerializer):
         ]
 
 
+# values() fast path for patient lists (core/fast_serializers.py)
+patient_search_rows = ValuesSerializer(
+    PatientSearchSerializer,
+    age=(['date_of_birth'], age_from_date_of_birth),
+)
+
+
 class PatientQueueSerializer(serializers.ModelSerializer):
     """Serializer for queue ordering with queue entry time"""
 
@@ -148,10 +156,15 @@ class PatientStatusUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating patient status only"""
     
     notes = serializers.CharField(required=False, allow_blank=True, help_text="Optional notes about status change")
+    version = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text="Patient version the client last saw; rejected with 409 if the patient has moved on"
+    )
     
     class Meta:
         model = Patient
-        fields = ['current_status', 'current_location', 'notes']
+        fields = ['current_status', 'current_location', 'notes', 'version']
     
     def validate_current_status(self, value):
         """Ensure valid status transitions"""
@@ -1,3 +1,207 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from finance.models import ServicePayment
+from nursing.wards import accrue_ward_charges, admit_to_bed
+from . import changes
+from .importers import PatientImporter
+from .models import ChangeLogEntry, Patient
+from .repairs import remove_duplicate_pending_payments
+from .workflow import InvalidTransition, StaleTransition, transition_patient
+
+User = get_user_model()
+
+
+class DuplicatePendingPaymentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            password='test-pass-123',
+            full_name='Ward Nurse',
+            email='nurse@example.com',
+            phone_number='+255700000101',
+            role='NURSE',
+        )
+
+    def _repair(self):
+        return remove_duplicate_pending_payments(timezone.now(), self.user, dry_run=False)
+
+    def _admit(self, nights):
+        return admit_to_bed(
+            'GENERAL', 'T1',
+            daily_fee=Decimal('10000.00'),
+            patient_id='PAT900',
+            patient_name='Ward Patient',
+            admission_date=timezone.now() - timedelta(days=nights + 1),
+            primary_nurse=self.user,
+            attending_doctor=self.user,
+            admission_notes='Observation',
+        )
+
+    def test_accrued_ward_nights_are_kept(self):
+        assignment = self._admit(3)
+        today = timezone.localdate()
+        for days_ago in (3, 2, 1):
+            accrue_ward_charges(today - timedelta(days=days_ago), user=self.user)
+
+        charges = ServicePayment.objects.filter(service_type='WARD', status='PENDING')
+        self.assertEqual(charges.count(), 3)
+        self.assertEqual(len(set(charges.values_list('reference_id', flat=True))), 3)
+
+        result = self._repair()
+
+        self.assertEqual(result['fixed'], 0)
+        self.assertEqual(charges.count(), 3)
+
+        # Charges posted before they had per-night references share the
+        # assignment id and are still not duplicates
+        charges.update(reference_id=str(assignment.id))
+        self.assertEqual(self._repair()['fixed'], 0)
+        self.assertEqual(charges.count(), 3)
+
+    def test_repeated_consultation_charge_is_removed(self):
+        for _ in range(2):
+            ServicePayment.objects.create(
+                patient_id='PAT901',
+                patient_name='Outpatient',
+                service_type='CONSULTATION',
+                service_name='Doctor Consultation - General',
+                reference_id='consultation-1',
+                amount=Decimal('5000.00'),
+                status='PENDING',
+            )
+        first = ServicePayment.objects.order_by('created_at', 'id').first()
+
+        result = self._repair()
+
+        self.assertEqual(result['fixed'], 1)
+        self.assertEqual(list(ServicePayment.objects.values_list('id', flat=True)), [first.id])
+
+
+class TransitionPatientTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            password='test-pass-123',
+            full_name='Neema Kweka',
+            email='doctor@example.com',
+            phone_number='+255700000103',
+            role='DOCTOR',
+        )
+
+    def setUp(self):
+        self.patient = Patient.objects.create(
+            first_name='Asha', last_name='Juma', phone_number='+255711000009',
+            gender='FEMALE', date_of_birth=date(1990, 2, 28), current_status='WAITING_DOCTOR',
+            created_by=self.user,
+        )
+
+    def test_allowed_move_writes_history_and_bumps_version(self):
+        version = self.patient.version
+
+        history = transition_patient(self.patient, 'WITH_DOCTOR', self.user, new_location='Room 1')
+
+        self.assertEqual((history.previous_status, history.new_status), ('WAITING_DOCTOR', 'WITH_DOCTOR'))
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.current_status, 'WITH_DOCTOR')
+        self.assertEqual(self.patient.current_location, 'Room 1')
+        self.assertEqual(self.patient.version, version + 1)
+
+    def test_stale_version_is_rejected(self):
+        stale = Patient.objects.get(pk=self.patient.pk)
+        transition_patient(self.patient, 'WITH_DOCTOR', self.user)
+
+        with self.assertRaises(StaleTransition):
+            transition_patient(stale, 'COMPLETED', self.user)
+
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.current_status, 'WITH_DOCTOR')
+        self.assertEqual(self.patient.status_history.count(), 1)
+
+    def test_disallowed_move_is_rejected(self):
+        with self.assertRaises(InvalidTransition):
+            transition_patient(self.patient, 'IN_PHARMACY', self.user)
+
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.current_status, 'WAITING_DOCTOR')
+        self.assertFalse(self.patient.status_history.exists())
+
+    def test_force_skips_the_transition_table(self):
+        transition_patient(self.patient, 'IN_PHARMACY', self.user, notes='Repair', force=True)
+
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.current_status, 'IN_PHARMACY')
+
+
+class PatientImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            password='test-pass-123',
+            full_name='Records Clerk',
+            email='records@example.com',
+            phone_number='+255700000104',
+            role='RECEPTION',
+        )
+
+    def test_imported_patients_stay_out_of_the_queue(self):
+        rows = [
+            {'first_name': 'Asha', 'last_name': 'Juma', 'phone_number': '+255711000010',
+             'gender': 'FEMALE', 'date_of_birth': '1990-02-28'},
+            {'first_name': 'Baraka', 'last_name': 'Mollel', 'phone_number': '+255711000011',
+             'gender': 'MALE', 'date_of_birth': '1985-07-01'},
+        ]
+        summary = PatientImporter(self.user).run(rows)
+        self.assertEqual(summary['imported'], 2)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/patients/queue/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertFalse(Patient.objects.exclude(current_status='COMPLETED').exists())
+        self.assertFalse(Patient.objects.filter(current_location__isnull=False).exists())
+
+
+class RecordChangesTests(TransactionTestCase):
+    def test_autocommit_save_logs_in_one_transaction(self):
+        # Outermost atomic block around the txid read and the insert
+        transactions = []
+
+        def outer_block():
+            return connection.atomic_blocks[0] if connection.in_atomic_block else None
+
+        def current_txid():
+            transactions.append(outer_block())
+            return read_txid()
+
+        def bulk_create(entries, *args, **kwargs):
+            transactions.append(outer_block())
+            return create_entries(entries, *args, **kwargs)
+
+        read_txid, create_entries = changes._current_txid, ChangeLogEntry.objects.bulk_create
+        self.assertFalse(connection.in_atomic_block)
+        with mock.patch.object(changes, '_current_txid', current_txid), \
+                mock.patch.object(ChangeLogEntry.objects, 'bulk_create', bulk_create):
+            payment = ServicePayment.objects.create(
+                patient_id='PAT902',
+                patient_name='Walk-in',
+                service_type='CONSULTATION',
+                service_name='Doctor Consultation - General',
+                amount=Decimal('5000.00'),
+            )
+
+        self.assertEqual(len(transactions), 2)
+        self.assertIsNotNone(transactions[0])
+        self.assertIs(transactions[0], transactions[1])
+        self.assertTrue(
+            ChangeLogEntry.objects.filter(entity='PAYMENT', object_id=str(payment.pk)).exists()
+        )
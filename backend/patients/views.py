@@ -2,19 +2,44 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Count
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from core.caching import changes_etag, etag_condition
+from core.fast_serializers import requested_fields, sparse_fieldsets
 from .models import Patient, PatientStatusHistory
+from .workflow import (
+    transition_patient, allowed_next_statuses, InvalidTransition, StaleTransition
+)
 from .serializers import (
-    PatientSerializer, PatientSearchSerializer, PatientDetailSerializer,
-    PatientStatusUpdateSerializer, PatientStatusHistorySerializer, PatientQueueSerializer
+    PatientSerializer, PatientDetailSerializer, PatientStatusUpdateSerializer,
+    PatientStatusHistorySerializer, PatientQueueSerializer, patient_search_rows
 )
 
 
+def _patient_details_etag(request, patient_id):
+    lookup = {'id': patient_id} if len(patient_id) == 36 else {'patient_id': patient_id.upper()}
+    try:
+        # Transitions and edits both bump updated_at; age and
+        # is_new_patient move with the date
+        return changes_etag(
+            Patient.objects.filter(**lookup), 'updated_at', scope=[timezone.now().date()]
+        )
+    except ValidationError:
+        return None
+
+
+def _patient_queue_etag(request):
+    return changes_etag(
+        Patient.objects.filter(current_status__in=Patient.QUEUE_STATUSES), 'updated_at',
+        scope=[request.query_params.get('limit', ''), timezone.now().date()]
+    )
+
+
 @swagger_auto_schema(
     method='get',
     operation_summary="Search patients",
@@ -37,6 +62,12 @@ from .serializers import (
             description="Limit number of results (default: 20, max: 100)",
             type=openapi.TYPE_INTEGER,
             required=False
+        ),
+        openapi.Parameter(
+            'fields', openapi.IN_QUERY,
+            description="Comma separated result fields to return (default: all)",
+            type=openapi.TYPE_STRING,
+            required=False
         )
     ],
     responses={
@@ -61,6 +92,7 @@ from .serializers import (
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@sparse_fieldsets(patient_search_rows)
 def search_patients(request):
     """
     Search patients by name, phone number, or patient ID.
@@ -103,11 +135,11 @@ def search_patients(request):
     patients = patients.order_by('-created_at')[:limit]
     
     # Serialize results
-    serializer = PatientSearchSerializer(patients, many=True)
+    results = patient_search_rows.serialize(patients, requested_fields(request))
     
     return Response({
-        'results': serializer.data,
-        'count': len(serializer.data),
+        'results': results,
+        'count': len(results),
         'query': query,
         'status_filter': status_filter or None,
         'limit': limit
@@ -127,6 +159,7 @@ def search_patients(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_condition(_patient_details_etag)
 def get_patient_details(request, patient_id):
     """
     Get complete patient information including status history.
@@ -166,11 +199,13 @@ def get_patient_details(request, patient_id):
                     'patient_id': openapi.Schema(type=openapi.TYPE_STRING),
                     'new_status': openapi.Schema(type=openapi.TYPE_STRING),
                     'new_location': openapi.Schema(type=openapi.TYPE_STRING),
+                    'version': openapi.Schema(type=openapi.TYPE_INTEGER),
                 }
             )
         ),
-        400: openapi.Response(description="Invalid status or data"),
+        400: openapi.Response(description="Invalid status, data or transition"),
         404: openapi.Response(description="Patient not found"),
+        409: openapi.Response(description="Patient was updated by another user"),
         401: openapi.Response(description="Authentication required")
     },
     tags=['Patient Core - Universal APIs']
@@ -205,21 +240,30 @@ def update_patient_status(request, patient_id):
         new_location = serializer.validated_data.get('current_location', '')
         notes = serializer.validated_data.get('notes', '')
         
-        patient.current_status = new_status
-        patient.current_location = new_location
-        patient.last_updated_by = request.user
-        patient.save()
+        # Client-supplied version guards against acting on a stale screen
+        expected_version = serializer.validated_data.get('version')
+        if expected_version is not None and expected_version != patient.version:
+            return Response(
+                {
+                    'error': 'Patient was updated by another user. Reload and try again.',
+                    'current_status': patient.current_status,
+                    'version': patient.version
+                },
+                status=status.HTTP_409_CONFLICT
+            )
         
-        # Create status history record
-        PatientStatusHistory.objects.create(
-            patient=patient,
-            previous_status=previous_status,
-            new_status=new_status,
-            previous_location=previous_location,
-            new_location=new_location,
-            changed_by=request.user,
-            notes=notes
-        )
+        try:
+            transition_patient(patient, new_status, request.user, new_location=new_location, notes=notes)
+        except InvalidTransition as e:
+            return Response(
+                {
+                    'error': str(e),
+                    'allowed_statuses': allowed_next_statuses(previous_status)
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except StaleTransition as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         
         return Response({
             'message': 'Patient status updated successfully',
@@ -229,7 +273,8 @@ def update_patient_status(request, patient_id):
             'previous_location': previous_location,
             'new_location': new_location,
             'updated_by': request.user.full_name,
-            'updated_at': timezone.now().isoformat()
+            'version': patient.version,
+            'updated_at': patient.updated_at.isoformat()
         })
     
     except Exception as e:
@@ -338,6 +383,7 @@ def delete_patient(request, patient_id):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_condition(_patient_queue_etag)
 def get_patient_queue(request):
     """
     Get all active patients in proper FIFO queue order.
@@ -348,14 +394,8 @@ def get_patient_queue(request):
     limit = min(int(request.query_params.get('limit', 100)), 200)  # Max 200 results
 
     # Get all non-completed patients
-    active_statuses = [
-        'REGISTERED', 'WAITING_DOCTOR', 'WITH_DOCTOR',
-        'WAITING_LAB', 'IN_LAB', 'LAB_RESULTS_READY',
-        'WAITING_PHARMACY', 'IN_PHARMACY', 'PAYMENT_PENDING'
-    ]
-
     patients = Patient.objects.filter(
-        current_status__in=active_statuses
+        current_status__in=Patient.QUEUE_STATUSES
     ).prefetch_related('status_history')[:limit]
 
     # Serialize with queue entry time
@@ -501,42 +541,22 @@ def patient_complete_history(request, patient_id):
     if user_role in ['DOCTOR', 'LAB', 'ADMIN']:
         lab_tests = LabTestRequest.objects.filter(
             consultation__patient_id=patient_id.upper()
-        ).select_related('consultation', 'consultation__doctor').order_by('-requested_at')
+        ).select_related('consultation', 'consultation__doctor').annotate(
+            test_count=Count('items', filter=~Q(items__status='CANCELLED'))
+        ).order_by('-requested_at')
 
         response_data['lab_tests'] = LabTestRequestSerializer(lab_tests, many=True).data
 
         # Add to timeline
         for lab_test in lab_tests:
-            # Count requested tests (sum boolean fields)
-            test_count = sum([
-                lab_test.mrdt_requested,
-                lab_test.bs_requested,
-                lab_test.stool_analysis_requested,
-                lab_test.urine_sed_requested,
-                lab_test.urinalysis_requested,
-                lab_test.rpr_requested,
-                lab_test.h_pylori_requested,
-                lab_test.hepatitis_b_requested,
-                lab_test.hepatitis_c_requested,
-                lab_test.ssat_requested,
-                lab_test.upt_requested,
-                lab_test.esr_requested,
-                lab_test.blood_grouping_requested,
-                lab_test.hb_requested,
-                lab_test.rheumatoid_factor_requested,
-                lab_test.rbg_requested,
-                lab_test.fbg_requested,
-                lab_test.sickling_test_requested,
-            ])
-
             response_data['timeline'].append({
                 'type': 'LAB_TEST',
                 'timestamp': lab_test.requested_at.isoformat(),
-                'title': f'Lab Tests Requested ({test_count} tests)',
+                'title': f'Lab Tests Requested ({lab_test.test_count} tests)',
                 'status': lab_test.status,
                 'provider': lab_test.consultation.doctor.full_name if lab_test.consultation and lab_test.consultation.doctor else 'Unknown',
                 'details': {
-                    'test_count': test_count,
+                    'test_count': lab_test.test_count,
                     'status': lab_test.status
                 }
             })
@@ -0,0 +1,230 @@
+"""
+Patient workflow state machine.
+
+Every change to Patient.current_status goes through transition_patient() so the
+allowed-transition table lives in one place and concurrent updates from
+different portals cannot silently overwrite each other.
+
+Workflow state belongs to the patient's open Visit: check_in_visit() opens
+one per check-in, transition_patient() moves it along and closes it when
+the visit ends. Patient.current_status mirrors the open visit.
+"""
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Patient, PatientStatusHistory, Visit
+
+
+class InvalidTransition(Exception):
+    """Raised when the requested status is not reachable from the current one"""
+
+
+class StaleTransition(Exception):
+    """Raised when the patient row changed after it was read (lost update)"""
+
+
+# Statuses that mean the patient is still inside an open visit
+OPEN_STATUSES = [
+    'REGISTERED', 'WAITING_DOCTOR', 'WITH_DOCTOR',
+    'PENDING_CONSULTATION_PAYMENT', 'CONSULTATION_PAID',
+    'PENDING_LAB_PAYMENT', 'LAB_PAID', 'WAITING_LAB', 'IN_LAB',
+    'LAB_COMPLETED', 'LAB_RESULTS_READY',
+    'TREATMENT_PRESCRIBED', 'PHARMACY_PAID', 'WAITING_PHARMACY', 'IN_PHARMACY',
+    'PAYMENT_PENDING',
+]
+
+# Finance can clear consultation, lab and medication payments in any order
+# while a visit is open, so these are reachable from every open status.
+PAYMENT_CLEARED_STATUSES = ['CONSULTATION_PAID', 'LAB_PAID', 'PHARMACY_PAID']
+
+# Statuses that end a visit
+CLOSING_STATUSES = ['COMPLETED', 'DISCHARGED']
+
+ALLOWED_TRANSITIONS = {
+    'REGISTERED': ['WAITING_DOCTOR', 'WITH_DOCTOR', 'COMPLETED'],
+    'WAITING_DOCTOR': ['WITH_DOCTOR', 'COMPLETED'],
+    'WITH_DOCTOR': [
+        'WAITING_DOCTOR', 'PENDING_CONSULTATION_PAYMENT', 'PENDING_LAB_PAYMENT',
+        'WAITING_LAB', 'TREATMENT_PRESCRIBED', 'WAITING_PHARMACY',
+        'PAYMENT_PENDING', 'COMPLETED', 'DISCHARGED',
+    ],
+    'PENDING_CONSULTATION_PAYMENT': ['PENDING_LAB_PAYMENT', 'TREATMENT_PRESCRIBED', 'COMPLETED'],
+    'CONSULTATION_PAID': [
+        'WAITING_DOCTOR', 'WITH_DOCTOR', 'PENDING_LAB_PAYMENT', 'WAITING_LAB',
+        'TREATMENT_PRESCRIBED', 'WAITING_PHARMACY', 'COMPLETED',
+    ],
+    'PENDING_LAB_PAYMENT': ['PENDING_CONSULTATION_PAYMENT', 'WITH_DOCTOR'],
+    'LAB_PAID': ['WAITING_LAB', 'IN_LAB', 'PENDING_CONSULTATION_PAYMENT'],
+    # The doctor can close the consultation while tests are still running,
+    # and order more tests once results are back
+    'WAITING_LAB': ['IN_LAB', 'LAB_COMPLETED', 'LAB_RESULTS_READY', 'PENDING_CONSULTATION_PAYMENT'],
+    'IN_LAB': ['LAB_COMPLETED', 'LAB_RESULTS_READY', 'PENDING_CONSULTATION_PAYMENT'],
+    'LAB_COMPLETED': [
+        'LAB_RESULTS_READY', 'WAITING_DOCTOR', 'WITH_DOCTOR',
+        'PENDING_CONSULTATION_PAYMENT', 'PENDING_LAB_PAYMENT',
+    ],
+    'LAB_RESULTS_READY': [
+        'WAITING_DOCTOR', 'WITH_DOCTOR', 'PENDING_CONSULTATION_PAYMENT', 'PENDING_LAB_PAYMENT',
+    ],
+    'TREATMENT_PRESCRIBED': ['PAYMENT_PENDING', 'WAITING_PHARMACY'],
+    'PHARMACY_PAID': ['WAITING_PHARMACY', 'IN_PHARMACY', 'COMPLETED'],
+    'WAITING_PHARMACY': ['IN_PHARMACY', 'COMPLETED'],
+    'IN_PHARMACY': ['COMPLETED'],
+    'PAYMENT_PENDING': ['COMPLETED'],
+    'COMPLETED': ['REGISTERED', 'WAITING_DOCTOR', 'DISCHARGED'],
+    'DISCHARGED': ['REGISTERED', 'WAITING_DOCTOR'],
+}
+
+for _status in OPEN_STATUSES:
+    ALLOWED_TRANSITIONS[_status] = sorted(
+        set(ALLOWED_TRANSITIONS[_status]) | (set(PAYMENT_CLEARED_STATUSES) - {_status})
+    )
+
+
+def allowed_next_statuses(current_status):
+    """Statuses a patient may move to from current_status"""
+    return ALLOWED_TRANSITIONS.get(current_status, [])
+
+
+def can_transition(current_status, new_status):
+    """Check a move against the transition table (re-entering the same status is a location change)"""
+    return new_status == current_status or new_status in allowed_next_statuses(current_status)
+
+
+def transition_patient(patient, new_status, user, new_location=None, notes='', force=False):
+    """
+    Move a patient to a new status and record it in the status history.
+
+    Issues a single conditional UPDATE on the status, location, audit and
+    version columns (no full-row save) guarded by the version the caller read,
+    then inserts the history row in the same transaction.
+
+    Args:
+        patient: Patient instance as read by the caller
+        new_status (str): Target status from Patient.STATUS_CHOICES
+        user (User): Staff member making the change
+        new_location (str, optional): New current_location (kept when None)
+        notes (str, optional): Notes stored on the history row
+        force (bool): Skip the transition table (repairs and new visits)
+
+    Returns:
+        PatientStatusHistory: The history row that was written
+
+    Raises:
+        InvalidTransition: Transition not allowed from the current status
+        StaleTransition: The patient was changed by someone else since it was read
+    """
+    previous_status = patient.current_status
+    previous_location = patient.current_location
+    if new_location is None:
+        new_location = previous_location
+
+    if not force and not can_transition(previous_status, new_status):
+        raise InvalidTransition(
+            f'Cannot move patient {patient.patient_id} from {previous_status} to {new_status}'
+        )
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Patient.objects.filter(
+            pk=patient.pk,
+            version=patient.version
+        ).update(
+            current_status=new_status,
+            current_location=new_location,
+            last_updated_by=user,
+            updated_at=now,
+            version=F('version') + 1
+        )
+        if not updated:
+            raise StaleTransition(
+                f'Patient {patient.patient_id} was updated by another user. Reload and try again.'
+            )
+
+        history = PatientStatusHistory.objects.create(
+            patient=patient,
+            previous_status=previous_status,
+            new_status=new_status,
+            previous_location=previous_location,
+            new_location=new_location,
+            changed_by=user,
+            notes=notes
+        )
+
+        _advance_visit(patient, previous_status, new_status, new_location, user, now)
+
+    # Keep the caller's instance in step with the row
+    patient.current_status = new_status
+    patient.current_location = new_location
+    patient.last_updated_by = user
+    patient.updated_at = now
+    patient.version += 1
+    patient.mark_clean('current_status', 'current_location', 'last_updated_by', 'updated_at', 'version')
+
+    return history
+
+
+def _advance_visit(patient, previous_status, new_status, new_location, user, now):
+    """
+    Apply a transition to the patient's open visit with one UPDATE.
+
+    A patient moving between open statuses without an open visit (state
+    changed outside a check-in) gets one opened so the queues still see it.
+    """
+    changes = {'status': new_status, 'location': new_location}
+    if new_status != previous_status:
+        changes['status_changed_at'] = now
+    if new_status == 'WITH_DOCTOR':
+        changes['consultation_started_at'] = Coalesce(F('consultation_started_at'), Value(now))
+    if new_status in CLOSING_STATUSES:
+        changes['closed_at'] = now
+
+    updated = Visit.objects.open().filter(patient=patient).update(**changes)
+    if not updated and new_status in OPEN_STATUSES:
+        Visit.objects.create(
+            patient=patient,
+            status=new_status,
+            location=new_location,
+            checked_in_at=now,
+            status_changed_at=now,
+            consultation_started_at=now if new_status == 'WITH_DOCTOR' else None,
+            checked_in_by=user,
+        )
+
+
+def check_in_visit(patient, user, new_location, notes='', visit_reason='', vitals=None):
+    """
+    Open a new visit for a patient and put it in the doctor queue.
+
+    Any visit still open from an earlier check-in is closed first (it was
+    abandoned without being completed). Vitals are validated against the
+    Visit field validators.
+
+    Returns:
+        Visit: The new open visit
+
+    Raises:
+        StaleTransition: The patient was changed by someone else since it was read
+        django.core.exceptions.ValidationError: Invalid vitals
+    """
+    now = timezone.now()
+    visit = Visit(
+        patient=patient,
+        visit_reason=(visit_reason or '')[:200],
+        status='WAITING_DOCTOR',
+        location=new_location,
+        checked_in_at=now,
+        status_changed_at=now,
+        checked_in_by=user,
+        **{name: value for name, value in (vitals or {}).items() if name in Visit.VITAL_FIELDS}
+    )
+    visit.full_clean(exclude=['patient', 'checked_in_by'])
+
+    with transaction.atomic():
+        Visit.objects.open().filter(patient=patient).update(closed_at=now)
+        visit.save(force_insert=True)
+        transition_patient(patient, 'WAITING_DOCTOR', user, new_location=new_location, notes=notes, force=True)
+
+    return visit
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Medication, PrescriptionQueue, DispenseRecord, StockMovement
+from .models import Medication, PrescriptionQueue, DispenseRecord, StockMovement, StockLot, ReorderSuggestion, StockSnapshot
 
 
 @admin.register(Medication)
@@ -112,3 +112,57 @@ class StockMovementAdmin(admin.ModelAdmin):
     ]
     
     readonly_fields = ['id', 'timestamp']
+
+
+@admin.register(ReorderSuggestion)
+class ReorderSuggestionAdmin(admin.ModelAdmin):
+    """
+    Admin interface for forecast reorder suggestions (rebuilt nightly).
+    """
+    
+    list_display = [
+        'medication', 'current_stock', 'reorder_point', 'days_of_cover',
+        'suggested_quantity', 'needs_reorder', 'generated_at'
+    ]
+    
+    list_filter = ['needs_reorder']
+    
+    search_fields = ['medication__name', 'medication__generic_name']
+    
+    readonly_fields = ['id', 'generated_at']
+
+
+@admin.register(StockLot)
+class StockLotAdmin(admin.ModelAdmin):
+    """
+    Admin interface for received batches and their expiry dates.
+    """
+    
+    list_display = [
+        'medication', 'batch_number', 'expiry_date', 'quantity_received',
+        'quantity_remaining', 'received_by', 'received_at'
+    ]
+    
+    list_filter = ['expiry_date', 'received_at']
+    
+    search_fields = ['medication__name', 'batch_number', 'supplier']
+    
+    readonly_fields = ['id', 'received_at']
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    """
+    Admin interface for stock ledger snapshots and reconciliation results.
+    """
+    
+    list_display = [
+        'medication', 'snapshot_at', 'ledger_balance', 'recorded_stock',
+        'discrepancy', 'chain_breaks'
+    ]
+    
+    list_filter = ['snapshot_at']
+    
+    search_fields = ['medication__name']
+    
+    readonly_fields = ['id', 'created_at']
@@ -0,0 +1,218 @@
+"""
+PharmacyAlert maintenance.
+
+Alerts are derived from stock changes instead of being computed on each
+dashboard request: whenever a medication's stock or reorder level changes
+(Medication.save, pharmacy.stock dispense/expiry) its stock alert row is
+upserted, and lots touched by a movement get their expiry alert upserted.
+Expiry also changes with the calendar, so refresh_pharmacy_alerts
+re-derives everything daily. The admin dashboard reads the active alerts
+through a cache entry that every refresh invalidates.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from admin_portal.models import PharmacyAlert
+from core.caching import invalidate_cache_tags
+from .models import Medication, StockLot
+from .utils import check_low_stock_alerts
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_WARNING_DAYS = 90
+
+DASHBOARD_CACHE_KEY = 'pharmacy:alert_dashboard'
+DASHBOARD_CACHE_TIMEOUT = 300
+# Rows per alert type on the dashboard
+DASHBOARD_LIMIT = 5
+
+STOCK_ALERT_TYPES = {'critical': 'critical', 'low': 'low_stock'}
+ALERT_FIELDS = ['medication_name', 'current_stock', 'threshold', 'alert_type', 'expiry_date', 'is_active', 'created_at']
+
+
+def _cache_call(method, *args):
+    # A cache outage must not fail stock updates or the dashboard
+    try:
+        return getattr(cache, method)(DASHBOARD_CACHE_KEY, *args)
+    except Exception:
+        logger.warning('Pharmacy alert dashboard cache %s failed', method, exc_info=True)
+        return None
+
+
+def _clear_dashboard_cache():
+    _cache_call('delete')
+
+
+def invalidate_alert_dashboard():
+    transaction.on_commit(_clear_dashboard_cache)
+
+
+def _upsert(existing, wanted, build):
+    """
+    Apply wanted alert state to existing rows.
+
+    existing maps key -> PharmacyAlert, wanted maps key -> field dict (or
+    None for "no alert"). New alerts are bulk inserted, changed ones bulk
+    updated and alerts that no longer apply deactivated.
+
+    Returns:
+        int: Number of rows written
+    """
+    now = timezone.now()
+    to_create, to_update = [], []
+
+    for key, fields in wanted.items():
+        alert = existing.get(key)
+        if fields is None:
+            if alert and alert.is_active:
+                alert.is_active = False
+                to_update.append(alert)
+            continue
+
+        fields = dict(fields, is_active=True)
+        if alert is None:
+            to_create.append(build(key, dict(fields, created_at=now)))
+            continue
+
+        # A newly raised or escalated alert counts as new on the dashboard
+        if not alert.is_active or alert.alert_type != fields['alert_type']:
+            fields['created_at'] = now
+        if any(getattr(alert, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(alert, name, value)
+            to_update.append(alert)
+
+    if to_create:
+        PharmacyAlert.objects.bulk_create(to_create)
+    if to_update:
+        for alert in to_update:
+            alert.updated_at = now
+        PharmacyAlert.objects.bulk_update(to_update, ALERT_FIELDS + ['updated_at'])
+    if to_create or to_update:
+        invalidate_alert_dashboard()
+    return len(to_create) + len(to_update)
+
+
+def refresh_stock_alerts(medication_ids):
+    """Upsert the stock level alert for each medication"""
+    # Every stock write ends here, bulk ones included
+    invalidate_cache_tags('medications')
+    medications = Medication.objects.filter(id__in=list(medication_ids)).only(
+        'id', 'name', 'current_stock', 'reorder_level', 'is_active'
+    )
+
+    wanted = {}
+    for medication in medications:
+        level = check_low_stock_alerts(medication) if medication.is_active else None
+        wanted[medication.id] = {
+            'medication_name': medication.name[:100],
+            'current_stock': medication.current_stock,
+            'threshold': medication.reorder_level,
+            'alert_type': STOCK_ALERT_TYPES[level],
+            'expiry_date': None,
+        } if level else None
+
+    existing = {
+        alert.medication_id: alert
+        for alert in PharmacyAlert.objects.filter(medication_id__in=list(wanted), lot__isnull=True)
+    }
+    return _upsert(
+        existing, wanted,
+        lambda medication_id, fields: PharmacyAlert(medication_id=medication_id, **fields)
+    )
+
+
+def refresh_lot_alerts(lot_ids, as_of=None):
+    """Upsert the expiry alert for each stock lot"""
+    as_of = as_of or timezone.localdate()
+    warn_before = as_of + timedelta(days=EXPIRY_WARNING_DAYS)
+    lots = StockLot.objects.filter(id__in=list(lot_ids)).select_related('medication')
+
+    wanted = {}
+    for lot in lots:
+        alert_type = None
+        if lot.quantity_remaining > 0 and lot.medication.is_active:
+            if lot.expiry_date < as_of:
+                alert_type = 'expired'
+            elif lot.expiry_date <= warn_before:
+                alert_type = 'expiring_soon'
+        wanted[lot.id] = {
+            'medication_name': f'{lot.medication.name} (batch {lot.batch_number})'[:100],
+            'current_stock': lot.quantity_remaining,
+            'threshold': lot.medication.reorder_level,
+            'alert_type': alert_type,
+            'expiry_date': lot.expiry_date,
+        } if alert_type else None
+
+    existing = {alert.lot_id: alert for alert in PharmacyAlert.objects.filter(lot_id__in=list(wanted))}
+    lot_medications = {lot.id: lot.medication_id for lot in lots}
+    return _upsert(
+        existing, wanted,
+        lambda lot_id, fields: PharmacyAlert(medication_id=lot_medications[lot_id], lot_id=lot_id, **fields)
+    )
+
+
+def refresh_all_alerts(as_of=None):
+    """
+    Daily job: re-derive every stock and expiry alert.
+
+    Returns:
+        int: Number of alert rows written
+    """
+    as_of = as_of or timezone.localdate()
+    medication_ids = Medication.objects.values_list('id', flat=True)
+
+    lot_ids = set(StockLot.objects.filter(
+        quantity_remaining__gt=0,
+        expiry_date__lte=as_of + timedelta(days=EXPIRY_WARNING_DAYS)
+    ).values_list('id', flat=True))
+    lot_ids |= set(PharmacyAlert.objects.filter(
+        lot__isnull=False, is_active=True
+    ).values_list('lot_id', flat=True))
+
+    return refresh_stock_alerts(medication_ids) + refresh_lot_alerts(lot_ids, as_of)
+
+
+def alert_dashboard():
+    """
+    Active alerts for the admin dashboard, cached until the next refresh.
+
+    Two queries on a cache miss: one conditional aggregate for the counts
+    and one windowed query for the newest alerts of each type.
+    """
+    data = _cache_call('get')
+    if data is not None:
+        return data
+
+    from admin_portal.serializers import PharmacyAlertSerializer
+
+    active = PharmacyAlert.objects.filter(is_active=True)
+    counts = active.aggregate(
+        critical=Count('id', filter=Q(alert_type='critical')),
+        low_stock=Count('id', filter=Q(alert_type='low_stock')),
+        expired=Count('id', filter=Q(alert_type='expired')),
+        expiring_soon=Count('id', filter=Q(alert_type='expiring_soon')),
+    )
+    counts['total'] = sum(counts.values())
+
+    newest = active.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('alert_type')],
+            order_by=F('created_at').desc()
+        )
+    ).filter(position__lte=DASHBOARD_LIMIT).order_by('alert_type', '-created_at')
+
+    data = {alert_type: [] for alert_type in ['critical', 'low_stock', 'expired', 'expiring_soon']}
+    for alert in PharmacyAlertSerializer(newest, many=True).data:
+        data[alert['alert_type']].append(alert)
+    data['count'] = counts
+
+    _cache_call('set', data, DASHBOARD_CACHE_TIMEOUT)
+    return data
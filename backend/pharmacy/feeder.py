@@ -0,0 +1,127 @@
+"""
+Feed doctor prescriptions into the pharmacy queue.
+
+When a consultation's medication payment clears, all its prescriptions
+become one PrescriptionQueue row. Each item in medications_list is
+resolved up front to its Medication id, current price and every code
+that scans as it, so the queue screen and scan validation read the JSON
+instead of looking items up one by one.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Medication, PrescriptionQueue
+from .utils import get_medication_prices
+
+# doctor.Consultation priority -> PrescriptionQueue priority
+QUEUE_PRIORITY = {
+    'NORMAL': 'NORMAL',
+    'URGENT': 'HIGH',
+    'EMERGENCY': 'URGENT',
+}
+
+
+def scan_codes(medication):
+    """Every code that identifies a medication at the scanner"""
+    codes = [medication.barcode, medication.qr_code, *(medication.alternative_codes or [])]
+    return [code for code in dict.fromkeys(codes) if code]
+
+
+def _resolve_medications(prescriptions):
+    """
+    Medications for a set of prescriptions in one query: by the linked
+    medication_id, otherwise by a case-insensitive name match.
+    """
+    ids = {prescription.medication_id for prescription in prescriptions if prescription.medication_id}
+    names = {prescription.medication_name.lower() for prescription in prescriptions if not prescription.medication_id}
+
+    medications = Medication.objects.annotate(lower_name=Lower('name')).filter(
+        Q(id__in=ids) | Q(lower_name__in=names)
+    )
+    by_id, by_name = {}, {}
+    for medication in medications:
+        by_id[medication.id] = medication
+        by_name.setdefault(medication.lower_name, medication)
+
+    return {
+        prescription.id: (
+            by_id.get(prescription.medication_id) if prescription.medication_id
+            else by_name.get(prescription.medication_name.lower())
+        )
+        for prescription in prescriptions
+    }
+
+
+def build_medications_list(prescriptions):
+    """medications_list JSON for PrescriptionQueue, with resolved ids, prices and scan codes"""
+    resolved = _resolve_medications(prescriptions)
+    medications = [medication for medication in resolved.values() if medication]
+    prices = get_medication_prices(list({medication.id: medication for medication in medications}.values()))
+
+    items = []
+    for prescription in prescriptions:
+        medication = resolved[prescription.id]
+        unit_price = prices[medication.id] if medication else prescription.unit_price
+        items.append({
+            'prescription_id': str(prescription.id),
+            'medication_id': str(medication.id) if medication else None,
+            'medication_name': medication.name if medication else prescription.medication_name,
+            'generic_name': prescription.generic_name or (medication.generic_name if medication else None),
+            'strength': prescription.strength,
+            'dosage_form': prescription.dosage_form,
+            'frequency': prescription.frequency_display,
+            'dosage_instructions': prescription.dosage_instructions,
+            'duration': prescription.duration,
+            'quantity': prescription.quantity_prescribed,
+            'unit_price': str(unit_price) if unit_price is not None else None,
+            'line_total': str(unit_price * prescription.quantity_prescribed) if unit_price is not None else None,
+            'scan_codes': scan_codes(medication) if medication else [],
+            'in_stock': medication.current_stock if medication else None,
+            'special_instructions': prescription.special_instructions,
+        })
+    return items
+
+
+def queue_consultation_prescriptions(consultation):
+    """
+    Create the PrescriptionQueue row for a consultation's prescriptions.
+
+    Idempotent: a consultation is queued once (enforced by a partial unique
+    constraint), so a repeated payment callback returns the existing row.
+
+    Returns:
+        PrescriptionQueue or None: None when nothing is prescribed
+    """
+    existing = PrescriptionQueue.objects.filter(consultation_id=str(consultation.id)).first()
+    if existing:
+        return existing
+
+    prescriptions = list(
+        consultation.prescriptions.exclude(status='CANCELLED').select_related('prescribed_by').order_by('prescribed_at')
+    )
+    if not prescriptions:
+        return None
+
+    try:
+        with transaction.atomic():
+            return PrescriptionQueue.objects.create(
+                prescription_id=str(prescriptions[0].id),
+                consultation_id=str(consultation.id),
+                patient_id=consultation.patient_id,
+                patient_name=consultation.patient_name,
+                prescribed_by=prescriptions[0].prescribed_by.full_name,
+                medications_list=build_medications_list(prescriptions),
+                priority=QUEUE_PRIORITY.get(consultation.priority, 'NORMAL'),
+            )
+    except IntegrityError:
+        # Queued concurrently by another request
+        return PrescriptionQueue.objects.get(consultation_id=str(consultation.id))
+
+
+def find_queued_item(prescription_queue, scanned_code):
+    """The medications_list item a scanned code belongs to, or None"""
+    for item in prescription_queue.medications_list or []:
+        if scanned_code in item.get('scan_codes', []):
+            return item
+    return None
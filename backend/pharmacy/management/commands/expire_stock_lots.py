@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy.stock import expire_lots
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Write off expired stock lots with EXPIRE movements (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Employee ID recorded as performing the write-off'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(employee_id=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with employee ID {options['user']}")
+
+        written_off = expire_lots(user)
+        self.stdout.write(self.style.SUCCESS(f'Wrote off {written_off} expired lot(s)'))
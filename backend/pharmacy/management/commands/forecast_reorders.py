@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy.forecasting import (
+    LEAD_TIME_DAYS, REVIEW_DAYS, WINDOW_DAYS, build_reorder_suggestions
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute reorder points and purchase suggestions from dispensing history (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, default=WINDOW_DAYS,
+                            help='Days of StockMovement history to forecast from')
+        parser.add_argument('--lead-time-days', type=int, default=LEAD_TIME_DAYS,
+                            help='Supplier lead time in days')
+        parser.add_argument('--review-days', type=int, default=REVIEW_DAYS,
+                            help='Days of stock to order beyond the reorder point')
+
+    def handle(self, *args, **options):
+        if options['window_days'] < 7:
+            raise CommandError('--window-days must be at least 7')
+
+        written = build_reorder_suggestions(
+            window_days=options['window_days'],
+            lead_time_days=options['lead_time_days'],
+            review_days=options['review_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} reorder suggestion(s)'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from pharmacy.reconciliation import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot stock balances from the movement ledger and flag discrepancies (run nightly)'
+
+    def handle(self, *args, **options):
+        snapshots = take_snapshots()
+        flagged = [snapshot for snapshot in snapshots if snapshot.has_discrepancy]
+
+        for snapshot in flagged:
+            self.stdout.write(self.style.WARNING(
+                f'{snapshot.medication_id}: recorded {snapshot.recorded_stock}, '
+                f'ledger {snapshot.ledger_balance}, {snapshot.chain_breaks} chain break(s)'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Took {len(snapshots)} stock snapshot(s), {len(flagged)} with discrepancies'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pharmacy.alerts import refresh_all_alerts
+
+
+class Command(BaseCommand):
+    help = 'Re-derive all pharmacy stock and expiry alerts (run daily, after expire_stock_lots)'
+
+    def handle(self, *args, **options):
+        written = refresh_all_alerts()
+        self.stdout.write(self.style.SUCCESS(f'Updated {written} pharmacy alert(s)'))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0002_remove_medication_unit_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('average_daily_usage', models.DecimalField(decimal_places=2, help_text='Mean units dispensed per day over the whole window', max_digits=10)),
+                ('recent_daily_usage', models.DecimalField(decimal_places=2, help_text='Mean units dispensed per day over the last 7 days', max_digits=10)),
+                ('usage_std_dev', models.DecimalField(decimal_places=2, help_text='Standard deviation of daily usage', max_digits=10)),
+                ('forecast_daily_usage', models.DecimalField(decimal_places=2, help_text='Larger of the window and recent rates, used for the forecast', max_digits=10)),
+                ('current_stock', models.IntegerField(help_text='Stock when the forecast ran')),
+                ('reorder_point', models.IntegerField(help_text='Lead-time demand plus safety stock')),
+                ('safety_stock', models.IntegerField(default=0)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text='Days current stock lasts at the forecast rate (empty when there is no usage)', max_digits=8, null=True)),
+                ('suggested_quantity', models.IntegerField(default=0, help_text='Units to order now')),
+                ('estimated_cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('needs_reorder', models.BooleanField(default=False)),
+                ('window_days', models.PositiveIntegerField()),
+                ('lead_time_days', models.PositiveIntegerField()),
+                ('generated_at', models.DateTimeField()),
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_suggestion', to='pharmacy.medication')),
+            ],
+            options={
+                'db_table': 'pharmacy_reorder_suggestions',
+                'ordering': ['days_of_cover'],
+                'indexes': [models.Index(fields=['needs_reorder', 'days_of_cover'], name='pharmacy_re_needs_r_77e251_idx')],
+            },
+        ),
+    ]
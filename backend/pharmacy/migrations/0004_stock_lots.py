@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pharmacy', '0003_reorder_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('batch_number', models.CharField(help_text='Manufacturer batch/lot number', max_length=50)),
+                ('expiry_date', models.DateField()),
+                ('quantity_received', models.IntegerField(help_text='Units received in this batch')),
+                ('quantity_remaining', models.IntegerField(help_text='Units not yet dispensed, expired or removed')),
+                ('supplier', models.CharField(blank=True, max_length=100)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lots', to='pharmacy.medication')),
+                ('received_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_lots_received', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'pharmacy_stock_lots',
+                'ordering': ['expiry_date', 'received_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='lot',
+            field=models.ForeignKey(blank=True, help_text='Batch the units came from or went into, when tracked', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='pharmacy.stocklot'),
+        ),
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('quantity_remaining__gt', 0)), fields=['medication', 'expiry_date'], name='stock_lot_fefo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('quantity_remaining__gt', 0)), fields=['expiry_date'], name='stock_lot_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklot',
+            constraint=models.UniqueConstraint(fields=('medication', 'batch_number'), name='unique_batch_per_medication'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklot',
+            constraint=models.CheckConstraint(check=models.Q(('quantity_remaining__gte', 0)), name='stock_lot_remaining_non_negative'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0004_stock_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('snapshot_at', models.DateTimeField(help_text='Movements up to and including this time are counted')),
+                ('ledger_balance', models.IntegerField(help_text='Opening stock plus every movement quantity')),
+                ('recorded_stock', models.IntegerField(help_text='Medication.current_stock when the snapshot was taken')),
+                ('discrepancy', models.IntegerField(default=0, help_text='recorded_stock minus ledger_balance')),
+                ('movement_count', models.IntegerField(default=0)),
+                ('chain_breaks', models.IntegerField(default=0, help_text="Movements whose previous_stock does not match the prior movement's new_stock, or whose quantity does not match new_stock - previous_stock")),
+                ('last_new_stock', models.IntegerField(blank=True, help_text='new_stock of the last movement counted, to continue the chain check', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='pharmacy.medication')),
+            ],
+            options={
+                'db_table': 'pharmacy_stock_snapshots',
+                'ordering': ['-snapshot_at'],
+                'indexes': [models.Index(fields=['medication', '-snapshot_at'], name='pharmacy_st_medicat_556921_idx'), models.Index(fields=['snapshot_at'], name='pharmacy_st_snapsho_efd0ed_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('medication', 'snapshot_at'), name='unique_snapshot_per_medication'),
+        ),
+    ]
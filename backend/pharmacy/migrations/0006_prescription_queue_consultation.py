@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescriptionqueue',
+            name='consultation_id',
+            field=models.CharField(blank=True, help_text='UUID from doctor.Consultation when the queue entry covers all its prescriptions', max_length=36, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prescriptionqueue',
+            name='medications_list',
+            field=models.JSONField(help_text='List of prescribed medications with quantities, resolved Medication ids, prices and scan codes'),
+        ),
+        migrations.AddConstraint(
+            model_name='prescriptionqueue',
+            constraint=models.UniqueConstraint(condition=models.Q(('consultation_id__isnull', False)), fields=('consultation_id',), name='one_queue_entry_per_consultation'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:44
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Existing rows: the latest processing timestamp they carry"""
+    PrescriptionQueue = apps.get_model('pharmacy', 'PrescriptionQueue')
+    PrescriptionQueue.objects.update(
+        updated_at=Coalesce('dispensed_at', 'completed_at', 'started_processing_at', 'created_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0006_prescription_queue_consultation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescriptionqueue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='prescriptionqueue',
+            index=models.Index(fields=['status', 'updated_at'], name='pharmacy_pr_status_8dad7d_idx'),
+        ),
+    ]
@@ -3,10 +3,12 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 import uuid
 
+from core.mixins import DirtyFieldsMixin
+
 User = get_user_model()
 
 
-class Medication(models.Model):
+class Medication(DirtyFieldsMixin, models.Model):
     """
     Central medication inventory.
     Shared between doctors (for prescribing) and pharmacists (for dispensing).
@@ -71,6 +73,15 @@ class Medication(models.Model):
     def __str__(self):
         return f"{self.name} ({self.current_stock} units)"
     
+    def save(self, *args, **kwargs):
+        refresh_alert = self.is_dirty('name', 'current_stock', 'reorder_level', 'is_active')
+        super().save(*args, **kwargs)
+        
+        # Keep the dashboard's stock alert for this medication current
+        if refresh_alert:
+            from .alerts import refresh_stock_alerts
+            refresh_stock_alerts([self.pk])
+    
     @property
     def is_low_stock(self):
         """Check if medication is below reorder level"""
@@ -94,6 +105,9 @@ class PrescriptionQueue(models.Model):
         ('DISPENSED', 'Given to patient'),
         ('CANCELLED', 'Cancelled'),
     ]
+
+    # Entries the pharmacy still has to work on
+    QUEUE_STATUSES = ['PENDING', 'IN_PROGRESS']
     
     PRIORITY_CHOICES = [
         ('LOW', 'Low Priority'),
@@ -106,6 +120,12 @@ class PrescriptionQueue(models.Model):
     
     # Link to doctor's prescription
     prescription_id = models.CharField(max_length=36, help_text='UUID from doctor.Prescription')
+    consultation_id = models.CharField(
+        max_length=36,
+        blank=True,
+        null=True,
+        help_text='UUID from doctor.Consultation when the queue entry covers all its prescriptions'
+    )
     
     # Patient info (cached for performance)
     patient_id = models.CharField(max_length=20, help_text='Patient ID (PAT123)')
@@ -114,7 +134,7 @@ class PrescriptionQueue(models.Model):
     
     # Prescription details (cached from doctor app)
     medications_list = models.JSONField(
-        help_text='List of prescribed medications with quantities'
+        help_text='List of prescribed medications with quantities, resolved Medication ids, prices and scan codes'
     )
     
     # Processing info
@@ -156,22 +176,32 @@ class PrescriptionQueue(models.Model):
     started_processing_at = models.DateTimeField(blank=True, null=True)
     completed_at = models.DateTimeField(blank=True, null=True)
     dispensed_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'pharmacy_prescription_queue'
         ordering = ['-priority', '-created_at']
         indexes = [
             models.Index(fields=['status', '-created_at']),
+            # Queue change detection (max(updated_at) per status)
+            models.Index(fields=['status', 'updated_at']),
             models.Index(fields=['priority', '-created_at']),
             models.Index(fields=['patient_id']),
             models.Index(fields=['prescription_id']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['consultation_id'],
+                condition=models.Q(consultation_id__isnull=False),
+                name='one_queue_entry_per_consultation'
+            ),
+        ]
     
     def __str__(self):
         return f"Prescription for {self.patient_id} ({self.status})"
 
 
-class DispenseRecord(models.Model):
+class DispenseRecord(DirtyFieldsMixin, models.Model):
     """
     Record of each medication scan during dispensing.
     Creates audit trail and running total calculation.
@@ -219,10 +249,60 @@ class DispenseRecord(models.Model):
     
     def save(self, *args, **kwargs):
         # Calculate line total
-        self.line_total = self.quantity_scanned * self.unit_price
+        if self.is_dirty('quantity_scanned', 'unit_price'):
+            self.line_total = self.quantity_scanned * self.unit_price
         super().save(*args, **kwargs)
 
 
+class StockLot(models.Model):
+    """
+    A received batch of a medication with its own expiry date.
+    Dispensing draws from lots first-expiry-first-out (see pharmacy.stock);
+    Medication.current_stock stays the total across lots plus any stock
+    received before lots were tracked.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    medication = models.ForeignKey(Medication, on_delete=models.PROTECT, related_name='lots')
+    batch_number = models.CharField(max_length=50, help_text='Manufacturer batch/lot number')
+    expiry_date = models.DateField()
+    
+    quantity_received = models.IntegerField(help_text='Units received in this batch')
+    quantity_remaining = models.IntegerField(help_text='Units not yet dispensed, expired or removed')
+    
+    supplier = models.CharField(max_length=100, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    received_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='stock_lots_received')
+    
+    class Meta:
+        db_table = 'pharmacy_stock_lots'
+        ordering = ['expiry_date', 'received_at']
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'batch_number'], name='unique_batch_per_medication'),
+            models.CheckConstraint(check=models.Q(quantity_remaining__gte=0), name='stock_lot_remaining_non_negative'),
+        ]
+        indexes = [
+            # FEFO allocation and expiry alerts only look at lots with stock left
+            models.Index(
+                fields=['medication', 'expiry_date'],
+                name='stock_lot_fefo_idx',
+                condition=models.Q(quantity_remaining__gt=0)
+            ),
+            models.Index(
+                fields=['expiry_date'],
+                name='stock_lot_expiry_idx',
+                condition=models.Q(quantity_remaining__gt=0)
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.medication.name} batch {self.batch_number} (exp {self.expiry_date}, {self.quantity_remaining} left)"
+    
+    @property
+    def is_expired(self):
+        return self.expiry_date < timezone.localdate()
+
+
 class StockMovement(models.Model):
     """
     Audit trail for all inventory movements.
@@ -242,6 +322,14 @@ class StockMovement(models.Model):
     
     # What moved
     medication = models.ForeignKey(Medication, on_delete=models.PROTECT)
+    lot = models.ForeignKey(
+        StockLot,
+        on_delete=models.PROTECT,
+        related_name='movements',
+        blank=True,
+        null=True,
+        help_text='Batch the units came from or went into, when tracked'
+    )
     movement_type = models.CharField(max_length=10, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField(help_text='Positive for additions, negative for removals')
     
@@ -278,3 +366,120 @@ class StockMovement(models.Model):
     
     def __str__(self):
         return f"{self.medication.name}: {self.movement_type} {self.quantity} units"
+
+
+class ReorderSuggestion(models.Model):
+    """
+    Precomputed reorder point and purchase suggestion per medication.
+    Rebuilt by the forecast_reorders management command from DISPENSE
+    history in StockMovement; the dashboard only reads this table.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    medication = models.OneToOneField(
+        Medication,
+        on_delete=models.CASCADE,
+        related_name='reorder_suggestion'
+    )
+    
+    # Consumption over the forecast window
+    average_daily_usage = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Mean units dispensed per day over the whole window'
+    )
+    recent_daily_usage = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Mean units dispensed per day over the last 7 days'
+    )
+    usage_std_dev = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Standard deviation of daily usage'
+    )
+    forecast_daily_usage = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Larger of the window and recent rates, used for the forecast'
+    )
+    
+    # Derived stock levels
+    current_stock = models.IntegerField(help_text='Stock when the forecast ran')
+    reorder_point = models.IntegerField(help_text='Lead-time demand plus safety stock')
+    safety_stock = models.IntegerField(default=0)
+    days_of_cover = models.DecimalField(
+        max_digits=8,
+        decimal_places=1,
+        blank=True,
+        null=True,
+        help_text='Days current stock lasts at the forecast rate (empty when there is no usage)'
+    )
+    suggested_quantity = models.IntegerField(default=0, help_text='Units to order now')
+    estimated_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    needs_reorder = models.BooleanField(default=False)
+    
+    # Forecast parameters used
+    window_days = models.PositiveIntegerField()
+    lead_time_days = models.PositiveIntegerField()
+    generated_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'pharmacy_reorder_suggestions'
+        ordering = ['days_of_cover']
+        indexes = [
+            models.Index(fields=['needs_reorder', 'days_of_cover']),
+        ]
+    
+    def __str__(self):
+        return f"{self.medication.name}: order {self.suggested_quantity} (ROP {self.reorder_point})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Periodic stock balance per medication, rebuilt incrementally from the
+    StockMovement ledger (see pharmacy.reconciliation). Historic stock on
+    hand is the nearest earlier snapshot plus the movements after it.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='stock_snapshots')
+    snapshot_at = models.DateTimeField(help_text='Movements up to and including this time are counted')
+    
+    # Balances
+    ledger_balance = models.IntegerField(help_text='Opening stock plus every movement quantity')
+    recorded_stock = models.IntegerField(help_text='Medication.current_stock when the snapshot was taken')
+    discrepancy = models.IntegerField(default=0, help_text='recorded_stock minus ledger_balance')
+    
+    # Ledger checks for the movements since the previous snapshot
+    movement_count = models.IntegerField(default=0)
+    chain_breaks = models.IntegerField(
+        default=0,
+        help_text="Movements whose previous_stock does not match the prior movement's new_stock, "
+                  "or whose quantity does not match new_stock - previous_stock"
+    )
+    last_new_stock = models.IntegerField(
+        blank=True,
+        null=True,
+        help_text='new_stock of the last movement counted, to continue the chain check'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'pharmacy_stock_snapshots'
+        ordering = ['-snapshot_at']
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'snapshot_at'], name='unique_snapshot_per_medication'),
+        ]
+        indexes = [
+            models.Index(fields=['medication', '-snapshot_at']),
+            models.Index(fields=['snapshot_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.medication.name} @ {self.snapshot_at}: {self.ledger_balance} (recorded {self.recorded_stock})"
+    
+    @property
+    def has_discrepancy(self):
+        return self.discrepancy != 0 or self.chain_breaks > 0
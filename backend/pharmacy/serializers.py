@@ -1,10 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Medication, PrescriptionQueue, DispenseRecord, StockMovement
+from django.utils import timezone
+from core.fast_serializers import ValuesSerializer
+from .models import (
+    Medication, PrescriptionQueue, DispenseRecord, StockMovement, ReorderSuggestion, StockSnapshot
+)
 
 User = get_user_model()
 
 
+def medication_stock_status(current_stock, reorder_level):
+    """'unavailable', 'low' (at or below the reorder level) or 'available'"""
+    if current_stock == 0:
+        return 'unavailable'
+    elif current_stock <= reorder_level:
+        return 'low'
+    else:
+        return 'available'
+
+
 class MedicationSerializer(serializers.ModelSerializer):
     """
     Full medication serializer for pharmacy staff (CRUD operations).
@@ -61,12 +75,16 @@ class MedicationListSerializer(serializers.ModelSerializer):
         ]
     
     def get_stock_status(self, obj):
-        if obj.current_stock == 0:
-            return 'unavailable'
-        elif obj.is_low_stock:
-            return 'low'
-        else:
-            return 'available'
+        return medication_stock_status(obj.current_stock, obj.reorder_level)
+
+
+# values() fast path for medication lists (core/fast_serializers.py)
+medication_list_rows = ValuesSerializer(
+    MedicationListSerializer,
+    # Medication.is_available
+    is_available=(['is_active', 'current_stock'], lambda is_active, current_stock: is_active and current_stock > 0),
+    stock_status=(['current_stock', 'reorder_level'], medication_stock_status),
+)
 
 
 class PrescriptionQueueSerializer(serializers.ModelSerializer):
@@ -82,7 +100,7 @@ class PrescriptionQueueSerializer(serializers.ModelSerializer):
     class Meta:
         model = PrescriptionQueue
         fields = [
-            'id', 'prescription_id', 'patient_id', 'patient_name',
+            'id', 'prescription_id', 'consultation_id', 'patient_id', 'patient_name',
             'prescribed_by', 'medications_list', 'status', 'status_display',
             'priority', 'priority_display', 'processed_by', 'processed_by_name',
             'total_amount', 'pharmacist_notes', 'modified_medications',
@@ -134,3 +152,99 @@ class RestockSerializer(serializers.Serializer):
     )
     supplier = serializers.CharField(max_length=100, required=False)
     notes = serializers.CharField(required=False)
+    batch_number = serializers.CharField(max_length=50, required=False)
+    expiry_date = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        """Batch number and expiry date go together and the batch must not be expired"""
+        if bool(data.get('batch_number')) != bool(data.get('expiry_date')):
+            raise serializers.ValidationError('batch_number and expiry_date must be provided together')
+        if data.get('expiry_date') and data['expiry_date'] < timezone.localdate():
+            raise serializers.ValidationError({'expiry_date': 'Cannot receive an expired batch'})
+        return data
+
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    """
+    Precomputed reorder suggestion (see pharmacy.forecasting).
+    """
+    
+    medication_id = serializers.UUIDField(source='medication.id', read_only=True)
+    medication_name = serializers.CharField(source='medication.name', read_only=True)
+    generic_name = serializers.CharField(source='medication.generic_name', read_only=True)
+    supplier = serializers.CharField(source='medication.supplier', read_only=True)
+    
+    class Meta:
+        model = ReorderSuggestion
+        fields = [
+            'medication_id', 'medication_name', 'generic_name', 'supplier',
+            'average_daily_usage', 'recent_daily_usage', 'usage_std_dev',
+            'forecast_daily_usage', 'current_stock', 'reorder_point',
+            'safety_stock', 'days_of_cover', 'suggested_quantity',
+            'estimated_cost', 'needs_reorder', 'window_days',
+            'lead_time_days', 'generated_at'
+        ]
+        read_only_fields = fields
+
+
+class GoodsReceivedLineSerializer(serializers.Serializer):
+    """
+    One line of a supplier delivery.
+    """
+    
+    medication_id = serializers.UUIDField(required=False)
+    scanned_code = serializers.CharField(max_length=200, required=False)
+    quantity = serializers.IntegerField(min_value=1)
+    batch_number = serializers.CharField(max_length=50, required=False)
+    expiry_date = serializers.DateField(required=False)
+    scanned_codes = serializers.ListField(
+        child=serializers.CharField(max_length=200),
+        required=False,
+        default=list
+    )
+    
+    def validate(self, data):
+        if not data.get('medication_id') and not data.get('scanned_code'):
+            raise serializers.ValidationError('Provide medication_id or scanned_code')
+        if bool(data.get('batch_number')) != bool(data.get('expiry_date')):
+            raise serializers.ValidationError('batch_number and expiry_date must be provided together')
+        if data.get('expiry_date') and data['expiry_date'] < timezone.localdate():
+            raise serializers.ValidationError({'expiry_date': 'Cannot receive an expired batch'})
+        return data
+
+
+class GoodsReceivedSerializer(serializers.Serializer):
+    """
+    Serializer for a goods-received note (whole supplier delivery).
+    """
+    
+    supplier = serializers.CharField(max_length=100, required=False)
+    delivery_reference = serializers.CharField(
+        max_length=36,
+        required=False,
+        help_text='Supplier delivery note or invoice number'
+    )
+    notes = serializers.CharField(required=False)
+    allow_partial = serializers.BooleanField(
+        default=False,
+        help_text='Apply matched lines even if some lines are rejected'
+    )
+    lines = GoodsReceivedLineSerializer(many=True, allow_empty=False, max_length=2000)
+
+
+class StockSnapshotSerializer(serializers.ModelSerializer):
+    """
+    Stock snapshot with its reconciliation result.
+    """
+    
+    medication_name = serializers.CharField(source='medication.name', read_only=True)
+    has_discrepancy = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = StockSnapshot
+        fields = [
+            'id', 'medication', 'medication_name', 'snapshot_at',
+            'ledger_balance', 'recorded_stock', 'discrepancy',
+            'movement_count', 'chain_breaks', 'has_discrepancy'
+        ]
+        read_only_fields = fields
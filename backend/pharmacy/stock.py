@@ -0,0 +1,405 @@
+"""
+Lot-aware stock operations.
+
+Dispensing allocates first-expiry-first-out across StockLot rows. The
+whole allocation runs in one transaction with the medication row locked:
+one UPDATE for every lot touched (CASE on lot id), one UPDATE for
+Medication.current_stock and one bulk INSERT of StockMovement rows, so a
+dispense spanning several lots is never half applied.
+
+Stock received before lots were tracked is "untracked": the part of
+current_stock not covered by any lot. It is used after the unexpired lots.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .alerts import EXPIRY_WARNING_DAYS, refresh_lot_alerts, refresh_stock_alerts
+from .models import Medication, StockLot, StockMovement
+
+
+class InsufficientStock(Exception):
+    """Raised when unexpired stock cannot cover the requested quantity"""
+
+    def __init__(self, medication, available, requested):
+        self.available = available
+        self.requested = requested
+        super().__init__(
+            f'Insufficient stock for {medication.name}. Available: {available}, Requested: {requested}'
+        )
+
+
+def _apply_lot_deltas(deltas):
+    """Add per-lot quantity deltas ({lot_id: delta}) in a single UPDATE"""
+    if not deltas:
+        return
+    StockLot.objects.filter(id__in=list(deltas)).update(
+        quantity_remaining=F('quantity_remaining') + Case(
+            *[When(id=lot_id, then=Value(delta)) for lot_id, delta in deltas.items()],
+            output_field=IntegerField()
+        )
+    )
+
+
+def dispense_stock(medication, quantity, user, reference_id=None, scanned_codes=None, notes=None):
+    """
+    Remove `quantity` units from stock, earliest expiry first.
+
+    Expired lots are never used. Returns the updated Medication and the
+    StockMovement rows written (one per lot touched, plus one for any
+    untracked stock used).
+
+    Raises:
+        InsufficientStock: Not enough unexpired stock
+    """
+    today = timezone.localdate()
+
+    with transaction.atomic():
+        medication = Medication.objects.select_for_update().get(pk=medication.pk)
+        lots = list(
+            StockLot.objects.select_for_update().filter(
+                medication=medication, quantity_remaining__gt=0
+            ).order_by('expiry_date', 'received_at')
+        )
+
+        untracked = max(medication.current_stock - sum(lot.quantity_remaining for lot in lots), 0)
+        usable = [lot for lot in lots if lot.expiry_date >= today]
+        available = sum(lot.quantity_remaining for lot in usable) + untracked
+        if quantity > available:
+            raise InsufficientStock(medication, available, quantity)
+
+        allocations = []
+        outstanding = quantity
+        for lot in usable:
+            if not outstanding:
+                break
+            taken = min(lot.quantity_remaining, outstanding)
+            allocations.append((lot, taken))
+            outstanding -= taken
+        if outstanding:
+            allocations.append((None, outstanding))
+
+        movements = []
+        stock = medication.current_stock
+        for lot, taken in allocations:
+            movements.append(StockMovement(
+                medication=medication,
+                lot=lot,
+                movement_type='DISPENSE',
+                quantity=-taken,
+                previous_stock=stock,
+                new_stock=stock - taken,
+                reference_id=reference_id,
+                scanned_codes=scanned_codes or [],
+                performed_by=user,
+                notes=notes
+            ))
+            stock -= taken
+
+        _apply_lot_deltas({lot.id: -taken for lot, taken in allocations if lot})
+        Medication.objects.filter(pk=medication.pk).update(
+            current_stock=F('current_stock') - quantity,
+            updated_at=timezone.now()
+        )
+        StockMovement.objects.bulk_create(movements)
+
+        refresh_stock_alerts([medication.pk])
+        refresh_lot_alerts([lot.id for lot, _ in allocations if lot])
+
+    medication.current_stock = stock
+    return medication, movements
+
+
+def receive_stock(medication, quantity, user, batch_number=None, expiry_date=None,
+                  supplier=None, scanned_codes=None, notes=None):
+    """
+    Add stock, into a lot when a batch number and expiry date are given.
+
+    Receiving the same batch again tops up the existing lot.
+
+    Returns:
+        tuple: (updated Medication, StockLot or None, StockMovement)
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        medication = Medication.objects.select_for_update().get(pk=medication.pk)
+
+        lot = None
+        if batch_number and expiry_date:
+            lot, created = StockLot.objects.select_for_update().get_or_create(
+                medication=medication,
+                batch_number=batch_number,
+                defaults={
+                    'expiry_date': expiry_date,
+                    'quantity_received': quantity,
+                    'quantity_remaining': quantity,
+                    'supplier': supplier or '',
+                    'received_by': user,
+                }
+            )
+            if not created:
+                StockLot.objects.filter(pk=lot.pk).update(
+                    quantity_received=F('quantity_received') + quantity,
+                    quantity_remaining=F('quantity_remaining') + quantity
+                )
+
+        previous_stock = medication.current_stock
+        medication.current_stock = previous_stock + quantity
+        medication.last_restocked = now
+        update_fields = ['current_stock', 'last_restocked', 'updated_at']
+        if supplier:
+            medication.supplier = supplier
+            update_fields.append('supplier')
+        medication.save(update_fields=update_fields)
+
+        movement = StockMovement.objects.create(
+            medication=medication,
+            lot=lot,
+            movement_type='RESTOCK',
+            quantity=quantity,
+            previous_stock=previous_stock,
+            new_stock=medication.current_stock,
+            scanned_codes=scanned_codes or [],
+            performed_by=user,
+            notes=notes
+        )
+
+        # Medication.save() refreshed the stock alert
+        if lot:
+            refresh_lot_alerts([lot.id])
+
+    return medication, lot, movement
+
+
+def _resolve_medications(lines):
+    """
+    Lock and return the medications a delivery refers to, keyed by id and
+    by every scannable code, in one SELECT ... FOR UPDATE (ordered by id so
+    concurrent deliveries lock rows in the same order).
+    """
+    ids = {line['medication_id'] for line in lines if line.get('medication_id')}
+    codes = {line['scanned_code'] for line in lines if line.get('scanned_code')}
+
+    condition = Q(id__in=ids) | Q(barcode__in=codes) | Q(qr_code__in=codes)
+    for code in codes:
+        condition |= Q(alternative_codes__contains=[code])
+
+    by_key = {}
+    for medication in Medication.objects.select_for_update().filter(condition).order_by('id'):
+        by_key[medication.id] = medication
+        for code in [medication.barcode, medication.qr_code, *medication.alternative_codes]:
+            if code in codes:
+                by_key.setdefault(code, medication)
+    return by_key
+
+
+def receive_delivery(lines, user, supplier=None, reference_id=None, notes=None, allow_partial=False):
+    """
+    Apply a goods-received note: many restock lines in one transaction.
+
+    Each line has medication_id or scanned_code, quantity, and optionally
+    batch_number with expiry_date and scanned_codes. Medications are
+    locked once, stock is raised with a single bulk_update of F()
+    increments, new lots are bulk inserted, existing lots topped up with
+    one bulk_update and every line gets its StockMovement from one
+    bulk_create.
+
+    Lines that cannot be matched to an active medication are rejected.
+    Unless allow_partial is set, any rejected line rolls back the whole
+    delivery.
+
+    Returns:
+        tuple: (applied, per-line result dicts)
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        medications = _resolve_medications(lines)
+
+        results = []
+        accepted = []
+        for index, line in enumerate(lines):
+            medication = medications.get(line.get('medication_id')) or medications.get(line.get('scanned_code'))
+            if medication is None or not medication.is_active:
+                results.append({
+                    'line': index,
+                    'status': 'rejected',
+                    'error': 'Medication not found or inactive',
+                    'medication_id': line.get('medication_id'),
+                    'scanned_code': line.get('scanned_code'),
+                })
+                continue
+            accepted.append((index, line, medication))
+
+        if not accepted or (len(accepted) < len(lines) and not allow_partial):
+            transaction.set_rollback(True)
+            return False, results
+
+        # Lots: top up batches already on the shelf, create the rest
+        lot_keys = {
+            (medication.id, line['batch_number'])
+            for _, line, medication in accepted if line.get('batch_number')
+        }
+        lots = {}
+        if lot_keys:
+            lot_filter = Q()
+            for medication_id, batch_number in lot_keys:
+                lot_filter |= Q(medication_id=medication_id, batch_number=batch_number)
+            lots = {
+                (lot.medication_id, lot.batch_number): lot
+                for lot in StockLot.objects.select_for_update().filter(lot_filter)
+            }
+
+        lot_increments = defaultdict(int)
+        new_lots = {}
+        for _, line, medication in accepted:
+            if not line.get('batch_number'):
+                continue
+            key = (medication.id, line['batch_number'])
+            if key in lots:
+                lot_increments[key] += line['quantity']
+            elif key in new_lots:
+                new_lots[key].quantity_received += line['quantity']
+                new_lots[key].quantity_remaining += line['quantity']
+            else:
+                new_lots[key] = StockLot(
+                    medication=medication,
+                    batch_number=line['batch_number'],
+                    expiry_date=line['expiry_date'],
+                    quantity_received=line['quantity'],
+                    quantity_remaining=line['quantity'],
+                    supplier=supplier or '',
+                    received_by=user
+                )
+
+        if new_lots:
+            StockLot.objects.bulk_create(new_lots.values())
+            lots.update(new_lots)
+        if lot_increments:
+            topped_up = []
+            for key, quantity in lot_increments.items():
+                lot = lots[key]
+                lot.quantity_received = F('quantity_received') + quantity
+                lot.quantity_remaining = F('quantity_remaining') + quantity
+                topped_up.append(lot)
+            StockLot.objects.bulk_update(topped_up, ['quantity_received', 'quantity_remaining'])
+
+        # Movements in line order, with running stock per medication
+        running_stock = {}
+        stock_increments = defaultdict(int)
+        movements = []
+        for index, line, medication in accepted:
+            previous_stock = running_stock.get(medication.id, medication.current_stock)
+            new_stock = previous_stock + line['quantity']
+            running_stock[medication.id] = new_stock
+            stock_increments[medication.id] += line['quantity']
+            lot = lots.get((medication.id, line['batch_number'])) if line.get('batch_number') else None
+
+            movements.append(StockMovement(
+                medication=medication,
+                lot=lot,
+                movement_type='RESTOCK',
+                quantity=line['quantity'],
+                previous_stock=previous_stock,
+                new_stock=new_stock,
+                reference_id=reference_id,
+                scanned_codes=line.get('scanned_codes') or ([line['scanned_code']] if line.get('scanned_code') else []),
+                performed_by=user,
+                notes=notes
+            ))
+            results.append({
+                'line': index,
+                'status': 'received',
+                'medication_id': str(medication.id),
+                'medication_name': medication.name,
+                'quantity': line['quantity'],
+                'previous_stock': previous_stock,
+                'new_stock': new_stock,
+                'lot_id': str(lot.id) if lot else None,
+            })
+
+        restocked = []
+        for medication_id, quantity in stock_increments.items():
+            medication = medications[medication_id]
+            medication.current_stock = F('current_stock') + quantity
+            medication.last_restocked = now
+            medication.updated_at = now
+            if supplier:
+                medication.supplier = supplier
+            restocked.append(medication)
+        Medication.objects.bulk_update(
+            restocked,
+            ['current_stock', 'last_restocked', 'updated_at'] + (['supplier'] if supplier else [])
+        )
+        StockMovement.objects.bulk_create(movements)
+
+        refresh_stock_alerts(stock_increments.keys())
+        refresh_lot_alerts([lot.id for lot in lots.values()])
+
+    results.sort(key=lambda result: result['line'])
+    return True, results
+
+
+def expire_lots(user, as_of=None):
+    """
+    Write off every lot that expired before as_of (default today).
+
+    Each expired lot gets an EXPIRE movement, its remaining quantity is
+    zeroed and current_stock is reduced, per medication under a row lock.
+
+    Returns:
+        int: Number of lots written off
+    """
+    as_of = as_of or timezone.localdate()
+    expired = StockLot.objects.filter(quantity_remaining__gt=0, expiry_date__lt=as_of)
+    medication_ids = list(expired.values_list('medication_id', flat=True).distinct())
+
+    written_off = 0
+    for medication_id in medication_ids:
+        with transaction.atomic():
+            medication = Medication.objects.select_for_update().get(pk=medication_id)
+            lots = list(expired.select_for_update().filter(medication_id=medication_id))
+
+            movements = []
+            stock = medication.current_stock
+            for lot in lots:
+                removed = min(lot.quantity_remaining, max(stock, 0))
+                movements.append(StockMovement(
+                    medication=medication,
+                    lot=lot,
+                    movement_type='EXPIRE',
+                    quantity=-removed,
+                    previous_stock=stock,
+                    new_stock=stock - removed,
+                    reference_id=str(lot.id),
+                    performed_by=user,
+                    notes=f'Batch {lot.batch_number} expired on {lot.expiry_date}'
+                ))
+                stock -= removed
+
+            StockLot.objects.filter(id__in=[lot.id for lot in lots]).update(quantity_remaining=0)
+            Medication.objects.filter(pk=medication_id).update(
+                current_stock=stock,
+                updated_at=timezone.now()
+            )
+            StockMovement.objects.bulk_create(movements)
+            written_off += len(lots)
+
+            refresh_stock_alerts([medication_id])
+            refresh_lot_alerts([lot.id for lot in lots])
+
+    return written_off
+
+
+def expiring_lots(within_days=EXPIRY_WARNING_DAYS, as_of=None):
+    """Lots with stock left that expire within `within_days` (expired ones included)"""
+    as_of = as_of or timezone.localdate()
+    return StockLot.objects.filter(
+        quantity_remaining__gt=0,
+        expiry_date__lte=as_of + timedelta(days=within_days),
+        medication__is_active=True
+    ).select_related('medication').order_by('expiry_date')
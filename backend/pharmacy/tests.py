@@ -1,3 +1,116 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Medication, StockLot, StockMovement
+from .serializers import medication_list_rows
+from .stock import InsufficientStock, dispense_stock
+
+User = get_user_model()
+
+
+class AvailableMedicationsFieldsTests(TestCase):
+    """?fields= on available_medications is checked against the caller's serializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacist = User.objects.create_user(
+            password='test-pass-123', full_name='Joseph Pharmacist', email='pharmacy@example.com',
+            phone_number='+255700000401', role='PHARMACY', is_active=True, is_approved=True,
+        )
+        cls.doctor = User.objects.create_user(
+            password='test-pass-123', full_name='Neema Kweka', email='doctor@example.com',
+            phone_number='+255700000402', role='DOCTOR', is_active=True, is_approved=True,
+        )
+        Medication.objects.create(
+            name='Panadol', generic_name='Paracetamol', manufacturer='Shelys', barcode='TEST-0001',
+            category='ANALGESIC', current_stock=5, reorder_level=10, unit_price=Decimal('250.00'),
+            created_by=cls.pharmacist,
+        )
+
+    def _get(self, user, fields):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/pharmacy/medications/available/', {'fields': fields})
+
+    def test_pharmacy_fields(self):
+        response = self._get(self.pharmacist, 'barcode,reorder_level,is_low_stock')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['medications'],
+            [{'barcode': 'TEST-0001', 'reorder_level': 10, 'is_low_stock': True}]
+        )
+
+    def test_doctor_cannot_select_pharmacy_fields(self):
+        response = self._get(self.doctor, 'name,barcode')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['available_fields'], medication_list_rows.field_names)
+
+
+class DispenseStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacist = User.objects.create_user(
+            password='test-pass-123',
+            full_name='Joseph Pharmacist',
+            email='pharmacy@example.com',
+            phone_number='+255700000401',
+            role='PHARMACY',
+        )
+
+    def setUp(self):
+        today = timezone.localdate()
+        # 25 units in lots (5 of them expired) plus 5 untracked units
+        self.medication = Medication.objects.create(
+            name='Amoxicillin 500mg', generic_name='Amoxicillin', manufacturer='Shelys',
+            barcode='TEST-0100', category='ANTIBIOTIC', current_stock=30,
+            unit_price=Decimal('300.00'), created_by=self.pharmacist,
+        )
+        self.late = self._lot('LATE', today + timedelta(days=200), 10)
+        self.early = self._lot('EARLY', today + timedelta(days=30), 10)
+        self.expired = self._lot('EXPIRED', today - timedelta(days=1), 5)
+
+    def _lot(self, batch_number, expiry_date, quantity):
+        return StockLot.objects.create(
+            medication=self.medication, batch_number=batch_number, expiry_date=expiry_date,
+            quantity_received=quantity, quantity_remaining=quantity, received_by=self.pharmacist,
+        )
+
+    def _remaining(self):
+        return dict(StockLot.objects.values_list('batch_number', 'quantity_remaining'))
+
+    def test_earliest_expiry_is_used_first(self):
+        medication, movements = dispense_stock(self.medication, 4, self.pharmacist)
+
+        self.assertEqual(medication.current_stock, 26)
+        self.assertEqual([(movement.lot, movement.quantity) for movement in movements], [(self.early, -4)])
+        self.assertEqual(self._remaining(), {'EARLY': 6, 'LATE': 10, 'EXPIRED': 5})
+
+    def test_dispense_splits_across_lots_then_untracked_stock(self):
+        medication, movements = dispense_stock(self.medication, 23, self.pharmacist, reference_id='RX1')
+
+        self.assertEqual(
+            [(movement.lot, movement.quantity) for movement in movements],
+            [(self.early, -10), (self.late, -10), (None, -3)]
+        )
+        self.assertEqual([movement.new_stock for movement in movements], [20, 10, 7])
+        self.assertEqual(self._remaining(), {'EARLY': 0, 'LATE': 0, 'EXPIRED': 5})
+        self.medication.refresh_from_db()
+        self.assertEqual(self.medication.current_stock, 7)
+        self.assertEqual(StockMovement.objects.filter(reference_id='RX1').count(), 3)
+
+    def test_insufficient_unexpired_stock_changes_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            dispense_stock(self.medication, 26, self.pharmacist)
 
-# Create your tests here.
+        self.assertEqual((raised.exception.available, raised.exception.requested), (25, 26))
+        self.assertEqual(self._remaining(), {'EARLY': 10, 'LATE': 10, 'EXPIRED': 5})
+        self.medication.refresh_from_db()
+        self.assertEqual(self.medication.current_stock, 30)
+        self.assertFalse(StockMovement.objects.exists())
@@ -7,6 +7,7 @@ urlpatterns = [
     # ==================== PHARMACY OPERATIONS ====================
     # Prescription processing and dispensing
     path('prescription-queue/', views.prescription_queue, name='prescription-queue'),
+    path('changes/', views.queue_changes, name='queue-changes'),
     path('scan/', views.scan_medication, name='scan-medication'),
     path('prescriptions/<uuid:prescription_id>/complete/', views.complete_prescription, name='complete-prescription'),
     
@@ -14,7 +15,11 @@ urlpatterns = [
     # Medication inventory and stock management
     path('medications/', views.medications_list, name='medications-list'),           # GET: List all, POST: Add new
     path('medications/<uuid:pk>/', views.medication_detail, name='medication-detail'), # GET: View, PATCH: Update
+    path('medications/<uuid:pk>/stock-on-hand/', views.medication_stock_on_hand, name='medication-stock-on-hand'),
     path('medications/available/', views.available_medications, name='available-medications'), # For doctors
     path('stock/restock/', views.restock_medication, name='restock-medication'),     # Add stock to existing meds
+    path('stock/receive/', views.receive_delivery_view, name='receive-delivery'),    # Whole supplier delivery (GRN)
+    path('stock/discrepancies/', views.stock_discrepancies, name='stock-discrepancies'), # Ledger reconciliation
     path('stock/low-stock/', views.low_stock_alert, name='low-stock-alert'),         # Check low stock items
+    path('stock/reorder-suggestions/', views.reorder_suggestions, name='reorder-suggestions'), # Forecast purchase list
 ]
@@ -32,6 +32,29 @@ def get_medication_pricing(medication):
         return Decimal('1000.00')
 
 
+def get_medication_prices(medications):
+    """
+    Bulk version of get_medication_pricing: barcode service code first,
+    then an exact service name match, then the 1000 TZS default.
+    Two ServicePricing queries however many medications are priced.
+    """
+    from finance.models import ServicePricing
+    
+    codes = {f"MED_{medication.barcode[:10]}": medication.id for medication in medications}
+    names = {medication.name: medication.id for medication in medications}
+    active = ServicePricing.objects.filter(is_active=True)
+    
+    prices = {}
+    for service_code, price in active.filter(service_code__in=list(codes)).values_list('service_code', 'standard_price'):
+        prices[codes[service_code]] = price
+    for service_name, price in active.filter(
+        service_name__in=list(names), service_category='MEDICATION'
+    ).values_list('service_name', 'standard_price'):
+        prices.setdefault(names[service_name], price)
+    
+    return {medication.id: prices.get(medication.id, Decimal('1000.00')) for medication in medications}
+
+
 def calculate_prescription_total(dispense_records):
     """
     Calculate total amount for a prescription from dispense records.
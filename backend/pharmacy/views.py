@@ -1,33 +1,60 @@
+from decimal import Decimal
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Sum, F
+from django.db.models import Q, Sum, F, Max, Case, When
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from .models import Medication, PrescriptionQueue, DispenseRecord, StockMovement
+from .models import Medication, PrescriptionQueue, DispenseRecord, ReorderSuggestion
 from .serializers import (
-    MedicationSerializer, MedicationListSerializer, PrescriptionQueueSerializer,
-    ScanRequestSerializer, RestockSerializer
+    MedicationSerializer, PrescriptionQueueSerializer, medication_list_rows,
+    ScanRequestSerializer, RestockSerializer, ReorderSuggestionSerializer,
+    GoodsReceivedSerializer, StockSnapshotSerializer
 )
+from .feeder import find_queued_item
+from patients.changes import parse_cursor, read_feed
+from .reconciliation import latest_discrepancies, stock_on_hand
+from .stock import InsufficientStock, dispense_stock, receive_stock, receive_delivery
 from .utils import get_medication_pricing, calculate_prescription_total, update_medication_stock, check_low_stock_alerts
+from core.caching import cached_response, changes_etag, etag_condition
+from core.fast_serializers import requested_fields, sparse_fieldsets
 from core.permissions import IsPharmacyStaff, IsDoctorStaff, IsStaffMember
 
+QUEUE_PRIORITY_ORDER = ['URGENT', 'HIGH', 'NORMAL', 'LOW']
+
+
+def _prescription_queue_etag(request):
+    # time_in_queue is shown to the minute
+    return changes_etag(
+        PrescriptionQueue.objects.filter(status__in=PrescriptionQueue.QUEUE_STATUSES), 'updated_at',
+        scope=[timezone.now().strftime('%Y%m%d%H%M')]
+    )
+
 
 # ==================== PHARMACY OPERATIONS ====================
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsPharmacyStaff])
+@etag_condition(_prescription_queue_etag)
 def prescription_queue(request):
     """
     Get all pending prescriptions waiting to be processed.
     Shows queue for pharmacy staff to dispense medications.
     """
     try:
+        # Most urgent first, then oldest; medications_list already carries
+        # resolved ids, prices and scan codes for every item
         prescriptions = PrescriptionQueue.objects.filter(
-            status__in=['PENDING', 'IN_PROGRESS']
-        ).order_by('priority', 'created_at')
+            status__in=PrescriptionQueue.QUEUE_STATUSES
+        ).select_related('processed_by').order_by(
+            Case(*[When(priority=priority, then=rank) for rank, priority in enumerate(QUEUE_PRIORITY_ORDER)]),
+            'created_at'
+        )
         
         serializer = PrescriptionQueueSerializer(prescriptions, many=True)
         return Response({
@@ -43,146 +70,30 @@ def prescription_queue(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['POST'])
+@api_view(['GET'])
 @permission_classes([IsAuthenticated, IsPharmacyStaff])
-def scan_medication(request):
+def queue_changes(request):
     """
-    Process scanned barcode/QR during medication dispensing.
-    Updates running total and creates dispense record.
+    Prescription queue changes since ?since=<cursor> (see patients/changes.py).
     """
     try:
-        serializer = ScanRequestSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get prescription and validate
-        prescription = get_object_or_404(
-            PrescriptionQueue, 
-            id=serializer.validated_data['prescription_id']
-        )
-        
-        if prescription.status == 'COMPLETED':
-            return Response({
-                'success': False,
-                'error': 'Prescription already completed'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Find medication by scanned code
-        scanned_code = serializer.validated_data['scanned_code']
-        medication = Medication.objects.filter(
-            Q(barcode=scanned_code) | Q(qr_code=scanned_code),
-            is_active=True
-        ).first()
-        
-        if not medication:
-            return Response({
-                'success': False,
-                'error': 'Medication not found or inactive'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        quantity = serializer.validated_data.get('quantity', 1)
-        
-        # Check stock availability
-        if medication.current_stock < quantity:
-            return Response({
-                'success': False,
-                'error': f'Insufficient stock. Available: {medication.current_stock}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Update prescription status to IN_PROGRESS
-        if prescription.status == 'PENDING':
-            prescription.status = 'IN_PROGRESS'
-            prescription.processed_by = request.user
-            prescription.save()
-        
-        # Get medication price from centralized pricing system
-        unit_price = get_medication_pricing(medication)
-        
-        # Create dispense record
-        dispense_record = DispenseRecord.objects.create(
-            prescription_queue=prescription,
-            medication=medication,
-            scanned_code=scanned_code,
-            quantity_scanned=quantity,
-            unit_price=unit_price,
-            scanned_by=request.user
-        )
-        
-        # Update running total
-        line_total = unit_price * quantity
-        prescription.total_amount = F('total_amount') + line_total
-        prescription.save()
-        prescription.refresh_from_db()
-        
-        # Update medication stock
-        medication.current_stock = F('current_stock') - quantity
-        medication.save()
-        medication.refresh_from_db()
-        
-        # Create stock movement record
-        StockMovement.objects.create(
-            medication=medication,
-            movement_type='DISPENSE',
-            quantity=-quantity,
-            reference=str(prescription.id),
-            performed_by=request.user,
-            notes=f'Dispensed for prescription {prescription.prescription_id}'
-        )
-        
-        return Response({
-            'success': True,
-            'item': medication.name,
-            'quantity': quantity,
-            'unit_price': float(unit_price),
-            'line_total': float(unit_price * quantity),
-            'running_total': float(prescription.total_amount),
-            'remaining_stock': medication.current_stock
-        })
-        
-    except Exception as e:
+        since = parse_cursor(request)
+    except ValueError:
         return Response({
             'success': False,
-            'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
+            'error': 'since must be a cursor returned by this endpoint'
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated, IsPharmacyStaff])
-def complete_prescription(request, prescription_id):
-    """
-    Mark prescription as completed and finalize billing.
-    """
-    try:
-        prescription = get_object_or_404(PrescriptionQueue, id=prescription_id)
-        
-        if prescription.status == 'COMPLETED':
-            return Response({
-                'success': False,
-                'error': 'Prescription already completed'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        prescription.status = 'COMPLETED'
-        prescription.save()
-        
-        # TODO: Send to finance app for billing when implemented
-        # finance_integration.create_prescription_bill(prescription)
-        
-        return Response({
-            'success': True,
-            'message': 'Prescription completed successfully',
-            'prescription_id': str(prescription.id),
-            'total_amount': float(prescription.total_amount),
-            'patient_id': prescription.patient_id
-        })
-        
-    except Exception as e:
-        return Response({
-            'success': False,
-            'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    queued = PrescriptionQueue.objects.filter(
+        status__in=PrescriptionQueue.QUEUE_STATUSES
+    ).select_related('processed_by')
+    return Response({
+        'success': True,
+        **read_feed(
+            'PRESCRIPTION', since, queued,
+            lambda prescriptions: PrescriptionQueueSerializer(prescriptions, many=True).data
+        )
+    })
 
 
 # ==================== INVENTORY MANAGEMENT ====================
@@ -258,8 +169,21 @@ def medication_detail(request, pk):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _is_pharmacy_staff(request):
+    return getattr(request.user, 'role', None) == 'PHARMACY'
+
+
+def _available_medication_fields(request):
+    """Fields of the list available_medications sends this caller"""
+    if _is_pharmacy_staff(request):
+        return [name for name, field in MedicationSerializer().fields.items() if not field.write_only]
+    return medication_list_rows.field_names
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsStaffMember])
+@cached_response('medications')
+@sparse_fieldsets(_available_medication_fields)
 def available_medications(request):
     """
     Get available medications for doctors to use in prescriptions.
@@ -287,119 +211,21 @@ def available_medications(request):
         medications = medications.order_by('name')
 
         # Simplified view for doctors, detailed for pharmacy staff
-        if hasattr(request.user, 'role') and request.user.role == 'PHARMACY':
+        fields = requested_fields(request)
+        if _is_pharmacy_staff(request):
             serializer = MedicationSerializer(medications, many=True)
+            for name in set(serializer.child.fields) - set(fields or serializer.child.fields):
+                serializer.child.fields.pop(name)
+            medication_data = serializer.data
         else:
-            serializer = MedicationListSerializer(medications, many=True)
+            medication_data = medication_list_rows.serialize(medications, fields)
 
         return Response({
             'success': True,
-            'count': medications.count(),
-            'medications': serializer.data
-        })
-
-    except Exception as e:
-        return Response({
-            'success': False,
-            'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-
-@api_view(['POST'])
-@permission_classes([IsAuthenticated, IsPharmacyStaff])
-def restock_medication(request):
-    """
-    Add stock to existing medications by scanning codes.
-    Used when receiving new supplies from vendors.
-    """
-    try:
-        serializer = RestockSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        medication_id = serializer.validated_data['medication_id']
-        quantity = serializer.validated_data['quantity']
-        scanned_codes = serializer.validated_data.get('scanned_codes', [])
-        
-        medication = get_object_or_404(Medication, id=medication_id)
-        
-        # Update stock
-        old_stock = medication.current_stock
-        medication.current_stock = F('current_stock') + quantity
-        medication.last_restocked = timezone.now()
-        medication.save()
-        medication.refresh_from_db()
-        
-        # Create stock movement record
-        StockMovement.objects.create(
-            medication=medication,
-            movement_type='RESTOCK',
-            quantity=quantity,
-            scanned_codes=scanned_codes,
-            performed_by=request.user,
-            notes=f'Restocked from {old_stock} to {medication.current_stock}'
-        )
-        
-        return Response({
-            'success': True,
-            'message': f'Successfully restocked {medication.name}',
-            'medication': medication.name,
-            'quantity_added': quantity,
-            'new_stock_level': medication.current_stock
+            'count': len(medication_data),
+            'medications': medication_data
         })
-        
-    except Exception as e:
-        return Response({
-            'success': False,
-            'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated, IsPharmacyStaff])
-def low_stock_alert(request):
-    """
-    Get medications that are running low on stock.
-    Helps pharmacy staff know what to reorder.
-    """
-    try:
-        low_stock_meds = Medication.objects.filter(
-            current_stock__lte=F('reorder_level'),
-            is_active=True
-        ).order_by('current_stock')
-        
-        serializer = MedicationSerializer(low_stock_meds, many=True)
-        return Response({
-            'success': True,
-            'alert_count': low_stock_meds.count(),
-            'low_stock_medications': serializer.data
-        })
-        
-    except Exception as e:
-        return Response({
-            'success': False,
-            'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-def prescription_queue(request):
-    """
-    Get all pending prescriptions waiting to be processed.
-    """
-    try:
-        queue = PrescriptionQueue.objects.filter(
-            status__in=['PENDING', 'IN_PROGRESS']
-        ).order_by('priority', 'created_at')
-        
-        serializer = PrescriptionQueueSerializer(queue, many=True)
-        
-        return Response({
-            'success': True,
-            'queue_count': queue.count(),
-            'prescriptions': serializer.data
-        })
-        
     except Exception as e:
         return Response({
             'success': False,
@@ -424,12 +250,19 @@ def scan_medication(request):
         
         data = serializer.validated_data
         
-        # Find medication by scanned code
-        medication = Medication.objects.filter(
-            Q(barcode=data['scanned_code']) | 
-            Q(qr_code=data['scanned_code']) |
-            Q(alternative_codes__contains=[data['scanned_code']])
-        ).first()
+        # Get prescription queue
+        prescription = get_object_or_404(PrescriptionQueue, id=data['prescription_id'])
+        
+        # Prescribed items carry their scan codes; other codes are substitutions
+        queued_item = find_queued_item(prescription, data['scanned_code'])
+        if queued_item and queued_item.get('medication_id'):
+            medication = Medication.objects.filter(pk=queued_item['medication_id']).first()
+        else:
+            medication = Medication.objects.filter(
+                Q(barcode=data['scanned_code']) | 
+                Q(qr_code=data['scanned_code']) |
+                Q(alternative_codes__contains=[data['scanned_code']])
+            ).first()
         
         if not medication:
             return Response({
@@ -445,66 +278,59 @@ def scan_medication(request):
                 'error': f'{medication.name} is not available (out of stock or inactive)'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get prescription queue
-        prescription = get_object_or_404(PrescriptionQueue, id=data['prescription_id'])
-        
-        # Check if enough stock
-        if medication.current_stock < data['quantity']:
-            return Response({
-                'success': False,
-                'item_found': True,
-                'error': f'Insufficient stock. Available: {medication.current_stock}, Requested: {data["quantity"]}'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get medication price from centralized pricing system
-        unit_price = get_medication_pricing(medication)
+        # Price resolved when the prescription was queued, else from centralized pricing
+        if queued_item and queued_item.get('unit_price') is not None:
+            unit_price = Decimal(queued_item['unit_price'])
+        else:
+            unit_price = get_medication_pricing(medication)
         
         # Calculate totals
         line_total = data['quantity'] * unit_price
         
-        # Get current running total
-        current_total = DispenseRecord.objects.filter(
-            prescription_queue=prescription
-        ).aggregate(total=Sum('line_total'))['total'] or 0
-        
-        new_running_total = current_total + line_total
-        
-        # Create dispense record
-        dispense_record = DispenseRecord.objects.create(
-            prescription_queue=prescription,
-            medication=medication,
-            scanned_code=data['scanned_code'],
-            quantity_scanned=data['quantity'],
-            unit_price=unit_price,
-            line_total=line_total,
-            running_total=new_running_total,
-            scanned_by=request.user
-        )
-        
-        # Update medication stock
-        medication.current_stock -= data['quantity']
-        medication.save()
-        
-        # Create stock movement record
-        StockMovement.objects.create(
-            medication=medication,
-            movement_type='DISPENSE',
-            quantity=-data['quantity'],
-            previous_stock=medication.current_stock + data['quantity'],
-            new_stock=medication.current_stock,
-            reference_id=str(prescription.id),
-            scanned_codes=[data['scanned_code']],
-            performed_by=request.user
-        )
-        
-        # Update prescription status
-        if prescription.status == 'PENDING':
-            prescription.status = 'IN_PROGRESS'
-            prescription.started_processing_at = timezone.now()
-            prescription.processed_by = request.user
-        
-        prescription.total_amount = new_running_total
-        prescription.save()
+        with transaction.atomic():
+            # Take stock from the earliest-expiring lots first
+            try:
+                medication, _ = dispense_stock(
+                    medication,
+                    data['quantity'],
+                    request.user,
+                    reference_id=str(prescription.id),
+                    scanned_codes=[data['scanned_code']]
+                )
+            except InsufficientStock as e:
+                return Response({
+                    'success': False,
+                    'item_found': True,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Get current running total
+            current_total = DispenseRecord.objects.filter(
+                prescription_queue=prescription
+            ).aggregate(total=Sum('line_total'))['total'] or 0
+            
+            new_running_total = current_total + line_total
+            
+            # Create dispense record
+            dispense_record = DispenseRecord.objects.create(
+                prescription_queue=prescription,
+                medication=medication,
+                scanned_code=data['scanned_code'],
+                quantity_scanned=data['quantity'],
+                unit_price=unit_price,
+                line_total=line_total,
+                running_total=new_running_total,
+                scanned_by=request.user
+            )
+            
+            # Update prescription status
+            if prescription.status == 'PENDING':
+                prescription.status = 'IN_PROGRESS'
+                prescription.started_processing_at = timezone.now()
+                prescription.processed_by = request.user
+            
+            prescription.total_amount = new_running_total
+            prescription.save()
         
         return Response({
             'success': True,
@@ -515,7 +341,8 @@ def scan_medication(request):
             'quantity': data['quantity'],
             'line_total': line_total,
             'running_total': new_running_total,
-            'remaining_stock': medication.current_stock
+            'remaining_stock': medication.current_stock,
+            'on_prescription': queued_item is not None
         })
         
     except Exception as e:
@@ -657,25 +484,14 @@ def restock_medication(request):
         data = serializer.validated_data
         medication = get_object_or_404(Medication, id=data['medication_id'])
         
-        # Update stock
-        previous_stock = medication.current_stock
-        medication.current_stock += data['quantity']
-        medication.last_restocked = timezone.now()
-        
-        if 'supplier' in data:
-            medication.supplier = data['supplier']
-        
-        medication.save()
-        
-        # Create stock movement record
-        StockMovement.objects.create(
-            medication=medication,
-            movement_type='RESTOCK',
-            quantity=data['quantity'],
-            previous_stock=previous_stock,
-            new_stock=medication.current_stock,
+        medication, lot, movement = receive_stock(
+            medication,
+            data['quantity'],
+            request.user,
+            batch_number=data.get('batch_number'),
+            expiry_date=data.get('expiry_date'),
+            supplier=data.get('supplier'),
             scanned_codes=data.get('scanned_codes', []),
-            performed_by=request.user,
             notes=data.get('notes', '')
         )
         
@@ -683,9 +499,10 @@ def restock_medication(request):
             'success': True,
             'message': f'Successfully restocked {medication.name}',
             'medication_id': str(medication.id),
-            'previous_stock': previous_stock,
+            'previous_stock': movement.previous_stock,
             'new_stock': medication.current_stock,
-            'quantity_added': data['quantity']
+            'quantity_added': data['quantity'],
+            'lot_id': str(lot.id) if lot else None
         })
         
     except Exception as e:
@@ -695,8 +512,54 @@ def restock_medication(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsPharmacyStaff])
+def receive_delivery_view(request):
+    """
+    Goods-received note: restock a whole supplier delivery in one transaction.
+    Returns a result per line; rejected lines roll back the delivery unless
+    allow_partial is set.
+    """
+    try:
+        serializer = GoodsReceivedSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        applied, results = receive_delivery(
+            data['lines'],
+            request.user,
+            supplier=data.get('supplier'),
+            reference_id=data.get('delivery_reference'),
+            notes=data.get('notes', ''),
+            allow_partial=data['allow_partial']
+        )
+        
+        received = [result for result in results if result['status'] == 'received']
+        return Response({
+            'success': applied,
+            'message': f'Received {len(received)} of {len(data["lines"])} line(s)' if applied
+                       else 'Delivery not applied: some lines were rejected',
+            'lines_received': len(received),
+            'lines_rejected': len(results) - len(received),
+            'units_received': sum(result['quantity'] for result in received),
+            'results': results
+        }, status=status.HTTP_200_OK if applied else status.HTTP_400_BAD_REQUEST)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsPharmacyStaff])
+@cached_response('medications')
+@sparse_fieldsets(medication_list_rows)
 def low_stock_alert(request):
     """
     Get medications that are running low on stock.
@@ -707,12 +570,107 @@ def low_stock_alert(request):
             current_stock__lte=F('reorder_level')
         ).order_by('current_stock')
         
-        serializer = MedicationListSerializer(low_stock_meds, many=True)
+        medication_data = medication_list_rows.serialize(low_stock_meds, requested_fields(request))
         
         return Response({
             'success': True,
-            'low_stock_count': low_stock_meds.count(),
-            'medications': serializer.data
+            'low_stock_count': len(medication_data),
+            'medications': medication_data
+        })
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsPharmacyStaff])
+def reorder_suggestions(request):
+    """
+    Purchase suggestions from the last forecast_reorders run.
+    Only medications at or below their forecast reorder point unless ?all=true.
+    """
+    try:
+        suggestions = ReorderSuggestion.objects.select_related('medication').filter(
+            medication__is_active=True
+        )
+        if request.query_params.get('all', '').lower() != 'true':
+            suggestions = suggestions.filter(needs_reorder=True)
+
+        summary = suggestions.aggregate(
+            total_estimated_cost=Sum('estimated_cost'),
+            generated_at=Max('generated_at')
+        )
+        serializer = ReorderSuggestionSerializer(suggestions, many=True)
+
+        return Response({
+            'success': True,
+            'generated_at': summary['generated_at'],
+            'suggestion_count': len(serializer.data),
+            'total_estimated_cost': summary['total_estimated_cost'] or 0,
+            'suggestions': serializer.data
+        })
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsPharmacyStaff])
+def stock_discrepancies(request):
+    """
+    Medications whose latest reconciliation found the recorded stock and
+    the movement ledger disagreeing (see the reconcile_stock command).
+    """
+    try:
+        snapshots = latest_discrepancies()
+        serializer = StockSnapshotSerializer(snapshots, many=True)
+        
+        return Response({
+            'success': True,
+            'discrepancy_count': len(snapshots),
+            'discrepancies': serializer.data
+        })
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsPharmacyStaff])
+def medication_stock_on_hand(request, pk):
+    """
+    Ledger stock on hand for a medication at ?at=<ISO datetime> (default now).
+    """
+    try:
+        medication = get_object_or_404(Medication, pk=pk)
+        
+        at = timezone.now()
+        if request.query_params.get('at'):
+            at = parse_datetime(request.query_params['at'])
+            if at is None:
+                return Response({
+                    'success': False,
+                    'error': 'Invalid at. Use an ISO 8601 datetime.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        
+        return Response({
+            'success': True,
+            'medication_id': str(medication.id),
+            'medication_name': medication.name,
+            'at': at,
+            'stock_on_hand': stock_on_hand(medication, at),
+            'current_stock': medication.current_stock
         })
         
     except Exception as e:
@@ -1,14 +1,19 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Count
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from patients.models import Patient, PatientStatusHistory, PatientNote
-from patients.serializers import PatientSearchSerializer
+from core.caching import cached_response
+from patients.models import Patient, PatientStatusHistory, PatientNote, Visit
+from patients.changes import parse_cursor, read_feed
+from patients.workflow import check_in_visit, StaleTransition
+from patients.serializers import PatientSearchSerializer, patient_search_rows
 from .serializers import PatientRegistrationSerializer, PatientUpdateSerializer
 from finance.utils import get_service_price
 
@@ -108,19 +113,13 @@ def register_patient(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # NEW PATIENTS: Automatically add to doctor queue (WAITING_DOCTOR)
-        patient.current_status = 'WAITING_DOCTOR'
-        patient.current_location = f"Doctor Queue - Auto-registered by {request.user.full_name}"
-        patient.save()
-
-        # Create initial status history
-        PatientStatusHistory.objects.create(
-            patient=patient,
-            previous_status=None,
-            new_status='WAITING_DOCTOR',
-            previous_location=None,
-            new_location=patient.current_location,
-            changed_by=request.user,
-            notes=f"New patient auto-queued for doctor. {note_text}"
+        check_in_visit(
+            patient,
+            request.user,
+            new_location=f"Doctor Queue - Auto-registered by {request.user.full_name}",
+            notes=f"New patient auto-queued for doctor. {note_text}",
+            visit_reason='New registration',
+            vitals={name: getattr(patient, name) for name in Visit.VITAL_FIELDS}
         )
         
         return Response({
@@ -241,7 +240,13 @@ def update_patient_details(request, patient_id):
         type=openapi.TYPE_OBJECT,
         properties={
             'visit_reason': openapi.Schema(type=openapi.TYPE_STRING, description="Reason for today's visit"),
-            'requires_new_file': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Whether patient needs a new file (additional fee)", default=False)
+            'requires_new_file': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Whether patient needs a new file (additional fee)", default=False),
+            'temperature': openapi.Schema(type=openapi.TYPE_NUMBER, description="Temperature in Celsius"),
+            'blood_pressure_systolic': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'blood_pressure_diastolic': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'pulse_rate': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'respiratory_rate': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'weight': openapi.Schema(type=openapi.TYPE_NUMBER, description="Weight in kg")
         }
     ),
     responses={
@@ -256,6 +261,7 @@ def update_patient_details(request, patient_id):
                     'patient_type': openapi.Schema(type=openapi.TYPE_STRING),
                     'status': openapi.Schema(type=openapi.TYPE_STRING),
                     'location': openapi.Schema(type=openapi.TYPE_STRING),
+                    'visit_id': openapi.Schema(type=openapi.TYPE_STRING),
                     'checked_in_at': openapi.Schema(type=openapi.TYPE_STRING)
                 }
             )
@@ -285,67 +291,65 @@ def check_in_patient(request, patient_id):
         today = timezone.now().date()
         active_statuses = ['WAITING_DOCTOR', 'WITH_DOCTOR', 'WAITING_LAB', 'IN_LAB', 'LAB_RESULTS_READY', 'WAITING_PHARMACY', 'IN_PHARMACY']
 
-        if (patient.updated_at.date() == today and
-            patient.current_status in active_statuses):
+        active_visit = Visit.objects.open().filter(
+            patient=patient,
+            status__in=active_statuses,
+            status_changed_at__date=today
+        ).first()
+        if active_visit:
             return Response({
-                'error': f'Patient is already checked in today with status: {patient.current_status}',
-                'current_status': patient.current_status,
-                'current_location': patient.current_location
+                'error': f'Patient is already checked in today with status: {active_visit.status}',
+                'current_status': active_visit.status,
+                'current_location': active_visit.location
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Get visit details
         visit_reason = request.data.get('visit_reason', 'Regular checkup')
         requires_new_file = request.data.get('requires_new_file', False)
 
-        # Handle new file fee if required (for normal patients only)
-        if requires_new_file and patient.patient_type == 'NORMAL':
-            # Additional file fee required
-            from finance.models import RevenueRecord
-            RevenueRecord.objects.create(
-                patient=patient,
-                revenue_type='ADDITIONAL_FILE',
-                description=f'Additional file fee for {patient.patient_id} - {visit_reason}',
-                amount=2000.00,
-                payment_method='CASH',
-                collected_by=request.user,
-                revenue_date=today
-            )
-
-        # Update patient status - send to doctor queue (FIFO)
-        previous_status = patient.current_status
-        previous_location = patient.current_location
+        # Fee, status change and note succeed or fail together
+        with transaction.atomic():
+            # Handle new file fee if required (for normal patients only)
+            if requires_new_file and patient.patient_type == 'NORMAL':
+                # Additional file fee required
+                from finance.models import RevenueRecord
+                RevenueRecord.objects.create(
+                    patient=patient,
+                    revenue_type='ADDITIONAL_FILE',
+                    description=f'Additional file fee for {patient.patient_id} - {visit_reason}',
+                    amount=2000.00,
+                    payment_method='CASH',
+                    collected_by=request.user,
+                    revenue_date=today
+                )
 
-        patient.current_status = 'WAITING_DOCTOR'
-        patient.current_location = f"Doctor Queue - Checked in by {request.user.full_name}"
-        patient.updated_at = timezone.now()
-        patient.last_updated_by = request.user
-        patient.save()
-
-        # Create status history
-        PatientStatusHistory.objects.create(
-            patient=patient,
-            previous_status=previous_status,
-            new_status='WAITING_DOCTOR',
-            previous_location=previous_location,
-            new_location=patient.current_location,
-            changed_by=request.user,
-            notes=f"Patient checked in for: {visit_reason}. Patient type: {patient.patient_type}"
-        )
+            # Send to doctor queue (FIFO). A check-in opens a new visit, so it
+            # may start from whatever status the previous visit ended in.
+            visit = check_in_visit(
+                patient,
+                request.user,
+                new_location=f"Doctor Queue - Checked in by {request.user.full_name}",
+                notes=f"Patient checked in for: {visit_reason}. Patient type: {patient.patient_type}",
+                visit_reason=visit_reason,
+                vitals={
+                    name: request.data[name] for name in Visit.VITAL_FIELDS
+                    if request.data.get(name) not in (None, '')
+                }
+            )
 
-        # Create check-in note
-        from patients.models import PatientNote
-        note_text = f"Checked in for: {visit_reason}"
-        if patient.patient_type == 'NHIF':
-            note_text += f" (NHIF Card: {patient.nhif_card_number})"
-        if requires_new_file:
-            note_text += " - Additional file created"
+            # Create check-in note
+            note_text = f"Checked in for: {visit_reason}"
+            if patient.patient_type == 'NHIF':
+                note_text += f" (NHIF Card: {patient.nhif_card_number})"
+            if requires_new_file:
+                note_text += " - Additional file created"
 
-        PatientNote.objects.create(
-            patient=patient,
-            note=note_text,
-            note_type='GENERAL',
-            created_by=request.user
-        )
+            PatientNote.objects.create(
+                patient=patient,
+                note=note_text,
+                note_type='GENERAL',
+                created_by=request.user
+            )
 
         return Response({
             'message': 'Patient checked in successfully',
@@ -355,14 +359,19 @@ def check_in_patient(request, patient_id):
             'status': patient.current_status,
             'location': patient.current_location,
             'visit_reason': visit_reason,
+            'visit_id': str(visit.id),
             'checked_in_by': request.user.full_name,
-            'checked_in_at': patient.updated_at.isoformat()
+            'checked_in_at': visit.checked_in_at.isoformat()
         })
 
     except Patient.DoesNotExist:
         return Response({
             'error': 'Patient not found'
         }, status=status.HTTP_404_NOT_FOUND)
+    except StaleTransition as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({
             'error': f'Failed to check in patient: {str(e)}'
@@ -497,6 +506,7 @@ def process_file_fee_payment(request, patient_id):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_response('patients', 'pricing', per_user=True)
 def reception_dashboard(request):
     """
     Get reception dashboard summary data.
@@ -516,17 +526,19 @@ def reception_dashboard(request):
         total_patients = Patient.objects.count()
         
         # Recent registrations (last 10)
-        recent_patients = Patient.objects.select_related('created_by').order_by('-created_at')[:10]
-        recent_data = PatientSearchSerializer(recent_patients, many=True).data
+        recent_patients = Patient.objects.order_by('-created_at')[:10]
+        recent_data = patient_search_rows.serialize(recent_patients)
         
         # Today's active queue - patients currently in the hospital system
         today_active_statuses = ['REGISTERED', 'WAITING_DOCTOR', 'WITH_DOCTOR', 'WAITING_LAB', 'IN_LAB', 'LAB_RESULTS_READY', 'WAITING_PHARMACY', 'IN_PHARMACY', 'PAYMENT_PENDING']
-        todays_active_queue = Patient.objects.filter(
-            Q(created_at__date=today) | Q(updated_at__date=today),
-            current_status__in=today_active_statuses
-        ).select_related('created_by').order_by('-updated_at')
+        todays_active_queue = Visit.objects.open().filter(
+            Q(checked_in_at__date=today) | Q(status_changed_at__date=today),
+            status__in=today_active_statuses
+        ).order_by('-status_changed_at')
         
-        active_queue_data = PatientSearchSerializer(todays_active_queue, many=True).data
+        active_queue_data = patient_search_rows.render(
+            patient_search_rows.rows(todays_active_queue, prefix='patient__')
+        )
         
         # Patients currently registered (waiting for next service)
         patients_registered = Patient.objects.filter(current_status='REGISTERED').count()
@@ -635,3 +647,104 @@ def update_patient_details(request, patient_id):
             {'error': f'Failed to update patient: {str(e)}'},
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+# Rejected rows returned in the response; the management command has no cap
+IMPORT_ERROR_LIMIT = 1000
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Bulk import patients",
+    operation_description="Import patients from a legacy CSV/XLSX register (header row required, columns named like the registration fields plus optional file_fee_paid). Rows are validated with the registration rules and written in batches; rejected rows are reported with their row number. Use the import_patients management command for very large files.",
+    manual_parameters=[
+        openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True, description=".csv or .xlsx register"),
+        openapi.Parameter('dry_run', openapi.IN_FORM, type=openapi.TYPE_BOOLEAN, description="Validate only, write nothing"),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Import finished",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'total_rows': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'imported': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'failed': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'dry_run': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    'errors': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    'errors_truncated': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                }
+            )
+        ),
+        400: openapi.Response(description="Missing or unsupported file"),
+        401: openapi.Response(description="Authentication required")
+    },
+    tags=['Reception Portal']
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def import_patients(request):
+    """
+    Bulk import patients from an uploaded CSV/XLSX register.
+    """
+    from patients.importers import PatientImporter, iter_rows
+
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'error': 'A .csv or .xlsx file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ['1', 'true', 'yes']
+    errors = []
+
+    def on_error(row_number, row_errors):
+        if len(errors) < IMPORT_ERROR_LIMIT:
+            errors.append({'row': row_number, 'errors': row_errors})
+
+    try:
+        importer = PatientImporter(request.user, dry_run=dry_run, on_error=on_error)
+        summary = importer.run(iter_rows(upload.file, upload.name))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': f'Failed to import patients: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    summary['errors'] = errors
+    summary['errors_truncated'] = summary['failed'] > len(errors)
+    return Response(summary)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Patient queue changes",
+    operation_description="Patients that entered, changed in or left the active queue since ?since=<cursor>. Without a cursor the whole queue is returned with reset=true.",
+    manual_parameters=[
+        openapi.Parameter(
+            'since', openapi.IN_QUERY,
+            description="Cursor from the previous response",
+            type=openapi.TYPE_INTEGER,
+            required=False
+        )
+    ],
+    tags=['Reception Portal']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def queue_changes(request):
+    """Active patient queue delta feed (see patients/changes.py)"""
+    try:
+        since = parse_cursor(request)
+    except ValueError:
+        return Response(
+            {'error': 'since must be a cursor returned by this endpoint'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    active = Patient.objects.filter(current_status__in=Patient.QUEUE_STATUSES).select_related('created_by')
+    return Response(read_feed(
+        'PATIENT', since, active,
+        lambda patients: PatientSearchSerializer(patients, many=True).data
+    ))